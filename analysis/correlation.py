@@ -0,0 +1,293 @@
+"""
+Rolling covariance and correlation of log returns across the coin universe.
+
+The engines keep pairwise running sums (weights, sums, sums of squares and cross products), so
+adding a bar costs O(k²) for k symbols, independent of the window length. Sums are pairwise
+complete: a pair only counts the bars where both symbols have a price, so coins listed later
+(or missing a snapshot) don't poison the whole matrix with NaN.
+
+- `RollingCovariance` covers the last `window` returns (ddof=1, like pandas' rolling().cov()).
+- `EWMCovariance` weights returns exponentially by `halflife` (like pandas' ewm().cov(bias=True)).
+
+Both accept a bar time with every update: a bar with the same time as the previous one (the
+still-open candle rewritten by every snapshot) replaces it instead of being added again.
+"""
+import numpy as np
+
+
+
+def close_panel(processors):
+    """
+    Builds the panel of closes from indicator processors that already fetched their data.
+
+    Parameters:
+        processors (dict): BaseFinancialIndicators instances by symbol.
+
+    Returns:
+        DataFrame: One column of closes per symbol over the union of their bar times.
+    """
+    import pandas as pd
+
+    closes = {symbol: p.data['Close'] for symbol, p in processors.items() if p.data is not None and len(p.data)}
+    return pd.concat(closes, axis=1).sort_index()
+
+
+class _PairwiseMoments:
+    """
+    Pairwise-complete running moments shared by the rolling and exponentially weighted engines.
+
+    For symbols i and j, over the bars where both have a return:
+        weight[i, j]  sum of weights
+        sum[i, j]     sum of i's returns
+        sumsq[i, j]   sum of i's squared returns
+        cross[i, j]   sum of the products of i's and j's returns
+    """
+    ddof = 0
+
+    def __init__(self, symbols, min_periods=2):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.min_periods = min_periods
+        k = len(self.symbols)
+        self._weight = np.zeros((k, k))
+        self._sum = np.zeros((k, k))
+        self._sumsq = np.zeros((k, k))
+        self._cross = np.zeros((k, k))
+        self._count = np.zeros((k, k))  # bars per pair, for min_periods
+        self._prices = np.full(k, np.nan)  # closes of the last bar
+        self._previous = np.full(k, np.nan)  # closes of the bar before it
+        self._last_ts = None
+        self._saved = None
+
+    def _state(self):
+        return [self._weight, self._sum, self._sumsq, self._cross, self._count]
+
+    def _add(self, x, mask, weight=1.0):
+        x = np.where(mask, x, 0.0)
+        m = mask.astype(float)
+        self._weight += weight * np.outer(m, m)
+        self._sum += weight * np.outer(x, m)
+        self._sumsq += weight * np.outer(x * x, m)
+        self._cross += weight * np.outer(x, x)
+        self._count += np.sign(weight) * np.outer(m, m)
+
+    def _push(self, returns):
+        raise NotImplementedError("This method should be overridden by subclass")
+
+    def update(self, prices, ts=None):
+        """
+        Adds a bar of closes.
+
+        Parameters:
+            prices (array-like or dict): Closes in `symbols` order, or by symbol. NaN (or a
+                missing key) means no price for that symbol in this bar.
+            ts: Bar time. A bar with the same time as the previous one replaces it.
+        """
+        if isinstance(prices, dict):
+            row = np.full(len(self.symbols), np.nan)
+            for symbol, price in prices.items():
+                i = self.index.get(symbol)
+                if i is not None:
+                    row[i] = price
+            prices = row
+        prices = np.asarray(prices, dtype=float)
+
+        if ts is not None and ts == self._last_ts and self._saved is not None:
+            self._restore()
+            base = self._previous
+        else:
+            base = self._prices
+            self._previous = self._prices
+        self._save()
+        self._last_ts = ts
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            returns = np.log(prices / base)
+        # A symbol without a price keeps its last close, so its next return spans the gap
+        self._prices = np.where(prices > 0, prices, base)
+        if not np.isnan(returns).all():
+            self._push(returns)
+
+    def _save(self):
+        self._saved = [a.copy() for a in self._state()]
+
+    def _restore(self):
+        for array, saved in zip(self._state(), self._saved):
+            array[...] = saved
+
+    def covariance(self):
+        """
+        Returns:
+            numpy.ndarray: k x k covariance of log returns, NaN for pairs below `min_periods` bars.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            w = self._weight
+            cov = (self._cross - self._sum * self._sum.T / w) / (w - self.ddof)
+        cov[self._count < self.min_periods] = np.nan
+        return cov
+
+    def correlation(self):
+        """
+        Returns:
+            numpy.ndarray: k x k correlation of log returns, NaN for pairs below `min_periods` bars
+            or where one of the symbols didn't move.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            w = self._weight
+            var = self._sumsq - self._sum * self._sum / w  # i's variance over the bars shared with j
+            corr = (self._cross - self._sum * self._sum.T / w) / np.sqrt(var * var.T)
+        corr[(self._count < self.min_periods) | ~np.isfinite(corr)] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+    def top_pairs(self, n=10, absolute=False):
+        """
+        The most correlated pairs.
+
+        Parameters:
+            n (int): Number of pairs.
+            absolute (bool): Rank by |correlation|, so strongly anti-correlated pairs count too.
+
+        Returns:
+            list: (symbol, symbol, correlation) tuples, highest first.
+        """
+        corr = self.correlation()
+        i, j = np.triu_indices(len(self.symbols), k=1)
+        values = corr[i, j]
+        keys = np.abs(values) if absolute else values
+        keys = np.where(np.isnan(keys), -np.inf, keys)
+        n = min(n, int(np.isfinite(keys).sum()))
+        if n <= 0:
+            return []
+        top = np.argpartition(-keys, n - 1)[:n]
+        top = top[np.argsort(-keys[top])]
+        return [(self.symbols[i[t]], self.symbols[j[t]], float(values[t])) for t in top]
+
+    def clusters(self, threshold=0.7):
+        """
+        Groups symbols whose returns move together: two symbols are in the same cluster when
+        they are linked by a chain of pairs with correlation >= `threshold` (single linkage).
+
+        Returns:
+            list: Clusters as lists of symbols, largest first. Symbols without any such pair are
+            left out.
+        """
+        corr = self.correlation()
+        parent = list(range(len(self.symbols)))
+
+        def find(a):
+            while parent[a] != a:
+                parent[a] = parent[parent[a]]
+                a = parent[a]
+            return a
+
+        i, j = np.triu_indices(len(self.symbols), k=1)
+        linked = np.nan_to_num(corr[i, j], nan=-np.inf) >= threshold
+        for a, b in zip(i[linked].tolist(), j[linked].tolist()):
+            ra, rb = find(a), find(b)
+            if ra != rb:
+                parent[rb] = ra
+
+        groups = {}
+        for a in np.unique(np.concatenate([i[linked], j[linked]])).tolist():
+            groups.setdefault(find(a), []).append(self.symbols[a])
+        return sorted(groups.values(), key=len, reverse=True)
+
+    def to_frame(self, matrix=None):
+        """
+        Returns the correlation (or the given matrix) as a DataFrame labelled by symbol.
+        """
+        import pandas as pd
+
+        return pd.DataFrame(self.correlation() if matrix is None else matrix, index=self.symbols, columns=self.symbols)
+
+    @classmethod
+    def from_panel(cls, panel, **kwargs):
+        """
+        Builds an engine from a panel of closes (columns are symbols, rows are bars), e.g. the
+        one returned by `close_panel`, feeding it bar by bar. Later bars are added with `update`.
+        """
+        engine = cls(list(panel.columns), **kwargs)
+        for ts, row in zip(panel.index, panel.to_numpy(dtype=float)):
+            engine.update(row, ts)
+        return engine
+
+
+class RollingCovariance(_PairwiseMoments):
+    """
+    Covariance and correlation of log returns over the last `window` bars.
+
+    The returns of the window are kept in a ring buffer; the bar leaving the window is
+    subtracted from the running sums. The sums are rebuilt from the buffer once per window to
+    keep the floating point error of the subtractions from accumulating.
+
+    Attributes:
+        symbols (list): Symbols, in matrix order.
+        window (int): Number of returns covered.
+        min_periods (int): Minimum number of shared returns for a pair to get a value.
+    """
+    ddof = 1
+
+    def __init__(self, symbols, window=30, min_periods=2):
+        if window < 2:
+            raise ValueError("window must be at least 2")
+        super().__init__(symbols, min_periods)
+        self.window = window
+        self._buffer = np.full((window, len(self.symbols)), np.nan)
+        self._position = 0
+        self._since_rebuild = 0
+
+    def _save(self):
+        super()._save()
+        slot = self._position % self.window
+        self._saved.append((self._position, self._since_rebuild, self._buffer[slot].copy()))
+
+    def _restore(self):
+        self._position, self._since_rebuild, row = self._saved.pop()
+        self._buffer[self._position % self.window] = row
+        super()._restore()
+
+    def _push(self, returns):
+        slot = self._position % self.window
+        leaving = self._buffer[slot]
+        if not np.isnan(leaving).all():
+            self._add(leaving, ~np.isnan(leaving), -1.0)
+        self._buffer[slot] = returns
+        self._add(returns, ~np.isnan(returns))
+        self._position += 1
+        self._since_rebuild += 1
+        if self._since_rebuild >= self.window:
+            self._rebuild()
+
+    def _rebuild(self):
+        for array in self._state():
+            array.fill(0.0)
+        for row in self._buffer:
+            mask = row == row
+            if mask.any():
+                self._add(row, mask)
+        self._since_rebuild = 0
+
+
+class EWMCovariance(_PairwiseMoments):
+    """
+    Exponentially weighted covariance and correlation of log returns.
+
+    Every bar multiplies the previous weights by 0.5 ** (1 / halflife), so a return's weight
+    halves every `halflife` bars.
+
+    Attributes:
+        symbols (list): Symbols, in matrix order.
+        halflife (float): Half-life in bars.
+        min_periods (int): Minimum number of shared returns for a pair to get a value.
+    """
+    def __init__(self, symbols, halflife=20, min_periods=2):
+        if halflife <= 0:
+            raise ValueError("halflife must be positive")
+        super().__init__(symbols, min_periods)
+        self.halflife = halflife
+        self.decay = 0.5 ** (1.0 / halflife)
+
+    def _push(self, returns):
+        for array in (self._weight, self._sum, self._sumsq, self._cross):
+            array *= self.decay
+        self._add(returns, ~np.isnan(returns))
@@ -0,0 +1,351 @@
+"""
+Feature store: lagged and windowed indicator features exported as partitioned Arrow files.
+
+Features are computed one partition (calendar month) of one symbol and timeframe at a time,
+so building a multi-year training set never holds more than a month of bars (plus the lookback
+the lags and windows need, which is read again from the source before each partition). The
+output is one file per partition:
+
+    root/<timeframe>/<symbol>/<YYYY-MM>.arrow      (Arrow IPC, uncompressed: memory-mappable)
+    root/<timeframe>/<symbol>/<YYYY-MM>.parquet    (compressed, for storage and other tools)
+
+Every file has the same schema (see `FeatureSpec.schema`), stored with the parameters that
+produced it; exporting into a store built with other parameters raises instead of mixing them.
+Partitions that were complete when written are skipped by later exports, so re-exports only
+process new months (and the still-open current month).
+
+`FeatureReader` memory-maps the Arrow files: the tables it returns reference the file pages
+directly, without copying or deserializing, and float columns convert to NumPy without a copy.
+
+pyarrow is an optional dependency, only imported when the feature store is used.
+"""
+import json
+import os
+from datetime import datetime
+
+FORMAT_VERSION = 1
+
+# Columns of IndicatorSnapshot (and, lowercased, of BaseFinancialIndicators.data) used as features
+DEFAULT_COLUMNS = ('close', 'sma_50', 'ema_20', 'rsi', 'bollinger_upper', 'bollinger_lower', 'atr',
+                   'macd_line', 'signal_line', 'vwap', 'vwap_rolling_20')
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("The feature store requires pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def month_partitions(start, end):
+    """
+    Lists the calendar months overlapping [start, end).
+
+    Returns:
+        list: (name 'YYYY-MM', month start, next month start) tuples.
+    """
+    partitions = []
+    current = datetime(start.year, start.month, 1)
+    while current < end:
+        following = datetime(current.year + current.month // 12, current.month % 12 + 1, 1)
+        partitions.append((current.strftime('%Y-%m'), current, following))
+        current = following
+    return partitions
+
+
+class FeatureSpec:
+    """
+    Which features are computed from the indicator columns.
+
+    For every column: the value and its lags. From the close: log returns over each lag and,
+    for each window, the mean and standard deviation of the 1-bar log return and the z-score of
+    the close against its rolling mean.
+
+    Attributes:
+        columns (tuple): Indicator columns used.
+        lags (tuple): Lags in bars.
+        windows (tuple): Rolling window lengths in bars.
+    """
+    def __init__(self, columns=DEFAULT_COLUMNS, lags=(1, 2, 5, 10), windows=(5, 20, 60)):
+        if 'close' not in columns:
+            raise ValueError("'close' must be one of the columns")
+        self.columns = tuple(columns)
+        self.lags = tuple(sorted(lags))
+        self.windows = tuple(sorted(windows))
+
+    @property
+    def lookback(self):
+        """
+        Bars of history needed before the first bar of a partition.
+        """
+        return max(self.lags + self.windows, default=0)
+
+    @property
+    def feature_names(self):
+        names = list(self.columns)
+        names += [f'{column}_lag_{lag}' for column in self.columns for lag in self.lags]
+        names += [f'log_return_{lag}' for lag in self.lags]
+        for window in self.windows:
+            names += [f'log_return_mean_{window}', f'log_return_std_{window}', f'close_zscore_{window}']
+        return names
+
+    def params(self):
+        return {'version': FORMAT_VERSION, 'columns': list(self.columns), 'lags': list(self.lags),
+                'windows': list(self.windows)}
+
+    def schema(self):
+        """
+        The Arrow schema of every partition file.
+        """
+        pa = _pyarrow()
+        fields = [pa.field('ts', pa.timestamp('ms'), nullable=False),
+                  pa.field('symbol', pa.string(), nullable=False),
+                  pa.field('timeframe', pa.int32(), nullable=False)]
+        fields += [pa.field(name, pa.float64()) for name in self.feature_names]
+        return pa.schema(fields, metadata={'midas.features': json.dumps(self.params())})
+
+    def compute(self, ts, values):
+        """
+        Computes the features of consecutive bars.
+
+        Parameters:
+            ts (numpy.ndarray): Bar times, ascending (datetime64).
+            values (dict): One float array per column, aligned with `ts`.
+
+        Returns:
+            dict: One float64 array per feature name, aligned with `ts` (NaN until enough history).
+        """
+        import numpy as np
+        import pandas as pd
+
+        frame = pd.DataFrame({column: np.asarray(values[column], dtype=float) for column in self.columns})
+        features = {column: frame[column].to_numpy() for column in self.columns}
+        for column in self.columns:
+            for lag in self.lags:
+                features[f'{column}_lag_{lag}'] = frame[column].shift(lag).to_numpy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            log_close = pd.Series(np.log(frame['close'].to_numpy()))
+        for lag in self.lags:
+            features[f'log_return_{lag}'] = (log_close - log_close.shift(lag)).to_numpy()
+        one_bar = log_close.diff()
+        for window in self.windows:
+            rolling = frame['close'].rolling(window)
+            features[f'log_return_mean_{window}'] = one_bar.rolling(window).mean().to_numpy()
+            features[f'log_return_std_{window}'] = one_bar.rolling(window).std().to_numpy()
+            features[f'close_zscore_{window}'] = ((frame['close'] - rolling.mean()) / rolling.std()).to_numpy()
+        return features
+
+
+def history_source(history, provider):
+    """
+    A feature source over stored snapshots of one provider.
+
+    Parameters:
+        history (callable): IndicatorSnapshot.history, or a reader with the same signature.
+        provider (str): Provider name, e.g. 'bitso'.
+    """
+    def source(symbol, timeframe, start, end, columns):
+        return history(symbol, provider, timeframe, start, end, columns)
+    return source
+
+
+def frame_source(frames):
+    """
+    A feature source over in-memory indicator DataFrames, e.g. BaseFinancialIndicators.data.
+
+    Parameters:
+        frames (dict): DataFrames (DatetimeIndex, indicator columns) by (symbol, timeframe).
+            Column names are matched case-insensitively ('SMA_50' -> 'sma_50').
+    """
+    import numpy as np
+
+    def source(symbol, timeframe, start, end, columns):
+        frame = frames[(symbol, timeframe)]
+        if frame.index.tz is not None:
+            frame = frame.tz_convert('UTC').tz_localize(None)
+        frame = frame[(frame.index >= start) & (frame.index < end)]
+        lower = {name.lower(): name for name in frame.columns}
+        result = {'ts': frame.index.to_numpy(dtype='datetime64[ms]')}
+        for column in columns:
+            name = lower.get(column)
+            result[column] = frame[name].to_numpy(dtype=float) if name else np.full(len(frame), np.nan)
+        return result
+    return source
+
+
+class FeatureStore:
+    """
+    Writes feature partitions.
+
+    Attributes:
+        root (str): Directory of the store.
+        spec (FeatureSpec): Features computed.
+        format (str): 'arrow' (memory-mappable, default) or 'parquet'.
+    """
+    def __init__(self, root, spec=None, format='arrow'):
+        if format not in ('arrow', 'parquet'):
+            raise ValueError(f"format must be 'arrow' or 'parquet', got '{format}'")
+        self.root = root
+        self.spec = spec or FeatureSpec()
+        self.format = format
+        self.schema = self.spec.schema()
+
+    def path(self, symbol, timeframe, partition):
+        return os.path.join(self.root, str(timeframe), symbol, f'{partition}.{self.format}')
+
+    def _stored_metadata(self, path):
+        pa = _pyarrow()
+        if self.format == 'arrow':
+            with pa.memory_map(path) as source:
+                metadata = pa.ipc.open_file(source).schema.metadata or {}
+        else:
+            metadata = pa.parquet.read_schema(path).metadata or {}
+        return metadata
+
+    def _is_complete(self, path):
+        """
+        True if the partition file exists and was complete when written. Raises if it was
+        written with other feature parameters.
+        """
+        if not os.path.exists(path):
+            return False
+        metadata = self._stored_metadata(path)
+        stored = json.loads(metadata.get(b'midas.features', b'{}'))
+        if stored != self.spec.params():
+            raise ValueError(f"{path} was exported with other feature parameters: {stored}")
+        return metadata.get(b'midas.complete') == b'true'
+
+    def export(self, source, keys, start, end, now=None):
+        """
+        Exports the features of every (symbol, timeframe) in `keys` for [start, end).
+
+        Parameters:
+            source (callable): source(symbol, timeframe, start, end, columns) -> {'ts': datetime64
+                array, column: float array}, rows ascending by ts; see history_source and frame_source.
+            keys (iterable): (symbol, timeframe in seconds) pairs.
+            start (datetime): Start of the range (naive UTC).
+            end (datetime): End of the range, exclusive.
+            now (datetime): Current time, to tell closed months from the open one. Defaults to utcnow.
+
+        Returns:
+            dict: Counts of 'written' and 'skipped' partitions and exported 'rows'.
+        """
+        import numpy as np
+        from datetime import timedelta, timezone
+
+        pa = _pyarrow()
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        stats = {'written': 0, 'skipped': 0, 'rows': 0}
+        for symbol, timeframe in keys:
+            # Twice the lookback in time, so a few missing bars don't leave the first rows without history
+            lookback = timedelta(seconds=2 * self.spec.lookback * timeframe)
+            for partition, month_start, month_end in month_partitions(start, end):
+                part_start, part_end = max(month_start, start), min(month_end, end)
+                path = self.path(symbol, timeframe, partition)
+                if self._is_complete(path):
+                    stats['skipped'] += 1
+                    continue
+                data = source(symbol, timeframe, part_start - lookback, part_end, list(self.spec.columns))
+                ts = np.asarray(data['ts'], dtype='datetime64[ms]')
+                keep = ts >= np.datetime64(part_start, 'ms')
+                if not keep.any():
+                    continue
+                features = self.spec.compute(ts, data)
+                count = int(keep.sum())
+                arrays = [pa.array(ts[keep], type=pa.timestamp('ms')),
+                          pa.array([symbol] * count, type=pa.string()),
+                          pa.array(np.full(count, timeframe, dtype=np.int32))]
+                arrays += [pa.array(features[name][keep], type=pa.float64()) for name in self.spec.feature_names]
+                complete = part_start == month_start and part_end == month_end and month_end <= now
+                schema = self.schema.with_metadata({**self.schema.metadata,
+                                                    b'midas.complete': b'true' if complete else b'false'})
+                self._write(pa.Table.from_arrays(arrays, schema=schema), path)
+                stats['written'] += 1
+                stats['rows'] += count
+        return stats
+
+    def _write(self, table, path):
+        pa = _pyarrow()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.tmp'
+        if self.format == 'arrow':
+            with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=65536)
+        else:
+            pa.parquet.write_table(table, tmp, compression='zstd')
+        os.replace(tmp, path)  # readers never see a half-written partition
+
+
+class FeatureReader:
+    """
+    Zero-copy reader of the Arrow partitions of a store, for training loops.
+
+    Attributes:
+        root (str): Directory of the store.
+        timeframe (int): Timeframe to read, or None for all.
+        symbols (list): Symbols to read, or None for all.
+        start (str): First partition to read ('YYYY-MM'), or None.
+        end (str): Last partition to read ('YYYY-MM', inclusive), or None.
+    """
+    def __init__(self, root, timeframe=None, symbols=None, start=None, end=None):
+        self.root = root
+        self.timeframe = timeframe
+        self.symbols = set(symbols) if symbols is not None else None
+        self.start = start
+        self.end = end
+
+    def paths(self):
+        """
+        The Arrow partition files selected, ordered by timeframe, symbol and month.
+        """
+        paths = []
+        timeframes = [str(self.timeframe)] if self.timeframe is not None else sorted(os.listdir(self.root))
+        for timeframe in timeframes:
+            directory = os.path.join(self.root, timeframe)
+            if not os.path.isdir(directory):
+                continue
+            for symbol in sorted(os.listdir(directory)):
+                if self.symbols is not None and symbol not in self.symbols:
+                    continue
+                for name in sorted(os.listdir(os.path.join(directory, symbol))):
+                    partition, extension = os.path.splitext(name)
+                    if extension != '.arrow':
+                        continue
+                    if (self.start and partition < self.start) or (self.end and partition > self.end):
+                        continue
+                    paths.append(os.path.join(directory, symbol, name))
+        return paths
+
+    def tables(self, columns=None):
+        """
+        Yields each partition as a memory-mapped pyarrow Table (no data is copied or decoded).
+
+        Parameters:
+            columns (list): Columns to keep, or None for all.
+        """
+        pa = _pyarrow()
+        for path in self.paths():
+            with pa.memory_map(path) as source:
+                table = pa.ipc.open_file(source).read_all()
+            yield table.select(columns) if columns is not None else table
+
+    def batches(self, columns=None):
+        """
+        Yields the record batches of every partition, memory-mapped.
+        """
+        for table in self.tables(columns):
+            yield from table.to_batches()
+
+    @staticmethod
+    def to_numpy(batch, columns):
+        """
+        Stacks float feature columns of a record batch into an (n, len(columns)) array.
+
+        Each column is viewed without a copy; only the stacking copies, once per batch.
+        """
+        import numpy as np
+
+        return np.column_stack([batch.column(name).to_numpy(zero_copy_only=True) for name in columns])
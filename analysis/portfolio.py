@@ -0,0 +1,437 @@
+"""
+Portfolio bookkeeping and pre-trade risk checks.
+
+`Portfolio` keeps positions in NumPy arrays indexed by symbol (quantity, average cost, last
+price), valued in a single quote currency. It can be fed the fills of the paper-trading engine
+(as its `fill_sink`) and marked to the latest closes.
+
+Risk measures are vectorized over the return history:
+- `historical_var`: VaR and CVaR from the empirical distribution of portfolio returns.
+- `parametric_var`: VaR and CVaR assuming normal returns with a given covariance (e.g. the
+  one maintained by analysis.correlation).
+- `volatility_target_size`: position sizes that risk a fixed share of equity per ATR (or per
+  Bollinger band standard deviation when ATR isn't available).
+
+`RiskManager.check_order` enforces `RiskLimits` before an order reaches a trading path. It only
+does scalar arithmetic on cached totals (and keeps Σ·exposure cached for the VaR limit), so a
+check costs a few microseconds and can sit on the signal path.
+"""
+from statistics import NormalDist
+
+import numpy as np
+
+from trading.paper_trading import OrderRejected
+
+
+class RiskLimitExceeded(OrderRejected):
+    """
+    Raised when an order would break a risk limit.
+
+    Attributes:
+        limit (str): Name of the limit, as in RiskLimits.
+        value (float): Value the order would reach.
+        maximum (float): Configured maximum.
+    """
+    def __init__(self, limit, value, maximum):
+        super().__init__(f"Order would take {limit} to {value:.6g}, above the maximum of {maximum:.6g}")
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+
+
+def historical_var(returns, exposures=None, confidence=0.99, horizon=1):
+    """
+    Historical Value at Risk and Conditional VaR (expected shortfall).
+
+    Parameters:
+        returns (array-like): Returns per bar, either of the portfolio (n,) or per symbol (n, k).
+            Rows with NaN are skipped.
+        exposures (array-like): Value held per symbol (k,) when `returns` is per symbol. Without
+            it the result is a fraction of the portfolio value.
+        confidence (float or array-like): Confidence level(s), e.g. 0.99.
+        horizon (int): Horizon in bars; the one-bar figures are scaled by sqrt(horizon).
+
+    Returns:
+        tuple: (VaR, CVaR) as positive losses, floats or arrays matching `confidence`.
+    """
+    returns = np.asarray(returns, dtype=float)
+    pnl = returns @ np.asarray(exposures, dtype=float) if exposures is not None else returns
+    if pnl.ndim > 1:
+        raise ValueError("exposures are required for per-symbol returns")
+    losses = -pnl[~np.isnan(pnl)]
+    if not len(losses):
+        raise ValueError("no complete return rows")
+    confidence = np.asarray(confidence, dtype=float)
+    var = np.quantile(losses, confidence)
+    ordered = np.sort(losses)
+    # Mean of the losses at or beyond each VaR, from the cumulative sums of the sorted losses
+    start = np.searchsorted(ordered, var, side='left')
+    tail_sum = np.concatenate([np.cumsum(ordered[::-1])[::-1], [0.0]])
+    cvar = tail_sum[start] / np.maximum(len(ordered) - start, 1)
+    scale = np.sqrt(horizon)
+    if var.ndim == 0:
+        return float(var) * scale, float(cvar) * scale
+    return var * scale, cvar * scale
+
+
+def parametric_var(exposures, covariance, confidence=0.99, horizon=1, mean=None):
+    """
+    Parametric (variance-covariance) VaR and CVaR under normally distributed returns.
+
+    Parameters:
+        exposures (array-like): Value held per symbol (k,).
+        covariance (array-like): Covariance of the symbols' returns per bar (k, k). NaN entries
+            (pairs without enough history) count as 0.
+        confidence (float or array-like): Confidence level(s).
+        horizon (int): Horizon in bars.
+        mean (array-like): Expected return per symbol and bar. Default 0.
+
+    Returns:
+        tuple: (VaR, CVaR) as positive losses, floats or arrays matching `confidence`.
+    """
+    exposures = np.asarray(exposures, dtype=float)
+    covariance = np.nan_to_num(np.asarray(covariance, dtype=float))
+    sigma = np.sqrt(max(float(exposures @ covariance @ exposures), 0.0) * horizon)
+    mu = float(exposures @ np.asarray(mean, dtype=float)) * horizon if mean is not None else 0.0
+    normal = NormalDist()
+    confidence = np.asarray(confidence, dtype=float)
+    z = np.vectorize(normal.inv_cdf)(confidence)
+    pdf = np.exp(-0.5 * z * z) / np.sqrt(2 * np.pi)
+    var = z * sigma - mu
+    cvar = sigma * pdf / (1 - confidence) - mu
+    if var.ndim == 0:
+        return float(var), float(cvar)
+    return var, cvar
+
+
+def volatility_target_size(equity, price, atr=None, bollinger_upper=None, bollinger_lower=None,
+                           risk_per_trade=0.01, atr_multiple=2.0, num_std_dev=2, max_weight=None):
+    """
+    Position size that risks `risk_per_trade` of equity on a move of `atr_multiple` ATRs.
+
+    When the ATR is missing (NaN or None) the per-bar volatility is estimated from the Bollinger
+    bands instead: (upper - lower) / (2 * num_std_dev) is the standard deviation of the close.
+    Works elementwise on arrays, e.g. one entry per symbol.
+
+    Parameters:
+        equity (float): Portfolio value.
+        price (float or array): Current price.
+        atr (float or array): Average True Range.
+        bollinger_upper (float or array): Upper Bollinger band.
+        bollinger_lower (float or array): Lower Bollinger band.
+        risk_per_trade (float): Share of equity at risk per position. Default 1%.
+        atr_multiple (float): Adverse move, in volatility units, the position must survive.
+        num_std_dev (float): Standard deviations the Bollinger bands were computed with.
+        max_weight (float): Cap on the position value as a share of equity, if any.
+
+    Returns:
+        float or numpy.ndarray: Quantity in base currency (0 where no volatility is available).
+    """
+    price = np.asarray(price, dtype=float)
+    volatility = np.full(price.shape, np.nan) if atr is None else np.asarray(atr, dtype=float)
+    if bollinger_upper is not None and bollinger_lower is not None:
+        band = (np.asarray(bollinger_upper, dtype=float) - np.asarray(bollinger_lower, dtype=float)) / (2 * num_std_dev)
+        volatility = np.where(np.isnan(volatility), band, volatility)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        size = equity * risk_per_trade / (atr_multiple * volatility)
+        if max_weight is not None:
+            size = np.minimum(size, equity * max_weight / price)
+    size = np.where(np.isfinite(size) & (size > 0), size, 0.0)
+    return float(size) if size.ndim == 0 else size
+
+
+class Portfolio:
+    """
+    Positions valued in one quote currency, stored in NumPy arrays.
+
+    Attributes:
+        quote (str): Quote currency, e.g. 'usd'. Symbols are books in it, e.g. 'btc_usd'.
+        cash (float): Quote currency balance.
+        symbols (list): Symbols in array order.
+        quantity (numpy.ndarray): Position per symbol in base currency (negative when short).
+        cost (numpy.ndarray): Average entry price per symbol.
+        price (numpy.ndarray): Last known price per symbol (NaN until marked or traded).
+    """
+    def __init__(self, cash=0.0, quote='usd', capacity=64):
+        self.quote = quote
+        self.cash = float(cash)
+        self.symbols = []
+        self.index = {}
+        self._quantity = np.zeros(capacity)
+        self._cost = np.zeros(capacity)
+        self._price = np.full(capacity, np.nan)
+        self.version = 0  # bumped on every change, for caches built on the positions
+
+    @property
+    def quantity(self):
+        return self._quantity[:len(self.symbols)]
+
+    @property
+    def cost(self):
+        return self._cost[:len(self.symbols)]
+
+    @property
+    def price(self):
+        return self._price[:len(self.symbols)]
+
+    def slot(self, symbol):
+        """
+        Returns the array index of a symbol, adding it if needed.
+        """
+        i = self.index.get(symbol)
+        if i is None:
+            i = len(self.symbols)
+            if i == len(self._quantity):
+                grow = len(self._quantity)
+                self._quantity = np.concatenate([self._quantity, np.zeros(grow)])
+                self._cost = np.concatenate([self._cost, np.zeros(grow)])
+                self._price = np.concatenate([self._price, np.full(grow, np.nan)])
+            self.symbols.append(symbol)
+            self.index[symbol] = i
+        return i
+
+    def apply_fill(self, symbol, side, amount, price, fee=0.0):
+        """
+        Books a trade: updates the position, its average cost and the cash.
+
+        Parameters:
+            symbol (str): Book, e.g. 'btc_usd'.
+            side (str): 'buy' or 'sell'.
+            amount (float): Amount in base currency.
+            price (float): Trade price.
+            fee (float): Fee paid in quote currency.
+        """
+        i = self.slot(symbol)
+        signed = amount if side == 'buy' else -amount
+        held = self._quantity[i]
+        new = held + signed
+        if held == 0 or (held > 0) == (signed > 0):
+            self._cost[i] = (self._cost[i] * held + price * signed) / new  # adding to the position
+        elif (new > 0) != (held > 0) and new != 0:
+            self._cost[i] = price  # flipped sides: the remainder was opened at this price
+        self._quantity[i] = new
+        self._price[i] = price
+        self.cash -= signed * price + fee
+        self.version += 1
+
+    def on_fills(self, fills):
+        """
+        Books a batch of trading.paper_trading.Fill; usable as the engine's `fill_sink`.
+        """
+        for fill in fills:
+            self.apply_fill(fill.symbol, fill.side, fill.amount, fill.price, fill.fee)
+
+    def mark(self, prices):
+        """
+        Updates the last prices.
+
+        Parameters:
+            prices (dict): Prices by symbol, e.g. the latest closes.
+        """
+        for symbol, price in prices.items():
+            self._price[self.slot(symbol)] = price
+        self.version += 1
+
+    def exposures(self):
+        """
+        Returns:
+            numpy.ndarray: Value of each position at the last prices (0 where no price is known).
+        """
+        return np.nan_to_num(self.quantity * self.price)
+
+    def equity(self):
+        """
+        Cash plus the value of all positions.
+        """
+        return self.cash + float(self.exposures().sum())
+
+    def exposure(self):
+        """
+        Summary of the exposure at the last prices.
+
+        Returns:
+            dict: 'equity', 'long', 'short' (positive value), 'gross', 'net', 'leverage' (gross /
+            equity) and 'weights' (value per symbol / equity, by symbol).
+        """
+        values = self.exposures()
+        long = float(values[values > 0].sum())
+        short = abs(float(values[values < 0].sum()))
+        equity = self.cash + long - short
+        return {
+            'equity': equity,
+            'long': long,
+            'short': short,
+            'gross': long + short,
+            'net': long - short,
+            'leverage': (long + short) / equity if equity > 0 else float('inf'),
+            'weights': {s: float(v) / equity if equity else float('nan') for s, v in zip(self.symbols, values)},
+        }
+
+    def historical_var(self, returns, confidence=0.99, horizon=1):
+        """
+        Historical VaR and CVaR of the current positions.
+
+        Parameters:
+            returns (DataFrame): Returns per bar with one column per symbol (e.g. the pct_change of
+                the close panel). Symbols held but missing from it contribute nothing.
+            confidence (float or array-like): Confidence level(s).
+            horizon (int): Horizon in bars.
+
+        Returns:
+            tuple: (VaR, CVaR) in quote currency.
+        """
+        matrix = returns.reindex(columns=self.symbols).fillna(0.0).to_numpy(dtype=float)
+        return historical_var(matrix, self.exposures(), confidence, horizon)
+
+    def parametric_var(self, covariance, symbols, confidence=0.99, horizon=1):
+        """
+        Parametric VaR and CVaR of the current positions.
+
+        Parameters:
+            covariance (array-like): Covariance of returns, in the order of `symbols`.
+            symbols (list): Symbols of the covariance rows, e.g. RollingCovariance.symbols.
+            confidence (float or array-like): Confidence level(s).
+            horizon (int): Horizon in bars.
+
+        Returns:
+            tuple: (VaR, CVaR) in quote currency.
+        """
+        exposures = self.exposures()
+        aligned = np.array([exposures[self.index[s]] if s in self.index else 0.0 for s in symbols])
+        return parametric_var(aligned, covariance, confidence, horizon)
+
+
+class RiskLimits:
+    """
+    Pre-trade limits. None disables a limit.
+
+    Attributes:
+        max_order_value (float): Maximum value of a single order, in quote currency.
+        max_position_value (float): Maximum absolute value of the position in one symbol.
+        max_concentration (float): Maximum absolute value in one symbol as a share of equity.
+        max_leverage (float): Maximum gross exposure / equity.
+        max_var (float): Maximum one-bar parametric VaR as a share of equity.
+        var_confidence (float): Confidence level of the VaR limit.
+    """
+    __slots__ = ('max_order_value', 'max_position_value', 'max_concentration', 'max_leverage', 'max_var',
+                 'var_confidence')
+
+    def __init__(self, max_order_value=None, max_position_value=None, max_concentration=None, max_leverage=1.0,
+                 max_var=None, var_confidence=0.99):
+        self.max_order_value = max_order_value
+        self.max_position_value = max_position_value
+        self.max_concentration = max_concentration
+        self.max_leverage = max_leverage
+        self.max_var = max_var
+        self.var_confidence = var_confidence
+
+
+class RiskManager:
+    """
+    Checks orders against RiskLimits using the positions of a Portfolio.
+
+    Pass it as `risk_check` to PaperTradingEngine (or call `check_order` before sending an order
+    anywhere else): the engine flushes its pending fills into the portfolio first, so checks see
+    the positions after every previous trade.
+
+    Attributes:
+        portfolio (Portfolio): Positions being guarded.
+        limits (RiskLimits): Limits enforced.
+        account (str): Only orders of this engine account are checked. None checks every account.
+    """
+    def __init__(self, portfolio, limits=None, account=None):
+        self.portfolio = portfolio
+        self.limits = limits or RiskLimits()
+        self.account = account
+        self._z = NormalDist().inv_cdf(self.limits.var_confidence)
+        self._covariance = None
+        self._cached_version = None
+        self._totals = None
+
+    def set_covariance(self, covariance, symbols):
+        """
+        Sets the return covariance used by the VaR limit, e.g. from RollingCovariance.
+        """
+        covariance = np.nan_to_num(np.asarray(covariance, dtype=float))
+        slots = [self.portfolio.slot(s) for s in symbols]
+        size = len(self.portfolio.symbols)
+        full = np.zeros((size, size))
+        full[np.ix_(slots, slots)] = covariance
+        self._covariance = full
+        self._cached_version = None
+
+    def _refresh(self):
+        """
+        Recomputes the cached totals when the portfolio changed since the last check.
+        """
+        portfolio = self.portfolio
+        exposures = portfolio.exposures()
+        gross = float(np.abs(exposures).sum())
+        equity = portfolio.cash + float(exposures.sum())
+        sigma_exposure = variance = None
+        if self._covariance is not None:
+            size = len(exposures)
+            covariance = self._covariance
+            if len(covariance) < size:  # symbols added since set_covariance have no history yet
+                covariance = np.zeros((size, size))
+                covariance[:len(self._covariance), :len(self._covariance)] = self._covariance
+                self._covariance = covariance
+            sigma_exposure = (covariance @ exposures).tolist()
+            variance = float(exposures @ sigma_exposure)
+        self._totals = (exposures.tolist(), gross, equity, sigma_exposure, variance)
+        self._cached_version = portfolio.version
+
+    def check_order(self, account, symbol, side, amount, price=None):
+        """
+        Raises if the order would break a limit; returns None otherwise.
+
+        Parameters:
+            account (str): Engine account of the order.
+            symbol (str): Book.
+            side (str): 'buy' or 'sell'.
+            amount (float): Amount in base currency.
+            price (float): Expected execution price. Defaults to the portfolio's last price.
+
+        Raises:
+            RiskLimitExceeded: If a limit would be exceeded.
+            OrderRejected: If there is no price to value the order.
+        """
+        if self.account is not None and account != self.account:
+            return
+        portfolio = self.portfolio
+        i = portfolio.slot(symbol)
+        if self._cached_version != portfolio.version:
+            self._refresh()
+        if price is None:
+            price = portfolio._price[i]
+            if price != price:
+                raise OrderRejected(f"No price to value the order on {symbol}")
+        limits = self.limits
+        exposures, gross, equity, sigma_exposure, variance = self._totals
+        held = exposures[i] if i < len(exposures) else 0.0
+        change = amount * price if side == 'buy' else -amount * price
+        position = held + change  # a trade swaps cash for position at its price: equity is unchanged
+
+        order_value = abs(change)
+        if limits.max_order_value is not None and order_value > limits.max_order_value:
+            raise RiskLimitExceeded('max_order_value', order_value, limits.max_order_value)
+        if limits.max_position_value is not None and abs(position) > limits.max_position_value:
+            raise RiskLimitExceeded('max_position_value', abs(position), limits.max_position_value)
+        if equity <= 0 and change:
+            raise RiskLimitExceeded('equity', equity, 0.0)
+        if limits.max_concentration is not None:
+            concentration = abs(position) / equity
+            if concentration > limits.max_concentration and abs(position) > abs(held):
+                raise RiskLimitExceeded('max_concentration', concentration, limits.max_concentration)
+        if limits.max_leverage is not None:
+            leverage = (gross - abs(held) + abs(position)) / equity
+            if leverage > limits.max_leverage and abs(position) > abs(held):
+                raise RiskLimitExceeded('max_leverage', leverage, limits.max_leverage)
+        if limits.max_var is not None and variance is not None and i < len(sigma_exposure):
+            # (e + d·u)' Σ (e + d·u) = e'Σe + 2d(Σe)_i + d²Σ_ii
+            new_variance = variance + 2 * change * sigma_exposure[i] + change * change * self._covariance[i, i]
+            var = self._z * max(new_variance, 0.0) ** 0.5 / equity
+            if var > limits.max_var and new_variance > variance:
+                raise RiskLimitExceeded('max_var', var, limits.max_var)
+
+    __call__ = check_order
@@ -1,6 +1,10 @@
-import openai
+from api.instrumentation import timed
+
+
 class TechnicalAnalysis:
     def __init__(self, api_key):
+        import openai
+
         self.client = openai.OpenAI(api_key=api_key)
 
     def prepare_summary(self, latest_close, latest_ema_20, latest_sma_50):
@@ -9,6 +13,7 @@ class TechnicalAnalysis:
                    "Por favor, proporciona un análisis detallado y una recomendación."
         return summary
 
+    @timed('llm.openai')
     def get_openai_response(self, prompt, summary):
         response = self.client.chat.completions.with_raw_response.create(
             messages=[
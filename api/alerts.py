@@ -0,0 +1,465 @@
+"""
+Alerts on indicator values and their delivery.
+
+Rules are registered on an `AlertEngine` and indexed by (symbol, indicator):
+
+- `ThresholdRule` fires when a value crosses a level ('above': from under the level to at or
+  above it; 'below': from at or above it to under it). Per (symbol, indicator) the levels are
+  kept sorted, so a new value only looks at the levels between the previous and the new value
+  (two bisects) instead of every rule.
+- `CrossoverRule` fires when one indicator crosses another (e.g. MACD_Line over Signal_Line,
+  Close under SMA_50). Rules on the same pair share one sign comparison.
+
+`AlertEngine.evaluate` is meant to be called with every snapshot of a symbol; its cost depends
+on the rules of that symbol that actually fire, not on the total number of rules. The first
+value seen for a symbol only sets the baseline: crossings need a previous value.
+
+Alerts are handed to a `Notifier`, which drops repeats of the same rule and destination within
+a dedup window, groups alerts per destination and delivers the batches from a background thread
+through pluggable sinks chosen by the destination's scheme:
+
+    webhook:https://example.com/hook   -> WebhookSink (JSON POST through the shared HTTP client)
+    email:trader@example.com           -> EmailSink (SMTP)
+    memory:anything                    -> MemorySink (keeps the batches; stand-in for tests and dev)
+"""
+import itertools
+import json
+import os
+import smtplib
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from email.message import EmailMessage
+
+from api.instrumentation import registry, timed
+
+Alert = namedtuple('Alert', 'ts rule_id symbol indicator value threshold kind destination message')
+
+
+class ThresholdRule:
+    """
+    Fires when `indicator` of `symbol` crosses `threshold`.
+
+    Attributes:
+        symbol (str): Symbol, e.g. 'btc_usd'.
+        indicator (str): Key of get_all_indicator_values(), or 'Close'.
+        threshold (float): Level.
+        direction (str): 'above' or 'below'.
+        destination (str): Where to notify, e.g. 'webhook:https://...'.
+        message (str): Optional text, formatted with the alert's fields.
+    """
+    __slots__ = ('rule_id', 'symbol', 'indicator', 'threshold', 'direction', 'destination', 'message')
+
+    def __init__(self, symbol, indicator, threshold, direction, destination, message=None):
+        if direction not in ('above', 'below'):
+            raise ValueError(f"direction must be 'above' or 'below', got '{direction}'")
+        self.rule_id = None
+        self.symbol = symbol
+        self.indicator = indicator
+        self.threshold = float(threshold)
+        self.direction = direction
+        self.destination = destination
+        self.message = message
+
+
+class CrossoverRule:
+    """
+    Fires when indicator `fast` of `symbol` crosses indicator `slow`.
+
+    Attributes:
+        symbol (str): Symbol.
+        fast (str): Indicator that crosses, e.g. 'MACD_Line' or 'Close'.
+        slow (str): Indicator crossed, e.g. 'Signal_Line' or 'SMA_50'.
+        direction (str): 'above' (fast goes over slow) or 'below'.
+        destination (str): Where to notify.
+        message (str): Optional text, formatted with the alert's fields.
+    """
+    __slots__ = ('rule_id', 'symbol', 'fast', 'slow', 'direction', 'destination', 'message')
+
+    def __init__(self, symbol, fast, slow, direction, destination, message=None):
+        if direction not in ('above', 'below'):
+            raise ValueError(f"direction must be 'above' or 'below', got '{direction}'")
+        self.rule_id = None
+        self.symbol = symbol
+        self.fast = fast
+        self.slow = slow
+        self.direction = direction
+        self.destination = destination
+        self.message = message
+
+
+class _Levels:
+    """
+    Threshold rules of one (symbol, indicator) and direction, sorted by level.
+    """
+    __slots__ = ('keys', 'rules')
+
+    def __init__(self):
+        self.keys = []
+        self.rules = []
+
+    def add(self, rule):
+        i = bisect_right(self.keys, rule.threshold)
+        self.keys.insert(i, rule.threshold)
+        self.rules.insert(i, rule)
+
+    def remove(self, rule):
+        i = bisect_left(self.keys, rule.threshold)
+        while self.rules[i] is not rule:
+            i += 1
+        del self.keys[i]
+        del self.rules[i]
+
+
+class AlertEngine:
+    """
+    Rule index and evaluation.
+
+    Attributes:
+        notifier (Notifier): Receives the alerts of every evaluation, if set.
+        rules (dict): Registered rules by id.
+    """
+    def __init__(self, notifier=None):
+        self.notifier = notifier
+        self.rules = {}
+        self._ids = itertools.count(1)
+        self._thresholds = {}  # symbol -> indicator -> {'above': _Levels, 'below': _Levels}
+        self._crossovers = {}  # symbol -> (fast, slow) -> [rules]
+        self._last = {}  # symbol -> {indicator: value}
+        self._lock = threading.Lock()
+
+    def add_rule(self, rule):
+        """
+        Registers a rule.
+
+        Returns:
+            int: The rule id, for `remove_rule`.
+        """
+        with self._lock:
+            rule.rule_id = next(self._ids)
+            self.rules[rule.rule_id] = rule
+            if isinstance(rule, ThresholdRule):
+                sides = self._thresholds.setdefault(rule.symbol, {}).setdefault(
+                    rule.indicator, {'above': _Levels(), 'below': _Levels()})
+                sides[rule.direction].add(rule)
+            else:
+                self._crossovers.setdefault(rule.symbol, {}).setdefault((rule.fast, rule.slow), []).append(rule)
+        return rule.rule_id
+
+    def remove_rule(self, rule_id):
+        """
+        Unregisters a rule.
+
+        Returns:
+            bool: False if there was no rule with that id.
+        """
+        with self._lock:
+            rule = self.rules.pop(rule_id, None)
+            if rule is None:
+                return False
+            if isinstance(rule, ThresholdRule):
+                self._thresholds[rule.symbol][rule.indicator][rule.direction].remove(rule)
+            else:
+                self._crossovers[rule.symbol][(rule.fast, rule.slow)].remove(rule)
+        return True
+
+    def load_rules(self, path):
+        """
+        Registers the rules of a JSON file: a list of objects with the constructor arguments of
+        ThresholdRule (those with 'threshold') or CrossoverRule (those with 'fast' and 'slow').
+
+        Returns:
+            list: The ids of the registered rules.
+        """
+        with open(path) as f:
+            specs = json.load(f)
+        return [self.add_rule(ThresholdRule(**spec) if 'threshold' in spec else CrossoverRule(**spec))
+                for spec in specs]
+
+    def evaluate(self, symbol, values, ts=None):
+        """
+        Checks a new snapshot of a symbol against its rules.
+
+        Parameters:
+            symbol (str): Symbol.
+            values (dict): Indicator values, e.g. get_all_indicator_values() plus 'Close'.
+            ts (float): Snapshot time in seconds. Defaults to now.
+
+        Returns:
+            list: The Alerts fired (also handed to the notifier).
+        """
+        ts = time.time() if ts is None else ts
+        alerts = []
+        with self._lock:
+            previous = self._last.setdefault(symbol, {})
+            thresholds = self._thresholds.get(symbol)
+            if thresholds:
+                for indicator, sides in thresholds.items():
+                    value = values.get(indicator)
+                    if value is None or value != value:
+                        continue
+                    last = previous.get(indicator)
+                    if last is not None and last != value:
+                        if value > last:  # levels in (last, value] were crossed upwards
+                            levels = sides['above']
+                            hit = levels.rules[bisect_right(levels.keys, last):bisect_right(levels.keys, value)]
+                        else:  # levels in (value, last] were crossed downwards
+                            levels = sides['below']
+                            hit = levels.rules[bisect_right(levels.keys, value):bisect_right(levels.keys, last)]
+                        alerts.extend(self._alert(ts, rule, rule.indicator, value, rule.threshold) for rule in hit)
+            crossovers = self._crossovers.get(symbol)
+            if crossovers:
+                for (fast, slow), rules in crossovers.items():
+                    alerts.extend(self._crossings(ts, previous, values, fast, slow, rules))
+            for key, value in values.items():
+                if value is not None and value == value:
+                    previous[key] = value
+        if alerts:
+            registry.increment('alerts.fired', len(alerts))
+            if self.notifier is not None:
+                self.notifier.notify(alerts)
+        return alerts
+
+    def _crossings(self, ts, previous, values, fast, slow, rules):
+        now_fast, now_slow = values.get(fast), values.get(slow)
+        last_fast, last_slow = previous.get(fast), previous.get(slow)
+        if None in (now_fast, now_slow, last_fast, last_slow) or now_fast != now_fast or now_slow != now_slow:
+            return []
+        before, after = last_fast - last_slow, now_fast - now_slow
+        if before < 0 <= after:
+            direction = 'above'
+        elif before >= 0 > after:
+            direction = 'below'
+        else:
+            return []
+        return [self._alert(ts, rule, fast, now_fast, now_slow) for rule in rules if rule.direction == direction]
+
+    @staticmethod
+    def _alert(ts, rule, indicator, value, threshold):
+        kind = 'threshold' if isinstance(rule, ThresholdRule) else 'crossover'
+        if rule.message:
+            message = rule.message.format(symbol=rule.symbol, indicator=indicator, value=value, threshold=threshold,
+                                          direction=rule.direction)
+        elif kind == 'threshold':
+            message = f"{rule.symbol} {indicator} crossed {rule.direction} {threshold:g}: {value:g}"
+        else:
+            message = f"{rule.symbol} {rule.fast} crossed {rule.direction} {rule.slow}: {value:g} vs {threshold:g}"
+        return Alert(ts, rule.rule_id, rule.symbol, indicator, value, threshold, kind, rule.destination, message)
+
+
+class MemorySink:
+    """
+    Keeps delivered batches in memory. Stand-in for the real sinks in tests and development.
+
+    Attributes:
+        batches (list): (destination, alerts) pairs, in delivery order.
+    """
+    def __init__(self):
+        self.batches = []
+
+    def send(self, destination, alerts):
+        self.batches.append((destination, list(alerts)))
+
+
+class WebhookSink:
+    """
+    POSTs each batch as JSON ({"alerts": [...]}) through the shared HTTP client. The POST is sent
+    once: a timed-out request may have been delivered, and retrying it would notify twice.
+    """
+    def __init__(self, client_name='alerts'):
+        self.client_name = client_name
+
+    def send(self, destination, alerts):
+        from api.http_client import HttpError, get_client
+
+        payload = {'alerts': [alert._asdict() for alert in alerts]}
+        response = get_client(self.client_name).request('POST', destination, json=payload)
+        if response.status_code >= 400:
+            raise HttpError(f"Webhook {destination} answered {response.status_code}", response.status_code)
+
+
+class EmailSink:
+    """
+    Sends each batch as one email over SMTP.
+
+    Attributes:
+        host (str): SMTP server.
+        port (int): SMTP port.
+        sender (str): From address.
+        username (str): Login, if the server requires one.
+        password (str): Password for `username`.
+        starttls (bool): Upgrade the connection with STARTTLS.
+    """
+    def __init__(self, host='localhost', port=25, sender='midas@localhost', username=None, password=None,
+                 starttls=False, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds the sink from SMTP_HOST, SMTP_PORT, SMTP_SENDER, SMTP_USERNAME, SMTP_PASSWORD and
+        SMTP_STARTTLS.
+        """
+        return cls(host=os.environ.get('SMTP_HOST', 'localhost'),
+                   port=int(os.environ.get('SMTP_PORT', '25')),
+                   sender=os.environ.get('SMTP_SENDER', 'midas@localhost'),
+                   username=os.environ.get('SMTP_USERNAME'),
+                   password=os.environ.get('SMTP_PASSWORD'),
+                   starttls=os.environ.get('SMTP_STARTTLS', '').lower() in ('1', 'true', 'yes'))
+
+    def send(self, destination, alerts):
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = destination
+        message['Subject'] = alerts[0].message if len(alerts) == 1 else f"Midas: {len(alerts)} alerts"
+        message.set_content('\n'.join(alert.message for alert in alerts))
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+
+class Notifier:
+    """
+    Deduplicates, batches and delivers alerts in the background.
+
+    A destination's batch is sent once it holds `batch_size` alerts or its oldest alert has
+    waited `flush_interval` seconds. An alert is dropped when the same rule already notified
+    the same destination less than `dedup_window` seconds before. Delivery errors are counted
+    and logged; the batch is not retried (webhooks are already retried by the HTTP client).
+
+    Attributes:
+        sinks (dict): Sinks by destination scheme, e.g. {'webhook': WebhookSink()}.
+        batch_size (int): Maximum alerts per delivery.
+        flush_interval (float): Maximum seconds an alert waits for its batch to fill.
+        dedup_window (float): Seconds during which repeats of a rule to a destination are dropped.
+    """
+    def __init__(self, sinks=None, batch_size=50, flush_interval=5.0, dedup_window=3600.0, clock=time.monotonic):
+        self.sinks = dict(sinks) if sinks is not None else {'memory': MemorySink()}
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dedup_window = dedup_window
+        self.clock = clock
+        self._pending = {}  # destination -> (first enqueue time, [alerts])
+        self._sent = {}  # (rule_id, destination) -> last notification time
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def start(self):
+        """
+        Starts the delivery thread. `notify` starts it on the first queued alert, so this is only
+        needed to restart delivery after `stop`.
+        """
+        with self._cond:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='midas-alerts', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """
+        Stops the delivery thread after delivering everything pending.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def notify(self, alerts):
+        """
+        Queues alerts for delivery, starting the delivery thread if it isn't running (and wasn't
+        stopped). Under a WSGI server nothing else would start it.
+        """
+        now = self.clock()
+        queued = 0
+        with self._cond:
+            for alert in alerts:
+                key = (alert.rule_id, alert.destination)
+                last = self._sent.get(key)
+                if last is not None and now - last < self.dedup_window:
+                    continue
+                self._sent[key] = now
+                pending = self._pending.get(alert.destination)
+                if pending is None:
+                    pending = self._pending[alert.destination] = (now, [])
+                pending[1].append(alert)
+                queued += 1
+            if len(self._sent) > 100000:
+                self._sent = {k: t for k, t in self._sent.items() if now - t < self.dedup_window}
+            if queued:
+                self._cond.notify()
+            start = queued and self._thread is None and not self._stopping
+        if start:
+            self.start()
+        registry.increment('alerts.deduplicated', len(alerts) - queued)
+
+    def _due(self, now, everything=False):
+        """
+        Takes the batches ready to be sent out of the pending queue. Call with the lock held.
+        """
+        batches = []
+        for destination in list(self._pending):
+            first, alerts = self._pending[destination]
+            if everything or len(alerts) >= self.batch_size or now - first >= self.flush_interval:
+                del self._pending[destination]
+                for i in range(0, len(alerts), self.batch_size):
+                    batches.append((destination, alerts[i:i + self.batch_size]))
+        return batches
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    now = self.clock()
+                    batches = self._due(now)
+                    if batches:
+                        break
+                    oldest = min((first for first, _ in self._pending.values()), default=None)
+                    self._cond.wait(None if oldest is None else max(oldest + self.flush_interval - now, 0.01))
+            self._deliver(batches)
+
+    def flush(self):
+        """
+        Delivers everything pending now, in the calling thread.
+
+        Returns:
+            int: Number of alerts delivered.
+        """
+        with self._cond:
+            batches = self._due(self.clock(), everything=True)
+        return self._deliver(batches)
+
+    def _deliver(self, batches):
+        delivered = 0
+        for destination, alerts in batches:
+            scheme, _, address = destination.partition(':')
+            sink = self.sinks.get(scheme)
+            if sink is None:
+                registry.increment('alerts.delivery_errors')
+                print("No alert sink for", destination)
+                continue
+            try:
+                with timed(f'alerts.{scheme}'):
+                    sink.send(address, alerts)
+            except Exception as e:
+                registry.increment('alerts.delivery_errors')
+                print("Error delivering alerts to", destination, e)
+                continue
+            delivered += len(alerts)
+        registry.increment('alerts.delivered', delivered)
+        return delivered
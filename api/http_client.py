@@ -0,0 +1,313 @@
+"""
+Shared HTTP client for every market data provider.
+
+A single `HttpClient` per provider keeps a pooled keep-alive `requests.Session`, applies a
+default timeout to every call, throttles requests with a token bucket sized to the
+provider's published rate limit, retries transient failures (connection errors, 429 and
+5xx) with full-jitter exponential backoff honouring `Retry-After`, asks for compressed
+responses and revalidates cached GET responses with ETag/Last-Modified.
+
+`base_url` is configurable so the providers can be pointed at a local HTTP stand-in.
+"""
+import email.utils
+import random
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api.instrumentation import registry
+
+RETRY_STATUS = frozenset((429, 500, 502, 503, 504))
+# Methods that can be repeated without side effects; others (POST, PATCH) are only retried on request
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE'))
+
+# Published public API limits per provider, as (requests, per seconds).
+# Bitso: 60 requests per minute per IP for public endpoints.
+# Yahoo Finance has no published limit; ~2000 requests per hour is the commonly observed ceiling.
+RATE_LIMITS = {
+    'bitso': (60, 60.0),
+    'yahoo': (2000, 3600.0),
+}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum number of tokens (burst size).
+        tokens (float): Tokens currently available.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per(cls, requests_count, seconds):
+        """
+        Builds a bucket allowing `requests_count` requests every `seconds`.
+
+        Parameters:
+            requests_count (int): Requests allowed in the window.
+            seconds (float): Window length in seconds.
+
+        Returns:
+            TokenBucket: The limiter.
+        """
+        return cls(requests_count / seconds, requests_count)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """
+        Blocks until `tokens` tokens are available and consumes them.
+
+        Parameters:
+            tokens (float): Tokens to consume. Default is 1.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def drain(self):
+        """
+        Empties the bucket, e.g. after the server answered 429 despite our own throttling.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = 0.0
+
+
+class HttpError(RuntimeError):
+    """
+    Raised when a request still fails after all retries.
+
+    Attributes:
+        status_code (int): Last HTTP status received, or None on connection errors.
+    """
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _retry_after(response):
+    """
+    Parses the Retry-After header as seconds, accepting both delta-seconds and HTTP dates.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        if parsed is None:
+            return None
+        return max(0.0, parsed.timestamp() - time.time())
+
+
+class HttpClient:
+    """
+    Pooled, rate-limited and retrying HTTP client for a single provider.
+
+    Attributes:
+        name (str): Provider name, used for metrics.
+        base_url (str): Prefix prepended to relative paths.
+        timeout (tuple): (connect, read) timeout in seconds.
+        max_retries (int): Retries after the first attempt.
+        backoff_base (float): Base delay in seconds for the exponential backoff.
+        backoff_max (float): Upper bound for a single backoff delay.
+        limiter (TokenBucket): Rate limiter shared by all requests of this client.
+        session (requests.Session): The underlying keep-alive session.
+        cache_size (int): Maximum number of responses kept for revalidation; the least recently
+            used ones are evicted (Bitso's start/end parameters change every cycle, so an
+            unbounded cache would grow forever).
+    """
+    def __init__(self, name, base_url='', rate_limit=None, timeout=(3.05, 15.0), max_retries=4,
+                 backoff_base=0.5, backoff_max=30.0, pool_size=10, session=None, cache_size=128):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        if rate_limit is None:
+            rate_limit = RATE_LIMITS.get(name)
+        self.limiter = TokenBucket.per(*rate_limit) if rate_limit else None
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'User-Agent': 'midas/1.0',
+        })
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def url(self, path):
+        """
+        Resolves a path against `base_url`. Absolute URLs are returned unchanged.
+        """
+        if urlsplit(path).scheme:
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _backoff(self, attempt):
+        """
+        Full-jitter exponential backoff: uniform in [0, min(max, base * 2**attempt)].
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method, path, retry=None, **kwargs):
+        """
+        Sends a request, throttled by the token bucket and retried on transient failures.
+
+        A POST that timed out or got a 5xx may still have been processed, so non-idempotent methods
+        are sent once unless `retry` is set.
+
+        Parameters:
+            method (str): HTTP method.
+            path (str): Path relative to `base_url`, or an absolute URL.
+            retry (bool): Whether to retry transient failures. Default is True for idempotent methods
+                only.
+            **kwargs: Passed through to `requests.Session.request`.
+
+        Returns:
+            requests.Response: The final response (2xx, 3xx or a non-retryable 4xx).
+
+        Raises:
+            HttpError: If every attempt failed with a connection error or a retryable status.
+        """
+        url = self.url(path)
+        kwargs.setdefault('timeout', self.timeout)
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        max_retries = self.max_retries if retry else 0
+        last_error = None
+        last_status = None
+        for attempt in range(max_retries + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            registry.increment(f'http.{self.name}.requests')
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error, last_status = e, None
+                delay = self._backoff(attempt)
+            else:
+                if response.status_code not in RETRY_STATUS:
+                    return response
+                last_error, last_status = f"HTTP {response.status_code}", response.status_code
+                if response.status_code == 429:
+                    registry.increment(f'http.{self.name}.throttled')
+                    if self.limiter is not None:
+                        self.limiter.drain()
+                delay = _retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                response.close()
+            if attempt == max_retries:
+                break
+            registry.increment(f'http.{self.name}.retries')
+            time.sleep(min(delay, self.backoff_max))
+        raise HttpError(f"{method} {url} failed after {max_retries + 1} attempts: {last_error}", last_status)
+
+    def get(self, path, params=None, conditional=True, **kwargs):
+        """
+        Sends a GET request. With `conditional` the last ETag/Last-Modified for the same URL
+        and parameters is sent back, and a 304 answer is served from the cached response.
+
+        Parameters:
+            path (str): Path relative to `base_url`, or an absolute URL.
+            params (dict): Query string parameters.
+            conditional (bool): Whether to revalidate with the cached validators. Default is True.
+
+        Returns:
+            requests.Response: The fresh response, or the cached one on 304 Not Modified.
+        """
+        key = (self.url(path), tuple(sorted((params or {}).items())))
+        headers = dict(kwargs.pop('headers', None) or {})
+        cached = None
+        if conditional:
+            with self._cache_lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+            if cached is not None:
+                if cached.headers.get('ETag'):
+                    headers['If-None-Match'] = cached.headers['ETag']
+                if cached.headers.get('Last-Modified'):
+                    headers['If-Modified-Since'] = cached.headers['Last-Modified']
+
+        response = self.request('GET', path, params=params, headers=headers, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            registry.increment(f'http.{self.name}.not_modified')
+            return cached
+        if conditional and response.ok and (response.headers.get('ETag') or response.headers.get('Last-Modified')):
+            response.content  # read the body so the cached response outlives the connection
+            with self._cache_lock:
+                self._cache[key] = response
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return response
+
+    def get_json(self, path, params=None, **kwargs):
+        """
+        Sends a GET request and decodes the JSON body.
+
+        Returns:
+            dict: The decoded response.
+        """
+        return self.get(path, params=params, **kwargs).json()
+
+    def close(self):
+        """
+        Closes the pooled connections.
+        """
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name, **kwargs):
+    """
+    Returns the shared client for a provider, creating it on first use.
+
+    Parameters:
+        name (str): Provider name, e.g. 'bitso' or 'yahoo'.
+        **kwargs: Passed to `HttpClient` when the client is created.
+
+    Returns:
+        HttpClient: The shared client.
+    """
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = HttpClient(name, **kwargs)
+        return client
@@ -7,10 +7,41 @@ Comparison of Technical Indicators between Bitso and YahooFinancial:
 - Bollinger Bands (Upper and Lower) exhibit differences of 0.65% and 0.61% respectively, indicating congruence in the estimated market volatility.
 - The MACD Line (Moving Average Convergence Divergence) and Signal Line differ by 3.92% and 0.89% respectively, which could indicate variations in the perception of market momentum and trend.
 - VWAP (Volume Weighted Average Price) has a difference of 2.63%, pointing out small discrepancies in the volume-weighted average price.
+  That measurement used a cumulative VWAP over the whole downloaded range; VWAP is now anchored to the UTC month for daily bars (the UTC day for intraday bars).
 - Fibonacci Levels (23.6%, 38.2%, 61.8%) show differences of 0.32%, 0.26%, and 0.13% respectively, demonstrating a high coherence in the estimated supports and resistances by both sources.
+  Those levels came from the global high/low of the range; they are now taken from the latest price swing.
 
 These percentage differences indicate that, overall, there is a high similarity in the technical indicators provided by Bitso and YahooFinancial, with some minor variations that could be attributed to differences in the input data or the specific calculation methods used by each platform.
 """
+import os
+
+from api.instrumentation import timed
+from api.indicators.streaming import rolling_extrema
+
+FIBONACCI_RATIOS = (0.236, 0.382, 0.5, 0.618, 1.0)
+
+
+def fibonacci_levels(high, low, direction='up'):
+    """
+    Computes the Fibonacci retracement levels of a move between `low` and `high`.
+
+    Parameters:
+        high (float or array): Top of the move.
+        low (float or array): Bottom of the move.
+        direction (str): 'up' if the move went from low to high (levels measured down from the high),
+            'down' if it went from high to low (levels measured up from the low). Default is 'up'.
+
+    Returns:
+        dict: Levels keyed as 'Fib_Level_23.6%', 'Fib_Level_38.2%', 'Fib_Level_50%', 'Fib_Level_61.8%'
+        and 'Fib_Level_100%'.
+    """
+    diff = high - low
+    levels = {}
+    for ratio in FIBONACCI_RATIOS:
+        key = f"Fib_Level_{ratio * 100:g}%"
+        levels[key] = high - ratio * diff if direction == 'up' else low + ratio * diff
+    return levels
+
 
 class BaseFinancialIndicators:
     """
@@ -22,26 +53,44 @@ class BaseFinancialIndicators:
         start_date (str): The start date for the data range.
         end_date (str): The end date for the data range.
         data (DataFrame): The downloaded and processed financial data.
+        fibonacci_swings (DataFrame): One row per detected price swing with its Fibonacci levels.
+        recorder (MarketDataRecorder): Where fetched candles are recorded. Defaults to MIDAS_RECORD_DIR, if set.
     """
+    recorder = None
+
     def __init__(self, symbol, start_date, end_date):
         self.symbol = symbol
         self.start_date = start_date
         self.end_date = end_date
         self.data = None
+        self.fibonacci_swings = None
     def fetch_data(self):
         """
         Fetches financial data. This should be implemented by subclasses.
         """
         raise NotImplementedError("This method should be overridden by subclass")
 
+    def _record_data(self):
+        """
+        Appends the fetched candles to the binary market-data log, when recording is enabled.
+        """
+        recorder = self.recorder
+        if recorder is None and os.environ.get('MIDAS_RECORD_DIR'):
+            from api.indicators.replay import get_recorder
+            recorder = get_recorder()
+        if recorder is not None and self.data is not None:
+            recorder.record_candles(self.symbol, self.data)
+
+    @timed('indicators.compute')
     def compute_technical_indicators(self):
         """
-        Computes standard technical indicators including 50-day SMA, 20-day EMA, RSI, Bollinger Bands, MACD, VWAP, and Fibonacci Retracement levels.
+        Computes standard technical indicators including 50-day SMA, 20-day EMA, RSI, Bollinger Bands, ATR, MACD, VWAP, and Fibonacci Retracement levels.
         """
         self._compute_sma_50()
         self._compute_ema_20()
         self._compute_rsi()
         self._compute_bollinger_bands()
+        self._compute_atr()
         self._compute_macd()
         self._compute_vwap()
         self._compute_fibonacci_retracement()
@@ -83,6 +132,21 @@ class BaseFinancialIndicators:
         self.data['Bollinger_Upper'] = ma + (std_dev * num_std_dev)
         self.data['Bollinger_Lower'] = ma - (std_dev * num_std_dev)
 
+    def _compute_atr(self, period=14):
+        """
+        Computes the Average True Range (ATR) with Wilder's smoothing.
+
+        Parameters:
+            period (int): Look-back period for the average. Default is 14 days.
+        """
+        import pandas as pd
+
+        previous_close = self.data['Close'].shift(1)
+        true_range = pd.concat([self.data['High'] - self.data['Low'],
+                                (self.data['High'] - previous_close).abs(),
+                                (self.data['Low'] - previous_close).abs()], axis=1).max(axis=1)
+        self.data['ATR'] = true_range.ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+
     def _compute_macd(self, short_period=12, long_period=26):
         """
         Computes the Moving Average Convergence Divergence (MACD) using specified short and long periods.
@@ -96,24 +160,149 @@ class BaseFinancialIndicators:
         self.data['MACD_Line'] = short_ema - long_ema
         self.data['Signal_Line'] = self.data['MACD_Line'].ewm(span=9, adjust=False).mean()
 
-    def _compute_vwap(self):
+    def _compute_vwap(self, rolling_window=20, anchor=None):
         """
-        Computes the Volume Weighted Average Price (VWAP).
+        Computes the Volume Weighted Average Price (VWAP) anchored to a UTC calendar period, plus a rolling VWAP.
+
+        The anchor resets every period, so the value doesn't depend on the requested date range. Intraday bars
+        are anchored to the UTC day. A day-anchored VWAP of daily bars would just be each bar's own price, so
+        bars of a day or longer are anchored to the UTC month (month-to-date VWAP); for the VWAP of the last
+        `rolling_window` bars use 'VWAP_Rolling_<n>'. Bars are weighted by their own trade VWAP when the
+        provider reports it ('Bar_VWAP'), otherwise by (High + Low) / 2.
+
+        Parameters:
+            rolling_window (int): Number of bars for the rolling VWAP stored in 'VWAP_Rolling_<n>'. Default is 20.
+            anchor (str): 'D' (UTC day), 'W' (week starting Monday) or 'M' (calendar month). Default is 'D' for
+                intraday bars and 'M' for daily or longer bars.
+        """
+        price_volume, volume = self._vwap_terms()
+        if anchor is None:
+            bar_seconds = self._bar_seconds()
+            anchor = 'M' if bar_seconds is not None and bar_seconds >= 86400 else 'D'
+        index = self._utc_index()
+        period = index.floor('D') if anchor == 'D' else index.to_period(anchor).start_time
+        self.data['VWAP'] = price_volume.groupby(period).cumsum() / volume.groupby(period).cumsum()
+        if rolling_window:
+            self.data[f'VWAP_Rolling_{rolling_window}'] = (price_volume.rolling(window=rolling_window).sum()
+                                                           / volume.rolling(window=rolling_window).sum())
+
+    def _bar_seconds(self):
         """
-        cum_vol_price = (self.data['Volume'] * (self.data['High'] + self.data['Low']) / 2).cumsum()
-        cum_volume = self.data['Volume'].cumsum()
-        self.data['VWAP'] = cum_vol_price / cum_volume
+        Returns the bar size in seconds: the provider's `tf` when it has one, otherwise the median spacing of
+        the index. None with fewer than two bars.
+        """
+        tf = getattr(self, 'tf', None)
+        if tf:
+            return tf
+        index = self._utc_index()
+        if len(index) < 2:
+            return None
+        return (index[1:] - index[:-1]).median().total_seconds()
 
-    def _compute_fibonacci_retracement(self):
+    def compute_session_vwap(self, session_start='00:00', session_end='24:00', column='VWAP_Session'):
         """
-        Computes Fibonacci Retracement levels.
+        Computes a VWAP anchored to a custom daily session given in UTC. Sessions may cross midnight
+        (e.g. '22:00' to '06:00'); bars outside the session get NaN.
+
+        Parameters:
+            session_start (str): Session start time, 'HH:MM' in UTC. Default is '00:00'.
+            session_end (str): Session end time, 'HH:MM' in UTC. Default is '24:00'.
+            column (str): Name of the output column. Default is 'VWAP_Session'.
         """
-        high = self.data['High'].max()
-        low = self.data['Low'].min()
-        diff = high - low
-        self.data['Fib_Level_23.6%'] = high - 0.236 * diff
-        self.data['Fib_Level_38.2%'] = high - 0.382 * diff
-        self.data['Fib_Level_61.8%'] = high - 0.618 * diff
+        import pandas as pd
+
+        start = pd.Timedelta(hours=int(session_start[:2]), minutes=int(session_start[3:5]))
+        end = pd.Timedelta(hours=int(session_end[:2]), minutes=int(session_end[3:5]))
+        length = (end - start) % pd.Timedelta(days=1) or pd.Timedelta(days=1)
+        shifted = self._utc_index() - start
+        session = shifted.floor('D')
+        in_session = (shifted - session) < length
+
+        price_volume, volume = self._vwap_terms()
+        price_volume = price_volume.where(in_session)
+        volume = volume.where(in_session)
+        self.data[column] = price_volume.groupby(session).cumsum() / volume.groupby(session).cumsum()
+
+    def _vwap_terms(self):
+        """
+        Returns the per-bar price * volume and volume series used by the VWAP variants.
+        """
+        price = (self.data['High'] + self.data['Low']) / 2
+        if 'Bar_VWAP' in self.data:
+            price = self.data['Bar_VWAP'].fillna(price)
+        return price * self.data['Volume'], self.data['Volume']
+
+    def _utc_index(self):
+        """
+        Returns the data index as UTC timestamps. Naive indexes are assumed to already be in UTC.
+        """
+        index = self.data.index
+        if getattr(index, 'tz', None) is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        return index
+
+    def _compute_fibonacci_retracement(self, window=50, swing_order=5):
+        """
+        Computes Fibonacci Retracement levels from swings and from a rolling window.
+
+        The rolling high and low over `window` bars (all bars so far while the window fills) are stored in
+        'Fib_High' and 'Fib_Low'; levels for any bar derive from them with `fibonacci_levels`. Swings run
+        between alternating pivot highs and lows, a pivot being the extreme of the `swing_order` bars on
+        each side. They are stored once per swing in `fibonacci_swings` instead of as constant columns.
+        Both use monotonic-deque rolling extrema, O(n) in the number of bars.
+
+        Parameters:
+            window (int): Look-back period for the rolling high and low. Default is 50 bars.
+            swing_order (int): Bars on each side that a pivot must dominate. Default is 5.
+        """
+        import numpy as np
+        import pandas as pd
+
+        high = self.data['High'].to_numpy(dtype=float)
+        low = self.data['Low'].to_numpy(dtype=float)
+        self.data['Fib_High'], self.data['Fib_Low'] = rolling_extrema(high, low, window)
+
+        pivots = []
+        span = 2 * swing_order + 1
+        if len(high) >= span:
+            centered_max, centered_min = rolling_extrema(high, low, span)
+            centers = np.arange(swing_order, len(high) - swing_order)
+            is_high = high[centers] == centered_max[centers + swing_order]
+            is_low = low[centers] == centered_min[centers + swing_order]
+            for i in centers[is_high | is_low]:
+                for kind, price in (('high', high[i]), ('low', low[i])):
+                    if not (is_high if kind == 'high' else is_low)[i - swing_order]:
+                        continue
+                    if pivots and pivots[-1][1] == kind:
+                        # Two pivots of the same kind in a row: keep the more extreme one
+                        if (price > pivots[-1][2]) if kind == 'high' else (price < pivots[-1][2]):
+                            pivots[-1] = (i, kind, price)
+                    else:
+                        pivots.append((i, kind, price))
+
+        index = self.data.index
+        swings = []
+        for (start, start_kind, start_price), (end, _, end_price) in zip(pivots, pivots[1:]):
+            direction = 'up' if start_kind == 'low' else 'down'
+            swing_high, swing_low = max(start_price, end_price), min(start_price, end_price)
+            swings.append({'start': index[start], 'end': index[end], 'direction': direction,
+                           'high': swing_high, 'low': swing_low,
+                           **fibonacci_levels(swing_high, swing_low, direction)})
+        self.fibonacci_swings = pd.DataFrame(swings, columns=['start', 'end', 'direction', 'high', 'low',
+                                                              *fibonacci_levels(0.0, 0.0)])
+
+    def get_fibonacci_levels(self):
+        """
+        Returns the Fibonacci levels of the latest swing, or of the rolling window at the last bar when no
+        swing has been detected yet.
+
+        Returns:
+            dict: Levels keyed as in `fibonacci_levels`.
+        """
+        if self.fibonacci_swings is not None and not self.fibonacci_swings.empty:
+            swing = self.fibonacci_swings.iloc[-1]
+            return fibonacci_levels(swing['high'], swing['low'], swing['direction'])
+        return fibonacci_levels(self.data['Fib_High'].iloc[-1], self.data['Fib_Low'].iloc[-1])
 
     def get_all_indicator_values(self):
         """
@@ -127,12 +316,12 @@ class BaseFinancialIndicators:
         latest_rsi = self.data['RSI'].iloc[-1]
         latest_bollinger_upper = self.data['Bollinger_Upper'].iloc[-1]
         latest_bollinger_lower = self.data['Bollinger_Lower'].iloc[-1]
+        latest_atr = self.data['ATR'].iloc[-1]
         latest_macd_line = self.data['MACD_Line'].iloc[-1]
         latest_signal_line = self.data['Signal_Line'].iloc[-1]
         latest_vwap = self.data['VWAP'].iloc[-1]
-        latest_fib_23_6 = self.data['Fib_Level_23.6%'].iloc[-1]
-        latest_fib_38_2 = self.data['Fib_Level_38.2%'].iloc[-1]
-        latest_fib_61_8 = self.data['Fib_Level_61.8%'].iloc[-1]
+        latest_vwap_rolling = self.data['VWAP_Rolling_20'].iloc[-1]
+        fibonacci = self.get_fibonacci_levels()
 
         return {
             'SMA_50': latest_sma_50,
@@ -140,12 +329,12 @@ class BaseFinancialIndicators:
             'RSI': latest_rsi,
             'Bollinger_Upper': latest_bollinger_upper,
             'Bollinger_Lower': latest_bollinger_lower,
+            'ATR': latest_atr,
             'MACD_Line': latest_macd_line,
             'Signal_Line': latest_signal_line,
             'VWAP': latest_vwap,
-            'Fib_Level_23.6%': latest_fib_23_6,
-            'Fib_Level_38.2%': latest_fib_38_2,
-            'Fib_Level_61.8%': latest_fib_61_8,
+            'VWAP_Rolling_20': latest_vwap_rolling,
+            **fibonacci,
         }
 
     def get_latest_indicator_values(self):
@@ -162,4 +351,10 @@ class BaseFinancialIndicators:
             'SMA_50': latest_sma,
             'EMA_20': latest_ema,
             'Close': latest_close
-        }
\ No newline at end of file
+        }
+
+    def get_raw_data(self):
+        """
+        Returns the fetched data (with any indicator columns computed so far), or None before fetch_data.
+        """
+        return self.data
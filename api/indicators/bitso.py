@@ -1,12 +1,19 @@
-import requests
-import pandas as pd
+import os
 from datetime import datetime
+from api.http_client import get_client
+from api.instrumentation import timed
 from .base_financial_indicators import BaseFinancialIndicators
 
+BITSO_API_URL = os.environ.get('BITSO_API_URL', 'https://bitso.com/api/v3')
+
 def get_data(book, currentTimeFrom, currentTimeTo, tf):
     """
     Obtiene datos financieros de la API de Bitso.
 
+    La petición pasa por el cliente HTTP compartido de Bitso (sesión persistente, timeout,
+    reintentos con backoff y límite de 60 peticiones por minuto). La URL base se puede
+    cambiar con la variable de entorno BITSO_API_URL, por ejemplo para apuntar a un servidor local.
+
     Parámetros:
         book (str): El par de criptomonedas para el que se descargarán los datos.
         currentTimeFrom (int): Timestamp de la fecha de inicio para el rango de datos.
@@ -16,9 +23,12 @@ def get_data(book, currentTimeFrom, currentTimeTo, tf):
     Retorna:
         dict: Los datos financieros obtenidos de la API de Bitso.
     """
-    response = requests.get(
-        f"https://bitso.com/api/v3/ohlc?book={book}&time_bucket={tf}&start={currentTimeFrom}&end={currentTimeTo}")
-    return response.json()
+    client = get_client('bitso', base_url=BITSO_API_URL)
+    with timed('bitso.fetch'):
+        return client.get_json('ohlc', params={'book': book,
+                                               'time_bucket': tf,
+                                               'start': currentTimeFrom,
+                                               'end': currentTimeTo})
 
 class Bitso(BaseFinancialIndicators):
     """
@@ -59,6 +69,17 @@ class Bitso(BaseFinancialIndicators):
         end_timestamp = int(datetime.strptime(self.end_date, "%Y-%m-%d").timestamp()) * 1000
 
         data = get_data(self.symbol, start_timestamp, end_timestamp, self.tf)
+        with timed('bitso.parse'):
+            self._parse_payload(data)
+        self._record_data()
+
+    def _parse_payload(self, data):
+        """
+        Convierte la respuesta de la API de Bitso en el DataFrame de la clase.
+
+        Parámetros:
+            data (dict): Respuesta JSON del endpoint OHLC de Bitso.
+        """
         data_list = []
 
         if data and data['success']:
@@ -69,13 +90,16 @@ class Bitso(BaseFinancialIndicators):
                         'Close': float(p['last_rate']),
                         'Adj Close': float(p['last_rate']),  # Duplicating 'Close' as 'Adj Close'
                         'Volume': float(p['volume']),
-                        'Date': datetime.fromtimestamp(p['bucket_start_time'] / 1000).strftime('%Y-%m-%d')}
+                        'Bar_VWAP': float(p['vwap']) if p.get('vwap') is not None else float('nan'),  # VWAP de los trades del bucket
+                        'Date': p['bucket_start_time']}
                 data_list.append(line)
         else:
             print("Error fetching data", data)
 
         if data_list:
+            import pandas as pd
+
             df = pd.DataFrame(data_list)
-            df['Date'] = pd.to_datetime(df['Date'])
+            df['Date'] = pd.to_datetime(df['Date'], unit='ms')  # inicio del bucket en UTC
             df.set_index('Date', inplace=True)
             self.data = df
\ No newline at end of file
@@ -1,8 +1,10 @@
 # api/indicators/financial_data_interface.py
 
 from abc import ABC, abstractmethod
-from pandas import DataFrame
-from typing import Dict
+from typing import TYPE_CHECKING, Dict
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
 
 
 class FinancialDataInterface(ABC):
@@ -23,5 +25,5 @@ class FinancialDataInterface(ABC):
         pass
 
     @abstractmethod
-    def get_raw_data(self) -> DataFrame:
+    def get_raw_data(self) -> 'DataFrame':
         pass
@@ -0,0 +1,68 @@
+"""
+Registry of market data providers.
+
+Providers are registered by dotted path and only imported the first time they are requested,
+so a process that only talks to Bitso never pays for importing yfinance (and the pandas, lxml
+and bs4 stack it pulls in). New providers are added with `register_provider`.
+"""
+import importlib
+
+PROVIDERS = {
+    'bitso': 'api.indicators.bitso:Bitso',
+    'yahoo': 'api.indicators.yahoo_financial:YahooFinancial',
+    'replay': 'api.indicators.replay:ReplayFinancialIndicators',
+    'reconciled': 'api.indicators.reconciled:ReconciledFinancialIndicators',
+}
+
+_loaded = {}
+
+
+def register_provider(name, path):
+    """
+    Registers a provider class by its import path.
+
+    Parameters:
+        name (str): Provider name, e.g. 'bitso'.
+        path (str): Import path in the form 'package.module:ClassName'.
+    """
+    PROVIDERS[name] = path
+    _loaded.pop(name, None)
+
+
+def get_provider(name):
+    """
+    Returns the provider class, importing its module on first use.
+
+    Parameters:
+        name (str): Provider name.
+
+    Returns:
+        type: A BaseFinancialIndicators subclass.
+
+    Raises:
+        KeyError: If no provider is registered under that name.
+    """
+    cls = _loaded.get(name)
+    if cls is None:
+        try:
+            path = PROVIDERS[name]
+        except KeyError:
+            raise KeyError(f"Unknown provider '{name}'. Available: {', '.join(sorted(PROVIDERS))}") from None
+        module_name, class_name = path.split(':')
+        cls = _loaded[name] = getattr(importlib.import_module(module_name), class_name)
+    return cls
+
+
+def create_provider(name, *args, **kwargs):
+    """
+    Instantiates a provider by name.
+
+    Parameters:
+        name (str): Provider name.
+        *args: Positional arguments for the provider constructor.
+        **kwargs: Keyword arguments for the provider constructor.
+
+    Returns:
+        BaseFinancialIndicators: The provider instance.
+    """
+    return get_provider(name)(*args, **kwargs)
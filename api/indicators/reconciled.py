@@ -0,0 +1,243 @@
+"""
+Cross-provider reconciliation: one series built from several providers of the same market.
+
+Every provider is fetched concurrently; the ones that fail or don't answer within the timeout
+are left out, so a slow or failing provider falls back to the others instead of failing the
+snapshot. The answers are aligned on bar start, checked against each other and merged into one
+"best" series that records, for every bar, which provider it came from.
+
+A provider's bar is:
+- a gap when the provider has no valid bar there (missing, non-positive close or High < Low);
+- an outlier when the providers disagree on the close by more than `tolerance` and this one is
+  further from the reference price: the median close of the bar when three or more providers
+  have it, the median close of the previous bar otherwise (with two providers the median of the
+  bar can't tell which one is off).
+
+The merged bar comes from the first provider, in priority order, with a valid bar that isn't an
+outlier. Volume (and Bar_VWAP) come from the same provider as the prices, since providers count
+volume differently (Bitso reports the traded amount on Bitso, Yahoo an aggregate across venues).
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from api.instrumentation import registry, timed
+from .base_financial_indicators import BaseFinancialIndicators
+from .providers import create_provider
+
+PRICE_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume', 'Bar_VWAP')
+
+
+def yahoo_symbol(book):
+    """
+    Converts a Bitso book to the Yahoo ticker of the same market, e.g. 'btc_usd' -> 'BTC-USD'.
+    """
+    return book.replace('_', '-').upper()
+
+
+def fetch_with_fallback(providers, timeout=30.0):
+    """
+    Fetches several providers concurrently and keeps the ones that answered in time.
+
+    Parameters:
+        providers (dict): Provider instances by name.
+        timeout (float): Seconds to wait for all providers. Providers still running afterwards are
+            abandoned (their thread finishes in the background) and treated as failed.
+
+    Returns:
+        dict: The fetched DataFrames by name, in the order of `providers`. Providers that raised,
+        timed out or returned no data are missing.
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, len(providers)), thread_name_prefix='midas-reconcile')
+    try:
+        futures = {name: executor.submit(provider.fetch_data) for name, provider in providers.items()}
+        wait(futures.values(), timeout=timeout)
+    finally:
+        executor.shutdown(wait=False)
+
+    frames = {}
+    for name, future in futures.items():
+        if not future.done():
+            registry.increment('reconcile.provider_timeouts')
+            print("Provider timed out:", name)
+            continue
+        error = future.exception()
+        if error is not None:
+            registry.increment('reconcile.provider_errors')
+            print("Provider failed:", name, error)
+            continue
+        data = providers[name].get_raw_data()
+        if data is None or not len(data):
+            registry.increment('reconcile.provider_errors')
+            print("Provider returned no data:", name)
+            continue
+        frames[name] = data
+    return frames
+
+
+def align(frames, tf=86400):
+    """
+    Aligns the providers' bars on their start time.
+
+    Indexes are converted to naive UTC and floored to the bar size, so bars stamped a few
+    seconds apart (or in another timezone) land on the same row. yfinance's per-ticker column
+    level is dropped.
+
+    Parameters:
+        frames (dict): DataFrames by provider name.
+        tf (int): Bar size in seconds.
+
+    Returns:
+        DataFrame: Columns (provider, field) over the union of all bar times.
+    """
+    import pandas as pd
+
+    aligned = {}
+    for name, frame in frames.items():
+        frame = frame.copy()
+        if isinstance(frame.columns, pd.MultiIndex):
+            frame.columns = frame.columns.get_level_values(0)
+        index = pd.DatetimeIndex(frame.index)
+        if index.tz is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        frame.index = index.floor(f'{tf}s')
+        frame = frame[~frame.index.duplicated(keep='last')]
+        aligned[name] = frame.reindex(columns=list(PRICE_COLUMNS))
+    panel = pd.concat(aligned, axis=1).sort_index()
+    panel.index.name = 'Date'
+    return panel
+
+
+def reconcile(frames, tf=86400, tolerance=0.02):
+    """
+    Merges the providers' series into one, flagging gaps and outliers.
+
+    Parameters:
+        frames (dict): DataFrames by provider name, highest priority first.
+        tf (int): Bar size in seconds.
+        tolerance (float): Relative close difference above which providers disagree. Default 2%.
+
+    Returns:
+        tuple: (merged, report).
+            merged (DataFrame): Best bar per time with the PRICE_COLUMNS and a 'Source' column
+            naming the provider it came from. Bars no provider has are left out.
+            report (DataFrame): Per bar 'Close_<provider>', 'Gap_<provider>', 'Outlier_<provider>',
+            the relative 'Spread' between the highest and lowest close and the 'Source'.
+    """
+    import numpy as np
+    import pandas as pd
+
+    names = list(frames)
+    panel = align(frames, tf)
+    fields = {field: np.column_stack([panel[(name, field)].to_numpy(dtype=float) for name in names])
+              for field in PRICE_COLUMNS}
+    close = fields['Close']
+
+    valid = (close > 0) & ~(fields['High'] < fields['Low'])
+    close = np.where(valid, close, np.nan)
+    has_any = valid.any(axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        spread = np.full(len(close), np.nan)
+        spread[has_any] = np.nanmax(close[has_any], axis=1) / np.nanmin(close[has_any], axis=1) - 1
+        median = np.full(len(close), np.nan)
+        median[has_any] = np.nanmedian(close[has_any], axis=1)
+        previous = pd.Series(median).shift(1).ffill().to_numpy()
+        reference = np.where(valid.sum(axis=1) >= 3, median, previous)
+        distance = np.abs(np.log(close / reference[:, None]))
+    disagree = spread > tolerance
+    # Bars without a reference (the first bar with fewer than three providers) have no outliers
+    closest = np.min(np.where(valid & ~np.isnan(distance), distance, np.inf), axis=1)
+    outlier = valid & disagree[:, None] & (distance > closest[:, None])
+
+    # First usable provider by priority; bars where every valid provider is an outlier keep the first valid one
+    usable = valid & ~outlier
+    choice = np.where(usable.any(axis=1), usable.argmax(axis=1), valid.argmax(axis=1))
+    rows = np.flatnonzero(has_any)
+    picked = choice[rows]
+
+    merged = pd.DataFrame({field: values[rows, picked] for field, values in fields.items()},
+                          index=panel.index[rows])
+    merged['Source'] = np.asarray(names, dtype=object)[picked]
+
+    source = np.full(len(close), None, dtype=object)
+    source[rows] = merged['Source'].to_numpy()
+    report = {f'Close_{name}': close[:, i] for i, name in enumerate(names)}
+    report.update({f'Gap_{name}': ~valid[:, i] for i, name in enumerate(names)})
+    report.update({f'Outlier_{name}': outlier[:, i] for i, name in enumerate(names)})
+    report['Spread'] = spread
+    report['Source'] = source
+    return merged, pd.DataFrame(report, index=panel.index)
+
+
+def summarize(report):
+    """
+    Per-provider figures of a reconciliation report.
+
+    Returns:
+        dict: For every provider, the number of bars it has, its gaps and outliers, how many merged
+        bars it supplied and its mean relative difference to the merged close (in %).
+    """
+    import numpy as np
+
+    names = [c[len('Close_'):] for c in report.columns if c.startswith('Close_')]
+    merged_close = np.array([report[f'Close_{s}'].iloc[i] if s is not None else np.nan
+                             for i, s in enumerate(report['Source'])], dtype=float)
+    summary = {}
+    for name in names:
+        close = report[f'Close_{name}'].to_numpy(dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            diff = np.abs(close / merged_close - 1) * 100
+        summary[name] = {
+            'bars': int((~report[f'Gap_{name}']).sum()),
+            'gaps': int(report[f'Gap_{name}'].sum()),
+            'outliers': int(report[f'Outlier_{name}'].sum()),
+            'selected': int((report['Source'] == name).sum()),
+            'mean_diff_pct': float(np.nanmean(diff)) if np.isfinite(diff).any() else float('nan'),
+        }
+    return summary
+
+
+class ReconciledFinancialIndicators(BaseFinancialIndicators):
+    """
+    Computes the indicators on a series merged from several providers.
+
+    By default a Bitso book is paired with the same market on Yahoo (daily bars only, which is
+    what YahooFinancial downloads), Bitso first.
+
+    Attributes:
+        symbol (str): Bitso book, e.g. 'btc_usd'.
+        start_date (str): Start date for the data range.
+        end_date (str): End date for the data range.
+        tf (int): Bar size in seconds.
+        sources (list): (provider name, constructor args) pairs, highest priority first.
+        tolerance (float): Relative close difference above which providers disagree.
+        timeout (float): Seconds to wait for the providers.
+        data (DataFrame): The merged series, with a 'Source' column.
+        report (DataFrame): Per-bar reconciliation report, see `reconcile`.
+    """
+    def __init__(self, symbol, start_date, end_date, tf=86400, sources=None, tolerance=0.02, timeout=30.0):
+        super().__init__(symbol, start_date, end_date)
+        self.tf = tf
+        if sources is None:
+            sources = [('bitso', (symbol, start_date, end_date, tf))]
+            if tf == 86400:
+                sources.append(('yahoo', (yahoo_symbol(symbol), start_date, end_date)))
+        self.sources = list(sources)
+        self.tolerance = tolerance
+        self.timeout = timeout
+        self.report = None
+
+    @timed('reconcile.fetch')
+    def fetch_data(self):
+        """
+        Fetches every source concurrently and merges what arrived in time.
+        """
+        providers = {name: create_provider(name, *args) for name, args in self.sources}
+        started = time.monotonic()
+        frames = fetch_with_fallback(providers, timeout=self.timeout)
+        if not frames:
+            print("No provider returned data for", self.symbol, f"after {time.monotonic() - started:.1f}s")
+            return
+        with timed('reconcile.merge'):
+            self.data, self.report = reconcile(frames, tf=self.tf, tolerance=self.tolerance)
+        registry.increment('reconcile.outliers', int(self.report.filter(like='Outlier_').to_numpy().sum()))
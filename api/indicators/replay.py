@@ -0,0 +1,336 @@
+"""
+Binary market-data recorder and memory-mapped replay.
+
+Everything the bot fetches can be appended to compact fixed-width binary logs, one file per
+symbol, UTC day and record kind:
+
+    <root>/<symbol>/<YYYY-MM-DD>.<kind>.bin
+
+Each file starts with a 16-byte header (magic, format version, kind, record size) followed by
+little-endian records of CANDLE_DTYPE, TRADE_DTYPE or BOOK_DTYPE. Timestamps are epoch
+milliseconds (UTC).
+
+`MarketDataReplay` memory-maps those files, so reading a day costs no parsing and batches are
+handed out as views into the mapping without allocating per record. `ReplayFinancialIndicators`
+serves recorded candles through the same interface as the live providers, which makes
+backtests, benchmarks and incident analysis reproducible offline.
+
+Recording is enabled by setting `recorder` on a provider or the MIDAS_RECORD_DIR environment
+variable.
+"""
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from .base_financial_indicators import BaseFinancialIndicators
+
+MAGIC = b'MIDAS'
+VERSION = 1
+HEADER = struct.Struct('<5sBBxI4x')  # magic, version, kind code, pad, record size, reserved
+HEADER_SIZE = HEADER.size
+
+CANDLE_DTYPE = np.dtype([('ts', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+                         ('volume', '<f8'), ('vwap', '<f8')])
+# side: 1 buy (taker bought), -1 sell
+TRADE_DTYPE = np.dtype([('ts', '<i8'), ('tid', '<i8'), ('price', '<f8'), ('amount', '<f8'), ('side', 'i1')])
+# side: 1 bid, -1 ask; amount 0 removes the level
+BOOK_DTYPE = np.dtype([('ts', '<i8'), ('price', '<f8'), ('amount', '<f8'), ('side', 'i1')])
+
+KINDS = {
+    'candle': (1, CANDLE_DTYPE),
+    'trade': (2, TRADE_DTYPE),
+    'book': (3, BOOK_DTYPE),
+}
+
+DAY_MS = 86400 * 1000
+
+
+def _day(ts_ms):
+    return datetime.fromtimestamp(ts_ms // DAY_MS * 86400, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def _path(root, symbol, day, kind):
+    return os.path.join(root, symbol, f'{day}.{kind}.bin')
+
+
+class MarketDataRecorder:
+    """
+    Appends market data to per symbol/day binary logs.
+
+    Candles are re-fetched with overlapping ranges every cycle, so only candles at or after the
+    last recorded timestamp are appended; the still-open candle is appended again on every
+    update and replay keeps its last version. Candle logs therefore stay sorted by time.
+    Trades and book diffs must be recorded in time order.
+
+    Attributes:
+        root (str): Directory holding the logs.
+    """
+    def __init__(self, root):
+        self.root = root
+        self._last_candle = {}
+        self._lock = threading.Lock()
+
+    def _append(self, kind, symbol, records):
+        code, dtype = KINDS[kind]
+        days = records['ts'] // DAY_MS
+        for day in np.unique(days):
+            chunk = records[days == day]
+            path = _path(self.root, symbol, _day(int(day) * DAY_MS), kind)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'ab') as f:
+                if f.tell() == 0:
+                    f.write(HEADER.pack(MAGIC, VERSION, code, dtype.itemsize))
+                f.write(chunk.tobytes())
+
+    def _last_recorded_candle(self, symbol):
+        if symbol not in self._last_candle:
+            last = None
+            directory = os.path.join(self.root, symbol)
+            logs = sorted(name for name in os.listdir(directory) if name.endswith('.candle.bin')) \
+                if os.path.isdir(directory) else []
+            for name in reversed(logs):
+                path = os.path.join(directory, name)
+                if os.path.getsize(path) > HEADER_SIZE:
+                    with open(path, 'rb') as f:
+                        f.seek(-CANDLE_DTYPE.itemsize, os.SEEK_END)
+                        last = int(np.frombuffer(f.read(CANDLE_DTYPE.itemsize), dtype=CANDLE_DTYPE)['ts'][0])
+                    break
+            self._last_candle[symbol] = last
+        return self._last_candle[symbol]
+
+    def record_candles(self, symbol, frame):
+        """
+        Appends the candles of a provider DataFrame (indexed by timestamp, OHLCV columns).
+
+        Parameters:
+            symbol (str): Symbol the candles belong to.
+            frame (DataFrame): Candles as stored in BaseFinancialIndicators.data.
+
+        Returns:
+            int: Number of candles appended.
+        """
+        if frame is None or frame.empty:
+            return 0
+        records = np.empty(len(frame), dtype=CANDLE_DTYPE)
+        # as_unit: pandas keeps the unit an index was built with (ns, us, ms or s); asi8 is UTC either way
+        records['ts'] = frame.index.as_unit('ms').asi8
+        for field, column in (('open', 'Open'), ('high', 'High'), ('low', 'Low'), ('close', 'Close'),
+                              ('volume', 'Volume')):
+            records[field] = frame[column].to_numpy(dtype=float)
+        records['vwap'] = frame['Bar_VWAP'].to_numpy(dtype=float) if 'Bar_VWAP' in frame else np.nan
+
+        with self._lock:
+            last = self._last_recorded_candle(symbol)
+            if last is not None:
+                records = records[records['ts'] >= last]
+            if len(records):
+                self._append('candle', symbol, records)
+                self._last_candle[symbol] = int(records['ts'][-1])
+        return len(records)
+
+    def record_trades(self, symbol, ts, price, amount, side, tid=None):
+        """
+        Appends trades given as arrays (or scalars) of equal length.
+
+        Parameters:
+            symbol (str): Symbol.
+            ts (array-like): Trade times in epoch milliseconds.
+            price (array-like): Prices.
+            amount (array-like): Amounts.
+            side (array-like): 1 for buys, -1 for sells.
+            tid (array-like): Exchange trade ids. Default 0.
+        """
+        ts = np.atleast_1d(np.asarray(ts, dtype='<i8'))
+        records = np.empty(len(ts), dtype=TRADE_DTYPE)
+        records['ts'] = ts
+        records['tid'] = 0 if tid is None else tid
+        records['price'] = price
+        records['amount'] = amount
+        records['side'] = side
+        with self._lock:
+            self._append('trade', symbol, records)
+
+    def record_book_diffs(self, symbol, ts, side, price, amount):
+        """
+        Appends order book level changes given as arrays (or scalars) of equal length.
+
+        Parameters:
+            symbol (str): Symbol.
+            ts (array-like): Times in epoch milliseconds.
+            side (array-like): 1 for bids, -1 for asks.
+            price (array-like): Level prices.
+            amount (array-like): New amount at the level, 0 to remove it.
+        """
+        ts = np.atleast_1d(np.asarray(ts, dtype='<i8'))
+        records = np.empty(len(ts), dtype=BOOK_DTYPE)
+        records['ts'] = ts
+        records['price'] = price
+        records['amount'] = amount
+        records['side'] = side
+        with self._lock:
+            self._append('book', symbol, records)
+
+
+_recorder = None
+
+
+def get_recorder():
+    """
+    Returns the process-wide recorder writing to MIDAS_RECORD_DIR, or None when it isn't set.
+    """
+    global _recorder
+    root = os.environ.get('MIDAS_RECORD_DIR')
+    if not root:
+        return None
+    if _recorder is None or _recorder.root != root:
+        _recorder = MarketDataRecorder(root)
+    return _recorder
+
+
+class MarketDataReplay:
+    """
+    Memory-mapped reader for the recorded logs.
+
+    Attributes:
+        root (str): Directory holding the logs.
+    """
+    def __init__(self, root):
+        self.root = root
+
+    def open(self, symbol, day, kind):
+        """
+        Memory-maps one log file.
+
+        Parameters:
+            symbol (str): Symbol.
+            day (str): UTC day as 'YYYY-MM-DD'.
+            kind (str): 'candle', 'trade' or 'book'.
+
+        Returns:
+            numpy.memmap: Read-only structured array of the records, empty if the file doesn't exist.
+        """
+        code, dtype = KINDS[kind]
+        path = _path(self.root, symbol, day, kind)
+        if not os.path.exists(path) or os.path.getsize(path) <= HEADER_SIZE:
+            return np.empty(0, dtype=dtype)
+        with open(path, 'rb') as f:
+            magic, version, file_code, size = HEADER.unpack(f.read(HEADER_SIZE))
+        if magic != MAGIC or file_code != code or size != dtype.itemsize:
+            raise ValueError(f"{path} is not a version {VERSION} '{kind}' log")
+        count = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+        return np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+    def days(self, start_date, end_date):
+        """
+        Lists the UTC days in [start_date, end_date).
+        """
+        day = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        while day < end:
+            yield day.strftime('%Y-%m-%d')
+            day += timedelta(days=1)
+
+    def candles(self, symbol, start_date, end_date):
+        """
+        Returns the recorded candles of a date range, keeping the last version of every candle.
+
+        Returns:
+            numpy.ndarray: Structured array of CANDLE_DTYPE sorted by time.
+        """
+        parts = [self.open(symbol, day, 'candle') for day in self.days(start_date, end_date)]
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        records = np.concatenate(parts)
+        # Last occurrence of each timestamp wins: unique on the reversed array
+        _, last = np.unique(records['ts'][::-1], return_index=True)
+        return records[len(records) - 1 - last]
+
+    def events(self, symbol, start_date, end_date, kinds=('candle', 'trade', 'book'), speed=None, batch_size=4096,
+               sleep=time.sleep, clock=time.monotonic):
+        """
+        Replays the recorded streams of a symbol merged in time order.
+
+        Records are yielded in batches of consecutive records of the same kind. Batches are views
+        into the memory-mapped files, so no memory is allocated per record.
+        trading.paper_trading.recorded_events turns them into paper trading events.
+
+        Parameters:
+            symbol (str): Symbol.
+            start_date (str): First UTC day, 'YYYY-MM-DD'.
+            end_date (str): Day after the last one, 'YYYY-MM-DD'.
+            kinds (tuple): Record kinds to replay.
+            speed (float): Replay speed relative to recorded time (e.g. 100). None replays as fast as possible.
+            batch_size (int): Maximum records per batch.
+
+        Returns:
+            generator: (kind, records) tuples.
+        """
+        start_wall = clock()
+        start_ts = None
+        for day in self.days(start_date, end_date):
+            streams = {kind: self.open(symbol, day, kind) for kind in kinds}
+            positions = {kind: 0 for kind in kinds}
+            while True:
+                heads = {kind: streams[kind]['ts'][positions[kind]] for kind in kinds
+                         if positions[kind] < len(streams[kind])}
+                if not heads:
+                    break
+                kind = min(heads, key=heads.get)
+                others = [ts for k, ts in heads.items() if k != kind]
+                stream, position = streams[kind], positions[kind]
+                stop = min(len(stream), position + batch_size)
+                if others:
+                    # The head is <= every other head, so at least one record is taken
+                    stop = position + int(np.searchsorted(stream['ts'][position:stop], min(others), side='right'))
+                batch = stream[position:stop]
+                positions[kind] = stop
+                if speed:
+                    if start_ts is None:
+                        start_ts = int(batch['ts'][0])
+                    delay = (int(batch['ts'][0]) - start_ts) / 1000 / speed - (clock() - start_wall)
+                    if delay > 0:
+                        sleep(delay)
+                yield kind, batch
+
+
+class ReplayFinancialIndicators(BaseFinancialIndicators):
+    """
+    Serves recorded candles through the same interface as the live providers.
+
+    Attributes:
+        symbol (str): Symbol as recorded, e.g. 'btc_usd'.
+        start_date (str): Start date for the data range.
+        end_date (str): End date for the data range (exclusive).
+        root (str): Directory holding the logs. Defaults to MIDAS_RECORD_DIR.
+        data (DataFrame): Candles loaded from the logs.
+    """
+    def __init__(self, symbol, start_date, end_date, root=None):
+        super().__init__(symbol, start_date, end_date)
+        self.root = root or os.environ.get('MIDAS_RECORD_DIR')
+        if not self.root:
+            raise ValueError("A recording directory is required (root or MIDAS_RECORD_DIR)")
+
+    def fetch_data(self):
+        """
+        Loads the recorded candles of the date range.
+        """
+        import pandas as pd
+
+        records = MarketDataReplay(self.root).candles(self.symbol, self.start_date, self.end_date)
+        if not len(records):
+            print("No recorded data for", self.symbol, self.start_date, self.end_date)
+            return
+        self.data = pd.DataFrame({
+            'Open': records['open'],
+            'High': records['high'],
+            'Low': records['low'],
+            'Close': records['close'],
+            'Adj Close': records['close'],
+            'Volume': records['volume'],
+            'Bar_VWAP': records['vwap'],
+        }, index=pd.DatetimeIndex(records['ts'].astype('datetime64[ms]').astype('datetime64[ns]'), name='Date'))
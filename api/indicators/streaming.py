@@ -0,0 +1,197 @@
+"""
+Incremental versions of the indicators computed in BaseFinancialIndicators.
+
+The batch methods work on a whole DataFrame; the classes here keep O(1) state per update so
+an indicator can be maintained as bars (or trades) arrive, without recomputing the history.
+"""
+import math
+from collections import deque
+from datetime import datetime, timezone
+
+DAY_SECONDS = 86400
+
+
+class StreamingVWAP:
+    """
+    Incrementally maintained VWAP, anchored to the UTC day (or a custom session) or month and/or
+    rolling over the last N bars.
+
+    Bars contribute `price * volume`, where price is the bar's own trade VWAP when the provider
+    reports one (Bitso does) and (High + Low) / 2 otherwise. Individual trades can be fed with
+    `update_trade` for an exact trade VWAP.
+
+    Attributes:
+        session_start (int): Seconds after 00:00 UTC at which the anchor resets. Default 0.
+        session_length (int): Length of the session in seconds. Bars outside it are ignored.
+        window (int): Number of bars for the rolling VWAP, or None to disable it.
+        anchor (str): 'D' resets at every session, 'M' at every UTC calendar month (the session
+            is ignored), as BaseFinancialIndicators anchors daily bars.
+    """
+    def __init__(self, session_start=0, session_length=DAY_SECONDS, window=None, anchor='D'):
+        self.session_start = session_start
+        self.session_length = session_length
+        self.window = window
+        self.anchor = anchor
+        self._anchor = None
+        self._pv = 0.0
+        self._volume = 0.0
+        self._bars = deque()
+        self._rolling_pv = 0.0
+        self._rolling_volume = 0.0
+
+    def _session(self, ts):
+        """
+        Returns the session id for a timestamp, or None when it falls outside the session.
+        """
+        if self.anchor == 'M':
+            month = datetime.fromtimestamp(ts, timezone.utc)
+            return month.year * 12 + month.month - 1
+        shifted = ts - self.session_start
+        anchor = shifted // DAY_SECONDS
+        if shifted - anchor * DAY_SECONDS >= self.session_length:
+            return None
+        return anchor
+
+    def _add(self, ts, pv, volume):
+        anchor = self._session(ts)
+        if anchor is None:
+            return
+        if anchor != self._anchor:
+            self._anchor = anchor
+            self._pv = 0.0
+            self._volume = 0.0
+        self._pv += pv
+        self._volume += volume
+
+    def update(self, ts, high, low, volume, vwap=None):
+        """
+        Adds a bar.
+
+        Parameters:
+            ts (float): Bar start time in seconds since the epoch (UTC).
+            high (float): Bar high.
+            low (float): Bar low.
+            volume (float): Bar volume.
+            vwap (float): The bar's trade VWAP, if the provider reports it.
+
+        Returns:
+            float: The anchored VWAP after the update.
+        """
+        price = vwap if vwap is not None and vwap == vwap else (high + low) / 2
+        pv = price * volume
+        self._add(ts, pv, volume)
+        if self.window:
+            self._bars.append((pv, volume))
+            self._rolling_pv += pv
+            self._rolling_volume += volume
+            if len(self._bars) > self.window:
+                old_pv, old_volume = self._bars.popleft()
+                self._rolling_pv -= old_pv
+                self._rolling_volume -= old_volume
+        return self.value
+
+    def update_trade(self, ts, price, amount):
+        """
+        Adds a single trade to the anchored VWAP.
+
+        Parameters:
+            ts (float): Trade time in seconds since the epoch (UTC).
+            price (float): Trade price.
+            amount (float): Traded amount.
+
+        Returns:
+            float: The anchored VWAP after the update.
+        """
+        self._add(ts, price * amount, amount)
+        return self.value
+
+    @property
+    def value(self):
+        """
+        Anchored VWAP of the current session, or None before any volume.
+        """
+        return self._pv / self._volume if self._volume else None
+
+    @property
+    def rolling_value(self):
+        """
+        VWAP over the last `window` bars, or None before any volume.
+        """
+        return self._rolling_pv / self._rolling_volume if self._rolling_volume else None
+
+
+class RollingExtrema:
+    """
+    Rolling maximum of highs and minimum of lows over the last `window` updates, maintained
+    with monotonic deques: every value is pushed and popped at most once, so a full pass over
+    n bars is O(n) regardless of the window size.
+
+    Until `window` values have been seen the extrema cover all values so far. NaN values are skipped
+    like pandas `rolling(window, min_periods=1).max()` / `.min()` does: they take up a position in the
+    window but never become an extremum, and the extremum is NaN only while the window holds no other
+    value.
+
+    Attributes:
+        window (int): Number of most recent values covered.
+    """
+    def __init__(self, window):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.window = window
+        self._count = 0
+        self._max = deque()  # (position, high), highs decreasing
+        self._min = deque()  # (position, low), lows increasing
+
+    def update(self, high, low=None):
+        """
+        Adds a value (or a bar's high and low) and returns the current extrema.
+
+        Parameters:
+            high (float): Value, or the bar's high.
+            low (float): The bar's low. Defaults to `high`.
+
+        Returns:
+            tuple: (rolling max, rolling min).
+        """
+        if low is None:
+            low = high
+        position = self._count
+        self._count += 1
+        if high == high:  # not NaN
+            while self._max and self._max[-1][1] <= high:
+                self._max.pop()
+            self._max.append((position, high))
+        if low == low:
+            while self._min and self._min[-1][1] >= low:
+                self._min.pop()
+            self._min.append((position, low))
+        expired = position - self.window
+        if self._max and self._max[0][0] <= expired:
+            self._max.popleft()
+        if self._min and self._min[0][0] <= expired:
+            self._min.popleft()
+        return (self._max[0][1] if self._max else math.nan), (self._min[0][1] if self._min else math.nan)
+
+
+def rolling_extrema(high, low, window):
+    """
+    Computes the rolling max of `high` and rolling min of `low` in a single O(n) pass.
+
+    Parameters:
+        high (array-like): Highs.
+        low (array-like): Lows.
+        window (int): Window length in bars.
+
+    Returns:
+        tuple: Two NumPy arrays (rolling max, rolling min).
+    """
+    import numpy as np
+
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    maxima = np.empty(len(high))
+    minima = np.empty(len(low))
+    extrema = RollingExtrema(window)
+    for i, (h, l) in enumerate(zip(high.tolist(), low.tolist())):
+        maxima[i], minima[i] = extrema.update(h, l)
+    return maxima, minima
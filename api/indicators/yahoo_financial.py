@@ -1,4 +1,5 @@
-import yfinance as yf
+from api.http_client import get_client
+from api.instrumentation import timed
 from .base_financial_indicators import BaseFinancialIndicators
 
 class YahooFinancial(BaseFinancialIndicators):
@@ -23,9 +24,18 @@ class YahooFinancial(BaseFinancialIndicators):
         """
         super().__init__(symbol, start_date, end_date)
 
+    @timed('yahoo.fetch')
     def fetch_data(self):
         """
         Downloads financial data for the specified asset and date range from Yahoo Finance.
+
+        The download reuses the pooled session of the shared Yahoo client and is throttled by its rate limiter.
         """
-        self.data = yf.download(self.symbol, start=self.start_date, end=self.end_date)
+        import yfinance as yf  # heavy (pandas, lxml, bs4): only imported when Yahoo is actually used
+
+        client = get_client('yahoo')
+        client.limiter.acquire()
+        self.data = yf.download(self.symbol, start=self.start_date, end=self.end_date,
+                                session=client.session, timeout=client.timeout[1])
+        self._record_data()
         print(self.data)
\ No newline at end of file
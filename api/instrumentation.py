@@ -0,0 +1,331 @@
+"""
+Lightweight instrumentation for the snapshot cycle.
+
+Every expensive stage of a cycle (fetch, parse, indicator computation, DB write, LLM call)
+is wrapped with `timed`, which records a latency histogram and call/error counters in a
+process-wide registry and, when the process has initialised Sentry, opens a child span so
+the stage shows up in the trace. Sentry is never imported from here, so short-lived CLI
+runs don't pay for it.
+
+The registry can be exported in the Prometheus text format with `render_prometheus()`.
+A stdlib sampling profiler can be toggled with the MIDAS_PROFILER environment variable
+(or `start_profiler()`) to find hot frames without any extra dependency.
+"""
+import functools
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+# Latency buckets in seconds, from a cached indicator computation up to a slow LLM call.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """
+    Cumulative latency histogram with fixed upper bounds, as exposed by Prometheus.
+
+    Attributes:
+        buckets (tuple): Upper bounds of the buckets in seconds.
+        counts (list): Number of observations per bucket (non-cumulative), plus +Inf.
+        total (float): Sum of all observed values.
+        count (int): Number of observations.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """
+        Records one observation.
+
+        Parameters:
+            value (float): Observed latency in seconds.
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        """
+        Returns the cumulative count for every bucket, ending with +Inf.
+
+        Returns:
+            list: Cumulative counts.
+        """
+        cumulative = []
+        running = 0
+        for c in self.counts:
+            running += c
+            cumulative.append(running)
+        return cumulative
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of counters and latency histograms keyed by stage name.
+    """
+    def __init__(self, prefix='midas'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = Counter()
+        self._histograms = {}
+
+    def increment(self, name, value=1):
+        """
+        Increments a counter.
+
+        Parameters:
+            name (str): Counter name.
+            value (int): Amount to add. Default is 1.
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name, seconds):
+        """
+        Records a latency observation in the histogram for the given stage.
+
+        Parameters:
+            name (str): Stage name.
+            seconds (float): Elapsed time in seconds.
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self):
+        """
+        Returns a copy of the current counters and histogram summaries.
+
+        Returns:
+            dict: Counters and, per stage, the count, sum and mean latency.
+        """
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'histograms': {
+                    name: {'count': h.count, 'sum': h.total, 'mean': h.total / h.count if h.count else 0.0}
+                    for name, h in self._histograms.items()
+                },
+            }
+
+    def reset(self):
+        """
+        Clears every counter and histogram.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self):
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics page.
+        """
+        counter_name = f'{self.prefix}_stage_calls_total'
+        error_name = f'{self.prefix}_stage_errors_total'
+        latency_name = f'{self.prefix}_stage_latency_seconds'
+        lines = []
+        with self._lock:
+            calls = {k[:-len('.calls')]: v for k, v in self._counters.items() if k.endswith('.calls')}
+            errors = {k[:-len('.errors')]: v for k, v in self._counters.items() if k.endswith('.errors')}
+            others = {k: v for k, v in self._counters.items() if not k.endswith(('.calls', '.errors'))}
+
+            lines.append(f'# TYPE {counter_name} counter')
+            for stage, value in sorted(calls.items()):
+                lines.append(f'{counter_name}{{stage="{stage}"}} {value}')
+            lines.append(f'# TYPE {error_name} counter')
+            for stage, value in sorted(errors.items()):
+                lines.append(f'{error_name}{{stage="{stage}"}} {value}')
+            for name, value in sorted(others.items()):
+                metric = f"{self.prefix}_{name.replace('.', '_')}_total"
+                lines.append(f'# TYPE {metric} counter')
+                lines.append(f'{metric} {value}')
+
+            lines.append(f'# TYPE {latency_name} histogram')
+            for stage, histogram in sorted(self._histograms.items()):
+                cumulative = histogram.cumulative_counts()
+                for bound, value in zip(histogram.buckets, cumulative):
+                    lines.append(f'{latency_name}_bucket{{stage="{stage}",le="{bound}"}} {value}')
+                lines.append(f'{latency_name}_bucket{{stage="{stage}",le="+Inf"}} {cumulative[-1]}')
+                lines.append(f'{latency_name}_sum{{stage="{stage}"}} {histogram.total}')
+                lines.append(f'{latency_name}_count{{stage="{stage}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class timed:
+    """
+    Times a stage of the snapshot cycle. Usable as a decorator or as a context manager.
+
+    Records the elapsed time in the `<name>` histogram, increments `<name>.calls` and, when
+    the stage raises, `<name>.errors`. If Sentry has been imported by the process a child
+    span with `op=name` is opened for the duration of the stage.
+
+    Example:
+        @timed('bitso.fetch')
+        def fetch_data(self): ...
+
+        with timed('snapshot.write'):
+            IndicatorSnapshot.bulk_upsert(rows)
+    """
+    def __init__(self, name, metrics=None):
+        self.name = name
+        self.metrics = metrics if metrics is not None else registry
+        self._local = threading.local()
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(self.name, self.metrics):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        sentry_sdk = sys.modules.get('sentry_sdk')
+        span = sentry_sdk.start_span(op=self.name) if sentry_sdk is not None else None
+        if span is not None:
+            span.__enter__()
+        stack.append((time.perf_counter(), span))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        started, span = self._local.stack.pop()
+        elapsed = time.perf_counter() - started
+        self.metrics.observe(self.name, elapsed)
+        self.metrics.increment(f'{self.name}.calls')
+        if exc_type is not None:
+            self.metrics.increment(f'{self.name}.errors')
+        if span is not None:
+            span.__exit__(exc_type, exc, tb)
+        return False
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler that samples the stacks of all other threads at a fixed interval.
+
+    It only relies on `sys._current_frames()`, so it can be left on in production at a low
+    sampling rate. Samples are aggregated by (file, line, function) of the innermost frame
+    and by full stack.
+
+    Attributes:
+        interval (float): Seconds between samples.
+        samples (Counter): Number of samples per innermost frame.
+        stacks (Counter): Number of samples per collapsed stack.
+    """
+    def __init__(self, interval=0.01, max_depth=32):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Starts sampling in a daemon thread. Calling it twice is a no-op.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='midas-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops sampling and waits for the sampling thread to finish.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                code = frame.f_code
+                self.samples[(code.co_filename, frame.f_lineno, code.co_name)] += 1
+                names = []
+                depth = 0
+                while frame is not None and depth < self.max_depth:
+                    names.append(frame.f_code.co_name)
+                    frame = frame.f_back
+                    depth += 1
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def top(self, limit=20):
+        """
+        Returns the most sampled frames.
+
+        Parameters:
+            limit (int): Number of frames to return. Default is 20.
+
+        Returns:
+            list: Tuples of ((file, line, function), samples).
+        """
+        return self.samples.most_common(limit)
+
+    def collapsed(self):
+        """
+        Returns the samples in the collapsed-stack format understood by flamegraph tools.
+
+        Returns:
+            str: One `stack count` line per distinct stack.
+        """
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common())
+
+
+profiler = None
+
+
+def start_profiler(interval=None):
+    """
+    Starts the process-wide sampling profiler.
+
+    Parameters:
+        interval (float): Seconds between samples. Defaults to MIDAS_PROFILER_INTERVAL or 0.01.
+
+    Returns:
+        SamplingProfiler: The running profiler.
+    """
+    global profiler
+    if profiler is None:
+        if interval is None:
+            interval = float(os.environ.get('MIDAS_PROFILER_INTERVAL', '0.01'))
+        profiler = SamplingProfiler(interval=interval)
+    profiler.start()
+    return profiler
+
+
+def stop_profiler():
+    """
+    Stops the process-wide sampling profiler, if running.
+
+    Returns:
+        SamplingProfiler: The stopped profiler, or None if it was never started.
+    """
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+
+if os.environ.get('MIDAS_PROFILER', '').lower() in ('1', 'true', 'yes'):
+    start_profiler()
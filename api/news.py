@@ -0,0 +1,325 @@
+"""
+News ingestion and sentiment scoring for the market context analysis.
+
+`NewsPipeline` pulls RSS/Atom feeds and HTML pages concurrently with asyncio (bounded by a
+semaphore, the blocking I/O and parsing run in a thread pool through the shared HTTP client),
+parses them with lxml/BeautifulSoup, deduplicates articles by a hash of their normalised
+content, tags the coins they mention and scores their sentiment in one batch.
+
+`file://` URLs are read from disk, so the pipeline can be exercised against local fixture feeds.
+"""
+import asyncio
+import email.utils
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urljoin, urlsplit
+from urllib.request import url2pathname
+
+from api.http_client import get_client
+from api.instrumentation import registry, timed
+
+DEFAULT_FEEDS = (
+    'https://www.coindesk.com/arc/outboundfeeds/rss/',
+    'https://cointelegraph.com/rss',
+    'https://bitcoinmagazine.com/.rss/full/',
+    'https://decrypt.co/feed',
+)
+
+# Coins tagged in articles, as {symbol: names and tickers that identify it}
+COIN_KEYWORDS = {
+    'btc': ('bitcoin', 'btc'),
+    'eth': ('ethereum', 'ether', 'eth'),
+    'xrp': ('xrp', 'ripple'),
+    'sol': ('solana', 'sol'),
+    'ada': ('cardano', 'ada'),
+    'doge': ('dogecoin', 'doge'),
+    'ltc': ('litecoin', 'ltc'),
+    'dot': ('polkadot',),
+    'matic': ('polygon', 'matic'),
+    'avax': ('avalanche', 'avax'),
+    'link': ('chainlink',),
+    'usdt': ('tether', 'usdt'),
+}
+
+POSITIVE_WORDS = frozenset("""
+adopt adoption advance approval approve approved beat bull bullish boost breakout buy climb gain gains green
+growth high higher inflow inflows jump launch milestone optimism optimistic outperform partnership profit
+rally rebound record recover recovery rise rises rising soar soars strong success support surge surges upgrade
+upside win
+""".split())
+
+NEGATIVE_WORDS = frozenset("""
+ban bear bearish breach collapse concern crash decline declines delist drop drops dump exploit fail failure
+fall falls fear fraud hack hacked lawsuit liquidation liquidations loss losses low lower outflow outflows
+plunge plunges red reject rejected risk scam selloff slump sue sued tumble warning weak
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+_SPACES = re.compile(r'\s+')
+
+
+def _text(value):
+    return _SPACES.sub(' ', value or '').strip()
+
+
+def _parse_date(value):
+    """
+    Parses RFC 822 (RSS) and ISO 8601 (Atom, HTML) dates to naive UTC datetimes.
+    """
+    value = _text(value)
+    if not value:
+        return None
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def content_hash(title, summary):
+    """
+    Hash of the normalised title and summary, identical for the same story syndicated by several feeds.
+    """
+    normalised = _text(f'{title} {summary}').lower()
+    return hashlib.sha1(normalised.encode('utf-8')).hexdigest()
+
+
+def parse_feed(content, source):
+    """
+    Parses an RSS 2.0 or Atom document.
+
+    Parameters:
+        content (bytes): Raw feed.
+        source (str): Feed URL, stored with every article.
+
+    Returns:
+        list: Article dicts with source, url, title, summary and published_at.
+    """
+    from lxml import etree
+    from bs4 import BeautifulSoup
+
+    parser = etree.XMLParser(recover=True, resolve_entities=False, no_network=True)
+    root = etree.fromstring(content, parser=parser)
+    if root is None:
+        return []
+    articles = []
+    for item in root.iter('{*}item', '{*}entry'):
+        fields = {etree.QName(child).localname: child for child in item if isinstance(child.tag, str)}
+        link = fields.get('link')
+        url = None
+        if link is not None:
+            url = link.get('href') or link.text
+        summary = fields.get('description')
+        if summary is None:
+            summary = fields.get('summary', fields.get('content'))
+        summary_text = summary.text if summary is not None else ''
+        if summary_text and '<' in summary_text:
+            summary_text = BeautifulSoup(summary_text, 'lxml').get_text(' ')
+        published = next((fields[k].text for k in ('pubDate', 'published', 'updated', 'date') if k in fields), None)
+        articles.append({
+            'source': source,
+            'url': _text(url),
+            'title': _text(fields['title'].text if 'title' in fields else ''),
+            'summary': _text(summary_text),
+            'published_at': _parse_date(published),
+        })
+    return articles
+
+
+def parse_html(content, source):
+    """
+    Extracts articles from an HTML news page: every <article> element with a heading, or the page
+    itself (title and description meta tags) when it has none.
+
+    Parameters:
+        content (bytes): Raw HTML.
+        source (str): Page URL, used to resolve relative links.
+
+    Returns:
+        list: Article dicts with source, url, title, summary and published_at.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, 'lxml')
+    articles = []
+    for node in soup.find_all('article'):
+        heading = node.find(['h1', 'h2', 'h3'])
+        if heading is None:
+            continue
+        link = heading.find('a', href=True) or node.find('a', href=True)
+        time_tag = node.find('time')
+        paragraph = node.find('p')
+        articles.append({
+            'source': source,
+            'url': urljoin(source, link['href']) if link else source,
+            'title': _text(heading.get_text(' ')),
+            'summary': _text(paragraph.get_text(' ') if paragraph else ''),
+            'published_at': _parse_date(time_tag.get('datetime') or time_tag.get_text()) if time_tag else None,
+        })
+    if not articles and soup.title is not None:
+        description = soup.find('meta', attrs={'name': 'description'}) or soup.find('meta', property='og:description')
+        published = soup.find('meta', property='article:published_time')
+        articles.append({
+            'source': source,
+            'url': source,
+            'title': _text(soup.title.get_text()),
+            'summary': _text(description.get('content') if description else ''),
+            'published_at': _parse_date(published.get('content')) if published else None,
+        })
+    return articles
+
+
+def parse_document(content, source):
+    """
+    Parses a feed or an HTML page, sniffing the format from the document itself.
+    """
+    head = content[:512].lstrip().lower()
+    if head.startswith(b'<?xml') or b'<rss' in head or b'<feed' in head:
+        return parse_feed(content, source)
+    return parse_html(content, source)
+
+
+def tag_symbols(texts):
+    """
+    Finds the coins mentioned in each text.
+
+    Parameters:
+        texts (list): Lowercase texts.
+
+    Returns:
+        list: Comma separated symbols per text ('' when none).
+    """
+    keyword_symbol = {keyword: symbol for symbol, keywords in COIN_KEYWORDS.items() for keyword in keywords}
+    tagged = []
+    for text in texts:
+        found = sorted({keyword_symbol[t] for t in _TOKEN.findall(text) if t in keyword_symbol})
+        tagged.append(','.join(found))
+    return tagged
+
+
+def score_sentiment(texts):
+    """
+    Scores a batch of texts with the finance lexicon.
+
+    The score is (positive - negative) / (positive + negative) hits, in [-1, 1], and 0 when the
+    text has no sentiment-bearing word.
+
+    Parameters:
+        texts (list): Lowercase texts.
+
+    Returns:
+        numpy.ndarray: One score per text.
+    """
+    import numpy as np
+
+    counts = np.zeros((len(texts), 2))
+    for i, text in enumerate(texts):
+        tokens = _TOKEN.findall(text)
+        counts[i, 0] = sum(1 for t in tokens if t in POSITIVE_WORDS)
+        counts[i, 1] = sum(1 for t in tokens if t in NEGATIVE_WORDS)
+    total = counts.sum(axis=1)
+    return np.divide(counts[:, 0] - counts[:, 1], total, out=np.zeros(len(texts)), where=total > 0)
+
+
+class NewsPipeline:
+    """
+    Concurrent news collection: fetch, parse, deduplicate, tag and score.
+
+    Attributes:
+        feeds (list): Feed or page URLs (http(s):// or file://).
+        max_concurrency (int): Maximum number of sources fetched and parsed at the same time.
+        seen (set): Content hashes already stored; carried over between runs to skip repeats. Filled by
+            `mark_seen` once the articles are persisted, so a failed write is retried on the next run.
+            Cleared once it holds `max_seen` hashes, the database unique key catches the rest.
+    """
+    max_seen = 100000
+
+    def __init__(self, feeds=None, max_concurrency=16, seen=None):
+        if feeds is None:
+            env = os.environ.get('MIDAS_NEWS_FEEDS')
+            feeds = [f.strip() for f in env.split(',') if f.strip()] if env else list(DEFAULT_FEEDS)
+        self.feeds = list(feeds)
+        self.max_concurrency = max_concurrency
+        self.seen = set() if seen is None else seen
+        self.client = get_client('news', rate_limit=(max(60, max_concurrency), 1.0))
+
+    def _read(self, url):
+        parts = urlsplit(url)
+        if parts.scheme == 'file':
+            with open(url2pathname(parts.path), 'rb') as f:
+                return f.read()
+        return self.client.get(url).content
+
+    def _fetch_and_parse(self, url):
+        with timed('news.source'):
+            return parse_document(self._read(url), url)
+
+    async def _collect(self, executor):
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def source(url):
+            async with semaphore:
+                try:
+                    return await loop.run_in_executor(executor, self._fetch_and_parse, url)
+                except Exception as e:
+                    registry.increment('news.source_errors')
+                    print("Error fetching news from", url, e)
+                    return []
+
+        return await asyncio.gather(*(source(url) for url in self.feeds))
+
+    def run(self):
+        """
+        Collects every source and returns the new articles.
+
+        Returns:
+            list: Article dicts with content_hash, source, url, title, summary, published_at,
+            fetched_at, symbols and sentiment, not yet marked seen. Pass them to `mark_seen` once
+            they are stored.
+        """
+        if len(self.seen) > self.max_seen:
+            self.seen.clear()
+        with timed('news.cycle'):
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='midas-news') as executor:
+                results = asyncio.run(self._collect(executor))
+
+            fetched_at = datetime.now(timezone.utc).replace(tzinfo=None)
+            articles = []
+            collected = set()
+            for article in (a for batch in results for a in batch):
+                if not article['title']:
+                    continue
+                digest = content_hash(article['title'], article['summary'])
+                if digest in self.seen or digest in collected:
+                    continue
+                collected.add(digest)
+                article['content_hash'] = digest
+                article['fetched_at'] = fetched_at
+                if article['published_at'] is None:
+                    article['published_at'] = fetched_at
+                articles.append(article)
+
+            texts = [f"{a['title']} {a['summary']}".lower() for a in articles]
+            for article, symbols, score in zip(articles, tag_symbols(texts), score_sentiment(texts)):
+                article['symbols'] = symbols
+                article['sentiment'] = float(score)
+        registry.increment('news.articles', len(articles))
+        return articles
+
+    def mark_seen(self, articles):
+        """
+        Records articles returned by `run` as stored, so later runs skip them.
+
+        Parameters:
+            articles (list): Article dicts as returned by `run`.
+        """
+        self.seen.update(article['content_hash'] for article in articles)
@@ -1,35 +1,28 @@
-from api.indicators.bitso import Bitso
-from api.indicators.yahoo_financial import YahooFinancial
+from api.indicators.providers import create_provider
+from api.indicators.reconciled import summarize
 from analysis.Indicators import Indicators
 
 
 def print_hi(name):
-    # Bitso instance
-    bitso_data = Bitso('btc_usd', '2023-01-01', '2023-02-20', 86400)
+    # Bitso and YahooFinancial fetched concurrently and merged into one series; if one of them
+    # is slow or failing the other one is used on its own
+    btc_data = create_provider('reconciled', 'btc_usd', '2023-01-01', '2023-02-20', 86400)
 
-    # YahooFinancial instance
-    yahoo_data = YahooFinancial('BTC-USD', '2023-01-01', '2023-02-20')
+    # Indicators instance for the merged series
+    indicators_btc = Indicators(btc_data)
 
-    # Indicators instance for Bitso
-    indicators_bitso = Indicators(bitso_data)
+    # Get all indicators
+    all_indicators_btc = indicators_btc.get_indicators()
 
-    # Indicators instance for YahooFinancial
-    indicators_yahoo = Indicators(yahoo_data)
+    # Print how the providers compared and which one each bar came from
+    if btc_data.report is not None:
+        print("Provider comparison:")
+        for provider, figures in summarize(btc_data.report).items():
+            print(f"{provider}: {figures}")
 
-    # Get all indicators for Bitso
-    all_indicators_bitso = indicators_bitso.get_indicators()
-
-    # Get all indicators for YahooFinancial
-    all_indicators_yahoo = indicators_yahoo.get_indicators()
-
-    # Print all indicators for Bitso
-    print("Indicators for Bitso:")
-    for indicator, value in all_indicators_bitso.items():
-        print(f"{indicator}: {value}")
-
-    # Print all indicators for YahooFinancial
-    print("Indicators for YahooFinancial:")
-    for indicator, value in all_indicators_yahoo.items():
+    # Print all indicators
+    print("Indicators for BTC (reconciled):")
+    for indicator, value in all_indicators_btc.items():
         print(f"{indicator}: {value}")
 
 
@@ -1,34 +1,142 @@
 # app.py
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
+import os
+import click
+from flask import Flask, Response, jsonify, request
 from flask_migrate import Migrate
-import sentry_sdk
-from sentry_sdk.integrations.flask import FlaskIntegration
-from config import SENTRY_DSN, SQLALCHEMY_DATABASE_URI, SQLALCHEMY_TRACK_MODIFICATIONS
+from config import (POLYGON_API_KEY, SENTRY_DSN, SQLALCHEMY_DATABASE_URI, SQLALCHEMY_TRACK_MODIFICATIONS,
+                    SNAPSHOT_GROUPS, SNAPSHOT_INTERVAL, SNAPSHOT_OVERLAP, NEWS_INTERVAL, NEWS_MAX_CONCURRENCY,
+                    ALERT_RULES_FILE, ALERT_DEDUP_WINDOW, CORRELATION_WINDOW, CORRELATION_HALFLIFE)
 
+from extensions import db
 from worker import start_worker_thread
+from scheduler import SnapshotScheduler, parse_groups, snapshot_job
+from api.alerts import AlertEngine, EmailSink, MemorySink, Notifier, WebhookSink
+from api.instrumentation import registry
 
 
-sentry_sdk.init(
-    dsn=SENTRY_DSN,
-    integrations=[FlaskIntegration()],
-    traces_sample_rate=1.0
-)
+def init_sentry(dsn):
+    # Sentry is only imported when a DSN is configured, keeping local and cron runs fast to start
+    if not dsn or dsn in ('NA', 'default_sentry_dsn_url'):
+        return
+    import sentry_sdk
+    from sentry_sdk.integrations.flask import FlaskIntegration
+
+    sentry_sdk.init(
+        dsn=dsn,
+        integrations=[FlaskIntegration()],
+        traces_sample_rate=1.0,
+        profiles_sample_rate=float(os.environ.get('SENTRY_PROFILES_SAMPLE_RATE', '0.0'))
+    )
+
+init_sentry(SENTRY_DSN)
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = SQLALCHEMY_DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = SQLALCHEMY_TRACK_MODIFICATIONS
+app.config['POLYGON_API_KEY'] = POLYGON_API_KEY
 
-db = SQLAlchemy(app)
+db.init_app(app)
 migrate = Migrate(app, db)
 
 # Import models
-from models import BitcoinPrice
+from models import BitcoinPrice, IndicatorSnapshot, NewsArticle
+from snapshots import CorrelationTracker, SnapshotWriter
+
+# Bitso needs the candle size in seconds, the other providers only take the date range
+PROVIDER_ARGS = {'bitso': (86400,)}
+
+notifier = Notifier({'webhook': WebhookSink(), 'email': EmailSink.from_env(), 'memory': MemorySink()},
+                    dedup_window=ALERT_DEDUP_WINDOW)
+alert_engine = AlertEngine(notifier)
+if ALERT_RULES_FILE:
+    alert_engine.load_rules(ALERT_RULES_FILE)
+
+scheduler = SnapshotScheduler()
+snapshot_writer = SnapshotWriter(app)
+
+def on_snapshot(provider, processor, values):
+    snapshot_writer.add(provider, processor, values)
+    alert_engine.evaluate(processor.symbol, dict(values, Close=processor.data['Close'].iloc[-1]))
+
+# Correlation engines of each group, refreshed with the closes of every cycle
+correlations = {}
+
+def group_callbacks(tracker):
+    def on_result(provider, processor, values):
+        on_snapshot(provider, processor, values)
+        tracker.add(provider, processor, values)
+
+    def on_cycle_end(group):
+        snapshot_writer.flush(group)
+        tracker.flush(group)
+    return on_result, on_cycle_end
+
+for group_name, provider, symbols in parse_groups(SNAPSHOT_GROUPS):
+    correlations[group_name] = CorrelationTracker(symbols, window=CORRELATION_WINDOW, halflife=CORRELATION_HALFLIFE)
+    on_result, on_cycle_end = group_callbacks(correlations[group_name])
+    job = snapshot_job(provider, provider_args=PROVIDER_ARGS.get(provider, ()), on_result=on_result)
+    scheduler.add_group(group_name, symbols, job, interval=SNAPSHOT_INTERVAL, overlap=SNAPSHOT_OVERLAP,
+                        on_cycle_end=on_cycle_end)
+
+# News runs on its own single-worker scheduler: slow feeds never hold up a market snapshot
+news_scheduler = SnapshotScheduler(max_workers=1)
+news_pipeline = None
+
+def collect_news(_):
+    from api.news import NewsPipeline
+
+    global news_pipeline
+    if news_pipeline is None:
+        news_pipeline = NewsPipeline(max_concurrency=NEWS_MAX_CONCURRENCY)
+    articles = news_pipeline.run()
+    with app.app_context():
+        NewsArticle.bulk_insert(articles)
+    news_pipeline.mark_seen(articles)
+
+news_scheduler.add_group('news', ['feeds'], collect_news, interval=NEWS_INTERVAL, spread=0)
+
+@app.cli.command('export-features')
+@click.argument('root')
+@click.option('--provider', default='bitso', help='Provider of the stored snapshots.')
+@click.option('--start', default='2020-01-01', help='First day to export (YYYY-MM-DD, UTC).')
+@click.option('--end', default=None, help='Day after the last one to export. Default is tomorrow.')
+@click.option('--format', 'file_format', type=click.Choice(['arrow', 'parquet']), default='arrow')
+def export_features(root, provider, start, end, file_format):
+    """Exports ML features of every stored symbol and timeframe to ROOT, skipping exported months."""
+    from datetime import datetime, timedelta
+    from analysis.feature_store import FeatureStore, history_source
+
+    start = datetime.strptime(start, '%Y-%m-%d')
+    end = datetime.strptime(end, '%Y-%m-%d') if end else datetime.utcnow().replace(
+        hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    keys = db.session.execute(db.select(IndicatorSnapshot.symbol, IndicatorSnapshot.timeframe)
+                              .where(IndicatorSnapshot.provider == provider).distinct()).all()
+    store = FeatureStore(root, format=file_format)
+    stats = store.export(history_source(IndicatorSnapshot.history, provider), [tuple(k) for k in keys], start, end)
+    click.echo(f"{stats['written']} partitions written ({stats['rows']} rows), {stats['skipped']} already exported")
 
 @app.route('/')
 def index():
     return 'health check'
 
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/snapshot', methods=['POST'])
+def snapshot():
+    # Elastic Beanstalk worker contract: the SQS daemon POSTs the message body (or, for cron.yaml
+    # tasks, sets X-Aws-Sqsd-Taskname) and retries the message unless it gets a 200
+    payload = request.get_json(silent=True) or {}
+    group = payload.get('group', request.args.get('group'))
+    target = news_scheduler if group == 'news' else scheduler
+    if group is not None and group not in target.groups:
+        return jsonify({'error': f"unknown group '{group}'"}), 400
+    started = target.trigger(group)
+    return jsonify({'task': request.headers.get('X-Aws-Sqsd-Taskname'), 'started': started})
+
 if __name__ == '__main__':
-    start_worker_thread()
+    start_worker_thread(app)
+    scheduler.start()
+    news_scheduler.start()
     app.run()
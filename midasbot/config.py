@@ -2,7 +2,7 @@
 import os
 
 POLYGON_API_KEY = os.environ.get('POLYGON_API_KEY', 'default_polygon_api_key')
-SQLALCHEMY_DATABASE_URI = (
+SQLALCHEMY_DATABASE_URI = os.environ.get('SQLALCHEMY_DATABASE_URI') or (
     f"mysql+pymysql://{os.environ.get('MYSQL_DATABASE_USERNAME')}:" 
     f"{os.environ.get('MYSQL_DATABASE_PASSWORD')}@"
     f"{os.environ.get('MYSQL_DATABASE_HOST')}/"
@@ -10,4 +10,22 @@ SQLALCHEMY_DATABASE_URI = (
 )
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 SENTRY_DSN = os.environ.get('SENTRY_DSN', 'default_sentry_dsn_url')
+
+# Snapshot scheduling: seconds between cycles and symbol groups as
+# "group=provider:SYMBOL,SYMBOL;group=provider:SYMBOL"
+SNAPSHOT_INTERVAL = int(os.environ.get('SNAPSHOT_INTERVAL', '1200'))
+SNAPSHOT_GROUPS = os.environ.get('SNAPSHOT_GROUPS', 'bitso=bitso:btc_usd,eth_usd;yahoo=yahoo:BTC-USD,ETH-USD')
+SNAPSHOT_OVERLAP = os.environ.get('SNAPSHOT_OVERLAP', 'skip')
+
+# Correlation of each group's closes, refreshed every cycle: rolling window and EWM half-life in bars
+CORRELATION_WINDOW = int(os.environ.get('CORRELATION_WINDOW', '30'))
+CORRELATION_HALFLIFE = float(os.environ.get('CORRELATION_HALFLIFE', '20'))
+
+# News collection runs on its own scheduler so it never delays the market snapshot
+NEWS_INTERVAL = int(os.environ.get('NEWS_INTERVAL', '1200'))
+NEWS_MAX_CONCURRENCY = int(os.environ.get('NEWS_MAX_CONCURRENCY', '16'))
+
+# Alert rules (JSON list, see api.alerts.AlertEngine.load_rules) checked against every snapshot
+ALERT_RULES_FILE = os.environ.get('ALERT_RULES_FILE')
+ALERT_DEDUP_WINDOW = float(os.environ.get('ALERT_DEDUP_WINDOW', '3600'))
 print(SQLALCHEMY_DATABASE_URI)
\ No newline at end of file
@@ -1,5 +1,5 @@
 # models.py
-from app import db
+from extensions import db
 from datetime import datetime
 
 class BitcoinPrice(db.Model):
@@ -15,3 +15,237 @@ class BitcoinPrice(db.Model):
 
     def __repr__(self):
         return f'<BitcoinPrice {self.ticker} {self.price}>'
+
+
+# Keys of BaseFinancialIndicators.get_all_indicator_values() mapped to IndicatorSnapshot columns
+INDICATOR_COLUMNS = {
+    'Close': 'close',
+    'SMA_50': 'sma_50',
+    'EMA_20': 'ema_20',
+    'RSI': 'rsi',
+    'Bollinger_Upper': 'bollinger_upper',
+    'Bollinger_Lower': 'bollinger_lower',
+    'ATR': 'atr',
+    'MACD_Line': 'macd_line',
+    'Signal_Line': 'signal_line',
+    'VWAP': 'vwap',
+    'VWAP_Rolling_20': 'vwap_rolling_20',
+    'Fib_Level_23.6%': 'fib_23_6',
+    'Fib_Level_38.2%': 'fib_38_2',
+    'Fib_Level_50%': 'fib_50',
+    'Fib_Level_61.8%': 'fib_61_8',
+    'Fib_Level_100%': 'fib_100',
+}
+
+class IndicatorSnapshot(db.Model):
+    """
+    Indicator values of one bar for a symbol, provider and timeframe. One row per bar: rewriting
+    the same bar (e.g. the still-open daily candle every 20 minutes) updates it in place.
+    """
+    __tablename__ = 'indicator_snapshot'
+    __table_args__ = (
+        db.Index('ix_indicator_snapshot_lookup', 'symbol', 'provider', 'timeframe', 'ts', unique=True),
+    )
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    symbol = db.Column(db.String(20), nullable=False)
+    provider = db.Column(db.String(20), nullable=False)
+    timeframe = db.Column(db.Integer, nullable=False)  # bar size in seconds
+    ts = db.Column(db.DateTime, nullable=False)  # bar start, UTC
+    close = db.Column(db.Float)
+    sma_50 = db.Column(db.Float)
+    ema_20 = db.Column(db.Float)
+    rsi = db.Column(db.Float)
+    bollinger_upper = db.Column(db.Float)
+    bollinger_lower = db.Column(db.Float)
+    atr = db.Column(db.Float)
+    macd_line = db.Column(db.Float)
+    signal_line = db.Column(db.Float)
+    vwap = db.Column(db.Float)
+    vwap_rolling_20 = db.Column(db.Float)
+    fib_23_6 = db.Column(db.Float)
+    fib_38_2 = db.Column(db.Float)
+    fib_50 = db.Column(db.Float)
+    fib_61_8 = db.Column(db.Float)
+    fib_100 = db.Column(db.Float)
+
+    @staticmethod
+    def row(symbol, provider, timeframe, ts, values):
+        """
+        Builds a row for `bulk_upsert` from the dict returned by get_all_indicator_values().
+        NaN values are stored as NULL.
+        """
+        row = {'symbol': symbol, 'provider': provider, 'timeframe': timeframe, 'ts': ts}
+        for key, column in INDICATOR_COLUMNS.items():
+            value = values.get(key)
+            row[column] = float(value) if value is not None and value == value else None
+        return row
+
+    @classmethod
+    def bulk_upsert(cls, rows):
+        """
+        Writes many rows in a single statement, updating bars that already exist.
+
+        Parameters:
+            rows (list): Dicts as built by `row`.
+
+        Returns:
+            int: Number of rows sent.
+        """
+        if not rows:
+            return 0
+        dialect = db.session.get_bind().dialect.name
+        values = list(INDICATOR_COLUMNS.values())
+        if dialect == 'mysql':
+            from sqlalchemy.dialects.mysql import insert
+            stmt = insert(cls)
+            stmt = stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in values})
+        elif dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(cls)
+            stmt = stmt.on_conflict_do_update(index_elements=['symbol', 'provider', 'timeframe', 'ts'],
+                                              set_={c: stmt.excluded[c] for c in values})
+        else:
+            stmt = db.insert(cls)
+        db.session.execute(stmt, rows)
+        db.session.commit()
+        return len(rows)
+
+    @classmethod
+    def history(cls, symbol, provider, timeframe, start=None, end=None, columns=None):
+        """
+        Reads the stored indicators of a symbol for a time range with one indexed query.
+
+        Parameters:
+            symbol (str): Symbol, e.g. 'btc_usd'.
+            provider (str): Provider name, e.g. 'bitso'.
+            timeframe (int): Bar size in seconds.
+            start (datetime): Inclusive start of the range, or None.
+            end (datetime): Exclusive end of the range, or None.
+            columns (list): Column names to read. Default is every indicator column.
+
+        Returns:
+            dict: 'ts' as a datetime64 array plus one float64 array per column (NaN for NULL).
+        """
+        import numpy as np
+
+        columns = list(columns or INDICATOR_COLUMNS.values())
+        query = db.select(cls.ts, *(getattr(cls, c) for c in columns)).where(
+            cls.symbol == symbol, cls.provider == provider, cls.timeframe == timeframe)
+        if start is not None:
+            query = query.where(cls.ts >= start)
+        if end is not None:
+            query = query.where(cls.ts < end)
+        rows = db.session.execute(query.order_by(cls.ts)).all()
+
+        result = {'ts': np.array([r[0] for r in rows], dtype='datetime64[us]')}
+        values = np.array([r[1:] for r in rows], dtype=float).reshape(len(rows), len(columns))
+        for i, column in enumerate(columns):
+            result[column] = values[:, i]
+        return result
+
+    def __repr__(self):
+        return f'<IndicatorSnapshot {self.provider} {self.symbol} {self.timeframe} {self.ts}>'
+
+
+class NewsArticle(db.Model):
+    """
+    A news article collected by api.news, deduplicated by the hash of its content. Indexed by
+    publication time so it can be joined with indicator_snapshot on ts (and on `symbols`).
+    """
+    __tablename__ = 'news_article'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    content_hash = db.Column(db.String(40), nullable=False, unique=True)
+    source = db.Column(db.String(255), nullable=False)
+    url = db.Column(db.String(500))
+    title = db.Column(db.String(500), nullable=False)
+    summary = db.Column(db.Text)
+    published_at = db.Column(db.DateTime, nullable=False, index=True)  # UTC
+    fetched_at = db.Column(db.DateTime, nullable=False)  # UTC
+    symbols = db.Column(db.String(200))  # comma separated, e.g. 'btc,eth'
+    sentiment = db.Column(db.Float)  # -1 (negative) to 1 (positive)
+
+    @classmethod
+    def bulk_insert(cls, articles):
+        """
+        Inserts many articles in a single statement, skipping those already stored.
+
+        Parameters:
+            articles (list): Article dicts as returned by NewsPipeline.run().
+
+        Returns:
+            int: Number of articles sent.
+        """
+        if not articles:
+            return 0
+        columns = [c.name for c in cls.__table__.columns if c.name != 'id']
+        rows = [{c: article.get(c) for c in columns} for article in articles]
+        for row in rows:
+            row['source'] = row['source'][:255]
+            row['url'] = (row['url'] or '')[:500]
+            row['title'] = row['title'][:500]
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'mysql':
+            stmt = db.insert(cls).prefix_with('IGNORE')
+        elif dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(cls).on_conflict_do_nothing(index_elements=['content_hash'])
+        else:
+            stmt = db.insert(cls)
+        db.session.execute(stmt, rows)
+        db.session.commit()
+        return len(rows)
+
+    def __repr__(self):
+        return f'<NewsArticle {self.published_at} {self.title[:40]}>'
+
+
+class PaperFill(db.Model):
+    """
+    A fill of the paper trading engine (trading.paper_trading.Fill), written in batches by
+    snapshots.FillWriter.
+    """
+    __tablename__ = 'paper_fill'
+    __table_args__ = (
+        db.Index('ix_paper_fill_account_ts', 'account', 'ts'),
+    )
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    ts = db.Column(db.DateTime, nullable=False)  # UTC
+    account = db.Column(db.String(50), nullable=False)
+    order_id = db.Column(db.BigInteger, nullable=False)
+    symbol = db.Column(db.String(20), nullable=False)
+    side = db.Column(db.String(4), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    fee = db.Column(db.Float, nullable=False)
+    fee_currency = db.Column(db.String(10), nullable=False)
+    liquidity = db.Column(db.String(5), nullable=False)  # 'maker' or 'taker'
+
+    @classmethod
+    def bulk_insert(cls, fills):
+        """
+        Inserts many fills in a single statement.
+
+        Parameters:
+            fills (list): Fill tuples as handed to the engine's fill_sink, with ts in seconds.
+
+        Returns:
+            int: Number of fills sent.
+        """
+        if not fills:
+            return 0
+        rows = [dict(fill._asdict(), ts=datetime.utcfromtimestamp(fill.ts)) for fill in fills]
+        db.session.execute(db.insert(cls), rows)
+        db.session.commit()
+        return len(rows)
+
+    def __repr__(self):
+        return f'<PaperFill {self.ts} {self.account} {self.side} {self.amount} {self.symbol} @ {self.price}>'
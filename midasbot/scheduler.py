@@ -0,0 +1,305 @@
+"""
+In-process scheduler for the periodic market snapshot.
+
+Symbols are organised in groups. Every group runs one cycle per `interval` seconds and each
+cycle spreads its symbols across `spread` seconds (plus a small random jitter), so calls to
+the providers and writes to the database are flattened instead of spiking at :00/:20/:40.
+Groups get a stable phase offset derived from their name for the same reason.
+
+If a cycle is still in flight when the next one is due, it is either skipped or coalesced
+into a single follow-up cycle that starts as soon as the running one finishes.
+
+The same scheduler backs the HTTP trigger used by the Elastic Beanstalk worker tier: the SQS
+daemon POSTs to `/snapshot` and `trigger()` starts a cycle without waiting for it.
+"""
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from api.indicators.providers import create_provider
+from api.instrumentation import registry, timed
+
+logger = logging.getLogger(__name__)
+
+SKIP = 'skip'
+COALESCE = 'coalesce'
+
+
+class SymbolGroup:
+    """
+    A set of symbols snapshotted together on the same cadence.
+
+    Attributes:
+        name (str): Group name, used by the HTTP trigger and in metrics.
+        symbols (list): Symbols of the group.
+        job (callable): Called as job(symbol) for every symbol of a cycle.
+        interval (float): Seconds between cycles.
+        spread (float): Seconds over which the symbols of a cycle are distributed.
+        phase (float): Offset of the first cycle within the interval.
+        overlap (str): 'skip' or 'coalesce' when a cycle is due while the previous one runs.
+        on_cycle_end (callable): Called with the group name once every symbol of a cycle finished.
+        remaining (int): Symbols of the current cycle that haven't finished yet.
+        queued (int): Symbols of the current cycle not handed to the job pool yet.
+        pending (bool): Whether a coalesced cycle is waiting for the current one.
+    """
+    def __init__(self, name, symbols, job, interval, spread, phase, overlap, on_cycle_end=None):
+        self.name = name
+        self.symbols = list(symbols)
+        self.job = job
+        self.interval = interval
+        self.spread = spread
+        self.phase = phase
+        self.overlap = overlap
+        self.on_cycle_end = on_cycle_end
+        self.remaining = 0
+        self.queued = 0
+        self.pending = False
+
+    @property
+    def in_flight(self):
+        return self.remaining > 0
+
+
+class SnapshotScheduler:
+    """
+    Runs snapshot jobs per symbol group on a fixed cadence with overlap protection and jitter.
+
+    Attributes:
+        groups (dict): Registered SymbolGroup instances by name.
+        jitter (float): Maximum random delay in seconds added to every symbol's slot.
+        max_workers (int): Number of threads executing jobs.
+    """
+    def __init__(self, max_workers=4, jitter=5.0, clock=time.monotonic, rng=None):
+        self.groups = {}
+        self.jitter = jitter
+        self.max_workers = max_workers
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._events = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._executor = None
+        self._stopping = False
+        self._periodic = False
+
+    def add_group(self, name, symbols, job, interval=1200, spread=None, phase=None, overlap=SKIP,
+                  on_cycle_end=None):
+        """
+        Registers a group of symbols.
+
+        Parameters:
+            name (str): Group name.
+            symbols (list): Symbols to snapshot.
+            job (callable): Called as job(symbol).
+            interval (float): Seconds between cycles. Default is 1200 (20 minutes).
+            spread (float): Seconds to distribute the symbols over. Default is half the interval.
+            phase (float): Offset of the first cycle. Default is derived from the group name.
+            overlap (str): 'skip' (default) or 'coalesce'.
+            on_cycle_end (callable): Called with the group name when a cycle finishes, e.g. to flush writes.
+
+        Returns:
+            SymbolGroup: The registered group.
+        """
+        if overlap not in (SKIP, COALESCE):
+            raise ValueError(f"overlap must be '{SKIP}' or '{COALESCE}', got '{overlap}'")
+        if spread is None:
+            spread = interval / 2
+        if phase is None:
+            phase = zlib.crc32(name.encode()) % int(interval)
+        group = SymbolGroup(name, symbols, job, interval, spread, phase, overlap, on_cycle_end)
+        with self._cond:
+            self.groups[name] = group
+            if self._periodic:
+                self._schedule_cycle(group, self._clock() + phase)
+        return group
+
+    def start(self, periodic=True):
+        """
+        Starts the dispatch thread and the job pool.
+
+        Parameters:
+            periodic (bool): Whether groups run on their own cadence. With False only
+                `trigger()` starts cycles, e.g. when the EB cron drives the worker.
+        """
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._periodic = periodic
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='midas-snapshot')
+            if periodic:
+                now = self._clock()
+                for group in self.groups.values():
+                    self._schedule_cycle(group, now + group.phase)
+            self._thread = threading.Thread(target=self._run, name='midas-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, wait=True):
+        """
+        Stops dispatching new jobs. Running jobs are allowed to finish when `wait` is True.
+        Symbols of the current cycles that weren't dispatched yet are dropped, so the groups
+        can run again after a restart.
+        """
+        with self._cond:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._events.clear()
+            for group in self.groups.values():
+                group.remaining -= group.queued
+                group.queued = 0
+                group.pending = False
+            self._cond.notify_all()
+            thread, executor = self._thread, self._executor
+            self._thread = self._executor = None
+        thread.join()
+        executor.shutdown(wait=wait)
+
+    def trigger(self, name=None):
+        """
+        Starts a cycle now for one group, or for every group when `name` is None.
+
+        Parameters:
+            name (str): Group name.
+
+        Returns:
+            dict: For every group, True if a cycle was started, False if skipped or coalesced.
+
+        Raises:
+            KeyError: If the group doesn't exist.
+        """
+        if self._thread is None:
+            self.start(periodic=False)
+        with self._cond:
+            groups = [self.groups[name]] if name is not None else list(self.groups.values())
+            return {group.name: self._start_cycle(group) for group in groups}
+
+    def _push(self, when, action):
+        heapq.heappush(self._events, (when, next(self._seq), action))
+        self._cond.notify()
+
+    def _schedule_cycle(self, group, when):
+        def fire():
+            self._start_cycle(group)
+            if self._periodic:
+                self._schedule_cycle(group, when + group.interval)
+        self._push(when, fire)
+
+    def _start_cycle(self, group):
+        # Called with the condition held
+        if self._stopping:
+            return False
+        if group.in_flight:
+            if group.overlap == COALESCE:
+                group.pending = True
+                registry.increment('scheduler.coalesced')
+            else:
+                registry.increment('scheduler.skipped')
+                logger.warning("Snapshot cycle for group '%s' skipped: previous cycle still running", group.name)
+            return False
+        if not group.symbols:
+            return False
+        registry.increment('scheduler.cycles')
+        group.remaining = group.queued = len(group.symbols)
+        now = self._clock()
+        step = group.spread / len(group.symbols)
+        for i, symbol in enumerate(group.symbols):
+            offset = i * step + self._rng.uniform(0, self.jitter)
+            self._push(now + offset, lambda symbol=symbol: self._dispatch(group, symbol))
+        return True
+
+    def _dispatch(self, group, symbol):
+        # Called with the condition held
+        group.queued -= 1
+        self._executor.submit(self._run_job, group, symbol)
+
+    def _run_job(self, group, symbol):
+        try:
+            with timed(f'snapshot.{group.name}'):
+                group.job(symbol)
+        except Exception:
+            logger.exception("Snapshot job failed for %s in group '%s'", symbol, group.name)
+        finally:
+            with self._cond:
+                group.remaining -= 1
+                finished = group.remaining == 0
+            if finished and group.on_cycle_end is not None:
+                try:
+                    group.on_cycle_end(group.name)
+                except Exception:
+                    logger.exception("End of cycle callback failed for group '%s'", group.name)
+            with self._cond:
+                if finished and group.pending and not group.in_flight:
+                    group.pending = False
+                    self._start_cycle(group)
+
+    def _run(self):
+        with self._cond:
+            while not self._stopping:
+                if not self._events:
+                    self._cond.wait()
+                    continue
+                when = self._events[0][0]
+                delay = when - self._clock()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                _, _, action = heapq.heappop(self._events)
+                action()
+
+
+def parse_groups(spec):
+    """
+    Parses a group specification such as "majors=bitso:btc_usd,eth_usd;yahoo=yahoo:BTC-USD".
+
+    Parameters:
+        spec (str): Semicolon separated `group=provider:SYMBOL,SYMBOL` entries.
+
+    Returns:
+        list: Tuples of (group name, provider name, list of symbols).
+    """
+    groups = []
+    for entry in filter(None, (e.strip() for e in spec.split(';'))):
+        name, _, target = entry.partition('=')
+        provider, _, symbols = target.partition(':')
+        if not provider or not symbols:
+            raise ValueError(f"Invalid snapshot group '{entry}', expected group=provider:SYMBOL,SYMBOL")
+        groups.append((name.strip(), provider.strip(), [s.strip() for s in symbols.split(',') if s.strip()]))
+    return groups
+
+
+def snapshot_job(provider, lookback_days=60, provider_args=(), on_result=None):
+    """
+    Builds a job that fetches a symbol from a provider and computes its indicators.
+
+    Parameters:
+        provider (str): Provider name in the provider registry, e.g. 'bitso'.
+        lookback_days (int): Days of history to fetch. Default is 60, enough for SMA_50.
+        provider_args (tuple): Extra constructor arguments, e.g. the Bitso time bucket.
+        on_result (callable): Called as on_result(provider, processor, values) after each snapshot.
+
+    Returns:
+        callable: The job, taking the symbol as its only argument.
+    """
+    def job(symbol):
+        end = datetime.now(timezone.utc) + timedelta(days=1)
+        start = end - timedelta(days=lookback_days + 1)
+        processor = create_provider(provider, symbol, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'),
+                                    *provider_args)
+        processor.fetch_data()
+        if processor.data is None or processor.data.empty:
+            logger.warning("No data returned by %s for %s", provider, symbol)
+            return None
+        processor.compute_technical_indicators()
+        values = processor.get_all_indicator_values()
+        if on_result is not None:
+            on_result(provider, processor, values)
+        return values
+    return job
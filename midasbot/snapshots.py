@@ -0,0 +1,126 @@
+import threading
+from analysis.correlation import EWMCovariance, RollingCovariance
+from api.instrumentation import timed
+from models import IndicatorSnapshot, PaperFill
+
+def last_bar_time(processor):
+    """
+    Returns the start of the processor's last bar as a naive UTC datetime.
+    """
+    ts = processor.data.index[-1]
+    if getattr(ts, 'tzinfo', None) is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return ts.to_pydatetime()
+
+
+class SnapshotWriter:
+    """
+    Buffers the indicator snapshots of a scheduler cycle and writes them in one bulk upsert.
+
+    `add` is meant to be the snapshot job's `on_result` callback and `flush` the group's
+    `on_cycle_end` callback, so each cycle costs one statement instead of one per symbol.
+    Rows are also flushed early once `max_rows` are buffered.
+    """
+    def __init__(self, app, max_rows=1000):
+        self.app = app
+        self.max_rows = max_rows
+        self._rows = []
+        self._lock = threading.Lock()
+
+    def add(self, provider, processor, values):
+        """
+        Buffers the latest bar of a processed symbol.
+
+        Parameters:
+            provider (str): Provider name.
+            processor (BaseFinancialIndicators): The processor that produced the values.
+            values (dict): Result of get_all_indicator_values().
+        """
+        values = dict(values, Close=processor.data['Close'].iloc[-1])
+        row = IndicatorSnapshot.row(processor.symbol, provider, getattr(processor, 'tf', 86400),
+                                    last_bar_time(processor), values)
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_rows
+        if full:
+            self.flush()
+
+    def flush(self, group=None):
+        """
+        Writes every buffered row.
+
+        Returns:
+            int: Number of rows written.
+        """
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        with self.app.app_context(), timed('snapshot.write'):
+            return IndicatorSnapshot.bulk_upsert(rows)
+
+
+class CorrelationTracker:
+    """
+    Keeps the rolling and exponentially weighted correlation of a symbol group up to date with
+    every scheduler cycle.
+
+    `add` is meant to be called from the snapshot job's `on_result` callback and `flush` from the
+    group's `on_cycle_end` callback: the closes of a cycle are fed to the engines as one bar, timed
+    by the latest bar among them. Cycles within the same bar (the still-open daily candle) replace
+    that bar instead of adding a return of zero length.
+
+    Attributes:
+        rolling (RollingCovariance): Covariance over the last `window` bars.
+        ewm (EWMCovariance): Covariance weighted by `halflife` bars.
+    """
+    def __init__(self, symbols, window=30, halflife=20):
+        self.rolling = RollingCovariance(symbols, window=window)
+        self.ewm = EWMCovariance(symbols, halflife=halflife)
+        self._closes = {}
+        self._ts = None
+        self._lock = threading.Lock()
+
+    def add(self, provider, processor, values):
+        """
+        Buffers the latest close of a processed symbol.
+
+        Parameters:
+            provider (str): Provider name.
+            processor (BaseFinancialIndicators): The processor that produced the values.
+            values (dict): Result of get_all_indicator_values().
+        """
+        ts = last_bar_time(processor)
+        with self._lock:
+            self._closes[processor.symbol] = float(processor.data['Close'].iloc[-1])
+            self._ts = ts if self._ts is None else max(self._ts, ts)
+
+    def flush(self, group=None):
+        """
+        Feeds the closes buffered during the cycle to both engines.
+
+        Returns:
+            int: Number of symbols with a close in this bar.
+        """
+        with self._lock:
+            closes, ts = self._closes, self._ts
+            self._closes, self._ts = {}, None
+        if not closes:
+            return 0
+        with timed('correlation.update'):
+            for engine in (self.rolling, self.ewm):
+                engine.update(closes, ts)
+        return len(closes)
+
+
+class FillWriter:
+    """
+    fill_sink for trading.paper_trading.PaperTradingEngine: the engine already hands its fills
+    over in batches (every `batch_size` fills and on flush), each written in one bulk insert.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, fills):
+        with self.app.app_context(), timed('paper.fills.write'):
+            return PaperFill.bulk_insert(fills)
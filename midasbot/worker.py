@@ -1,18 +1,20 @@
 import threading
 from time import sleep
-from polygon import RESTClient
 from extensions import db
 from models import BitcoinPrice
 
-def fetch_market_data(api_key):
+def fetch_market_data(app, api_key):
+    from polygon import RESTClient  # only needed once the worker thread runs
+
     with app.app_context():
         client = RESTClient(api_key)
         while True:
             # fetching and processing logic
             sleep(1)
 
-def init_worker(app):
+def start_worker_thread(app):
     api_key = app.config['POLYGON_API_KEY']
-    thread = threading.Thread(target=lambda: fetch_market_data(api_key, app))
+    thread = threading.Thread(target=fetch_market_data, args=(app, api_key))
     thread.daemon = True
     thread.start()
+    return thread
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+
+from api.alerts import Alert, AlertEngine, CrossoverRule, MemorySink, Notifier, ThresholdRule
+
+
+def alert(rule_id, destination='memory:desk'):
+    return Alert(0.0, rule_id, 'btc_usd', 'RSI', 75.0, 70.0, 'above', destination, 'RSI above 70')
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_notify_starts_delivery_without_an_explicit_start():
+    sink = MemorySink()
+    notifier = Notifier({'memory': sink}, flush_interval=0.05)
+    notifier.notify([alert(1), alert(2)])
+
+    assert wait_for(lambda: sink.batches)
+    assert [(destination, [a.rule_id for a in alerts]) for destination, alerts in sink.batches] == [('desk', [1, 2])]
+    notifier.stop()
+
+
+def test_repeats_within_the_dedup_window_are_dropped():
+    sink = MemorySink()
+    notifier = Notifier({'memory': sink}, batch_size=2, flush_interval=60.0)
+    notifier.notify([alert(1), alert(1), alert(1, 'memory:other')])
+    notifier.stop()
+
+    assert sorted((destination, len(alerts)) for destination, alerts in sink.batches) == [('desk', 1), ('other', 1)]
+
+
+def test_stopped_notifier_is_not_restarted():
+    sink = MemorySink()
+    notifier = Notifier({'memory': sink}, flush_interval=0.01)
+    notifier.stop()
+    notifier.notify([alert(1)])
+
+    assert notifier._thread is None
+    assert notifier.flush() == 1
+
+
+@pytest.fixture
+def engine():
+    engine = AlertEngine()
+    for level in (60.0, 70.0, 80.0):
+        engine.add_rule(ThresholdRule('btc_usd', 'RSI', level, 'above', 'memory:desk'))
+        engine.add_rule(ThresholdRule('btc_usd', 'RSI', level, 'below', 'memory:desk'))
+    return engine
+
+
+def fired(alerts):
+    # Default messages read '<symbol> <indicator> crossed <direction> <level>: <value>'
+    return [(a.threshold, a.message.split()[3]) for a in alerts]
+
+
+def test_first_value_only_sets_the_baseline(engine):
+    assert engine.evaluate('btc_usd', {'RSI': 90.0}, ts=1.0) == []
+    assert engine.evaluate('btc_usd', {'RSI': 65.0}, ts=2.0) != []
+
+
+def test_thresholds_crossed_upwards_and_downwards(engine):
+    engine.evaluate('btc_usd', {'RSI': 55.0})
+
+    # Levels in (55, 75] crossed upwards, in order
+    assert fired(engine.evaluate('btc_usd', {'RSI': 75.0})) == [(60.0, 'above'), (70.0, 'above')]
+    # Landing on a level counts as crossing it
+    assert fired(engine.evaluate('btc_usd', {'RSI': 80.0})) == [(80.0, 'above')]
+    assert engine.evaluate('btc_usd', {'RSI': 80.0}) == []
+    # Levels in (65, 80] crossed downwards
+    assert fired(engine.evaluate('btc_usd', {'RSI': 65.0})) == [(70.0, 'below'), (80.0, 'below')]
+    # NaN and missing values keep the previous value
+    assert engine.evaluate('btc_usd', {'RSI': float('nan')}) == []
+    assert engine.evaluate('btc_usd', {}) == []
+    assert fired(engine.evaluate('btc_usd', {'RSI': 59.0})) == [(60.0, 'below')]
+    # Other symbols have their own baseline and rules
+    assert engine.evaluate('eth_usd', {'RSI': 10.0}) == engine.evaluate('eth_usd', {'RSI': 90.0}) == []
+
+
+def test_crossover_rules():
+    engine = AlertEngine()
+    up = engine.add_rule(CrossoverRule('btc_usd', 'MACD_Line', 'Signal_Line', 'above', 'memory:desk'))
+    engine.add_rule(CrossoverRule('btc_usd', 'MACD_Line', 'Signal_Line', 'below', 'memory:desk',
+                                  message='{symbol} MACD {direction} signal at {value}'))
+
+    assert engine.evaluate('btc_usd', {'MACD_Line': -1.0, 'Signal_Line': 0.0}) == []
+    assert engine.evaluate('btc_usd', {'MACD_Line': -0.5, 'Signal_Line': 0.0}) == []
+    crossed = engine.evaluate('btc_usd', {'MACD_Line': 0.5, 'Signal_Line': 0.0}, ts=3.0)
+    assert [(a.rule_id, a.kind, a.value, a.threshold, a.ts) for a in crossed] == [(up, 'crossover', 0.5, 0.0, 3.0)]
+    crossed = engine.evaluate('btc_usd', {'MACD_Line': 0.5, 'Signal_Line': 1.0})
+    assert [a.message for a in crossed] == ['btc_usd MACD below signal at 0.5']
+
+
+def test_removed_rules_no_longer_fire(engine):
+    rule_ids = [rule_id for rule_id, rule in engine.rules.items() if rule.threshold == 70.0]
+    for rule_id in rule_ids:
+        assert engine.remove_rule(rule_id)
+    assert not engine.remove_rule(rule_ids[0])
+
+    engine.evaluate('btc_usd', {'RSI': 55.0})
+    assert fired(engine.evaluate('btc_usd', {'RSI': 85.0})) == [(60.0, 'above'), (80.0, 'above')]
+    assert fired(engine.evaluate('btc_usd', {'RSI': 50.0})) == [(60.0, 'below'), (80.0, 'below')]
+
+
+def test_alerts_reach_the_notifier():
+    sink = MemorySink()
+    notifier = Notifier({'memory': sink}, flush_interval=60.0)
+    engine = AlertEngine(notifier)
+    engine.add_rule(ThresholdRule('btc_usd', 'Close', 50000.0, 'above', 'memory:desk'))
+    engine.evaluate('btc_usd', {'Close': 49000.0})
+    engine.evaluate('btc_usd', {'Close': 51000.0})
+    notifier.stop()
+
+    assert [(destination, [a.message for a in alerts]) for destination, alerts in sink.batches] == [
+        ('desk', ['btc_usd Close crossed above 50000: 51000'])]
@@ -0,0 +1,195 @@
+import os
+import sys
+import threading
+
+import pytest
+
+MIDASBOT = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'midasbot')
+# midasbot imports its modules by their top-level names (app, config, models, ...)
+MODULES = ('app', 'config', 'extensions', 'models', 'scheduler', 'snapshots', 'worker')
+
+
+@pytest.fixture(scope='module')
+def midasbot():
+    saved = {name: sys.modules.pop(name) for name in MODULES if name in sys.modules}
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+        patch.syspath_prepend(MIDASBOT)
+        try:
+            import app
+            yield app
+            app.scheduler.stop()
+        finally:
+            for name in MODULES:
+                sys.modules.pop(name, None)
+            sys.modules.update(saved)
+
+
+@pytest.fixture(scope='module')
+def client(midasbot):
+    return midasbot.app.test_client()
+
+
+def test_health_check(client):
+    assert client.get('/').data == b'health check'
+
+
+def test_metrics(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+
+
+def test_snapshot_triggers_the_group(midasbot, client):
+    done = threading.Event()
+    seen = []
+
+    def job(symbol):
+        seen.append(symbol)
+        done.set()
+
+    midasbot.scheduler.add_group('stub', ['btc_usd'], job, spread=0)
+    response = client.post('/snapshot', json={'group': 'stub'}, headers={'X-Aws-Sqsd-Taskname': 'market-snapshot'})
+
+    assert response.status_code == 200
+    assert response.get_json() == {'task': 'market-snapshot', 'started': {'stub': True}}
+    assert done.wait(5)
+    assert seen == ['btc_usd']
+
+
+def test_snapshot_rejects_unknown_groups(client):
+    response = client.post('/snapshot', json={'group': 'missing'})
+    assert response.status_code == 400
+    assert 'missing' in response.get_json()['error']
+
+
+def test_fill_writer_persists_engine_fills(midasbot):
+    from models import PaperFill
+    from snapshots import FillWriter
+    from trading.paper_trading import PaperTradingEngine
+
+    with midasbot.app.app_context():
+        midasbot.db.create_all()
+    engine = PaperTradingEngine(fill_sink=FillWriter(midasbot.app))
+    engine.deposit('alice', 'usd', 1000.0)
+    engine.on_book('btc_usd', [(99.0, 1.0)], [(100.0, 1.0), (101.0, 1.0)], ts=1704067200.0)
+    engine.submit_order('alice', 'btc_usd', 'buy', 2.0)
+    engine.flush()
+
+    with midasbot.app.app_context():
+        fills = midasbot.db.session.execute(midasbot.db.select(PaperFill).order_by(PaperFill.price)).scalars().all()
+        assert [(f.price, f.amount, f.liquidity) for f in fills] == [(100.0, 1.0, 'taker'), (101.0, 1.0, 'taker')]
+        assert str(fills[0].ts) == '2024-01-01 00:00:00'
+
+
+def test_snapshots_upsert_one_row_per_bar(midasbot):
+    from datetime import datetime
+
+    import numpy as np
+    from models import IndicatorSnapshot
+
+    day = 86400
+    bars = [datetime(2024, 1, d) for d in (1, 2, 3)]
+    with midasbot.app.app_context():
+        midasbot.db.create_all()
+        IndicatorSnapshot.bulk_upsert([IndicatorSnapshot.row('btc_usd', 'bitso', day, ts, {'Close': 100.0 + i})
+                                       for i, ts in enumerate(bars)])
+        # The still-open bar is rewritten with new values
+        IndicatorSnapshot.bulk_upsert([IndicatorSnapshot.row('btc_usd', 'bitso', day, bars[-1],
+                                                             {'Close': 110.0, 'RSI': float('nan')})])
+
+        rows = midasbot.db.session.execute(
+            midasbot.db.select(IndicatorSnapshot).where(IndicatorSnapshot.ts == bars[-1])).scalars().all()
+        assert [(r.close, r.rsi) for r in rows] == [(110.0, None)]
+
+        history = IndicatorSnapshot.history('btc_usd', 'bitso', day, start=bars[1], columns=['close', 'rsi'])
+        assert isinstance(history['close'], np.ndarray) and history['close'].dtype == np.float64
+        np.testing.assert_array_equal(history['ts'], np.array(bars[1:], dtype='datetime64[us]'))
+        np.testing.assert_array_equal(history['close'], [101.0, 110.0])
+        assert np.isnan(history['rsi']).all()
+        assert len(IndicatorSnapshot.history('btc_usd', 'bitso', day, end=bars[0])['ts']) == 0
+
+
+def test_snapshots_store_the_atr(midasbot):
+    from datetime import datetime
+
+    from models import IndicatorSnapshot
+
+    with midasbot.app.app_context():
+        midasbot.db.create_all()
+        IndicatorSnapshot.bulk_upsert([IndicatorSnapshot.row('eth_usd', 'bitso', 3600, datetime(2024, 1, 1),
+                                                             {'Close': 2000.0, 'ATR': 35.5})])
+        assert list(IndicatorSnapshot.history('eth_usd', 'bitso', 3600)['atr']) == [35.5]
+
+
+def test_news_articles_are_truncated_and_stored_once(midasbot):
+    from datetime import datetime
+
+    from models import NewsArticle
+
+    article = {'content_hash': 'a' * 40, 'source': 'https://example.com/' + 's' * 300, 'url': None,
+               'title': 't' * 600, 'summary': '', 'published_at': datetime(2024, 1, 1),
+               'fetched_at': datetime(2024, 1, 1), 'symbols': 'btc', 'sentiment': 0.0}
+    with midasbot.app.app_context():
+        midasbot.db.create_all()
+        NewsArticle.bulk_insert([article])
+        NewsArticle.bulk_insert([article])
+
+        stored = midasbot.db.session.execute(midasbot.db.select(NewsArticle)).scalars().all()
+        assert [(len(a.source), len(a.title), a.url) for a in stored] == [(255, 500, '')]
+
+
+def test_correlation_is_refreshed_every_cycle(midasbot):
+    import numpy as np
+    import pandas as pd
+    from snapshots import CorrelationTracker
+
+    class Processor:
+        def __init__(self, symbol, closes):
+            self.symbol = symbol
+            self.data = pd.DataFrame({'Close': closes},
+                                     index=pd.date_range('2024-01-01', periods=len(closes), freq='D'))
+
+    assert midasbot.correlations.keys() == {'bitso', 'yahoo'}
+    tracker = CorrelationTracker(['btc_usd', 'eth_usd'], window=10)
+    on_result, on_cycle_end = midasbot.group_callbacks(tracker)
+    with midasbot.app.app_context():
+        midasbot.db.create_all()
+
+    btc = [100.0, 102.0, 101.0, 105.0]
+    # The last bar is snapshotted twice: the second cycle replaces it
+    for bars in (1, 2, 3, 3, 4):
+        for symbol, scale in (('btc_usd', 1.0), ('eth_usd', 2.0)):
+            on_result('stub', Processor(symbol, [scale * c for c in btc[:bars]]), {})
+        on_cycle_end('correlated')
+
+    assert tracker.rolling._count[0, 1] == 3
+    np.testing.assert_allclose(tracker.rolling.correlation(), 1.0)
+    np.testing.assert_allclose(tracker.ewm.correlation(), 1.0)
+
+
+def test_export_features_command(midasbot, tmp_path):
+    from datetime import datetime, timedelta
+
+    pytest.importorskip('pyarrow')
+    from analysis.feature_store import FeatureReader
+    from models import IndicatorSnapshot
+
+    with midasbot.app.app_context():
+        midasbot.db.create_all()
+        IndicatorSnapshot.bulk_upsert([IndicatorSnapshot.row('sol_usd', 'export', 3600,
+                                                             datetime(2024, 1, 31) + timedelta(hours=h),
+                                                             {'Close': 100.0 + h, 'ATR': 1.5}) for h in range(48)])
+    runner = midasbot.app.test_cli_runner()
+    args = ['export-features', str(tmp_path), '--provider', 'export', '--start', '2023-12-01', '--end', '2024-03-01']
+
+    # December has no bars: nothing is written for it
+    result = runner.invoke(args=args)
+    assert result.exit_code == 0, result.output
+    assert result.output.strip() == '2 partitions written (48 rows), 0 already exported'
+    assert runner.invoke(args=args).output.strip() == '0 partitions written (0 rows), 2 already exported'
+
+    table = next(FeatureReader(str(tmp_path), timeframe=3600, symbols=['sol_usd']).tables(['ts', 'close', 'atr']))
+    assert table.num_rows == 24
+    assert table.column('close').to_pylist()[:2] == [100.0, 101.0]
+    assert set(table.column('atr').to_pylist()) == {1.5}
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.correlation import EWMCovariance, RollingCovariance
+
+SYMBOLS = ['btc_usd', 'eth_usd', 'sol_usd']
+
+
+@pytest.fixture
+def panel():
+    rng = np.random.default_rng(3)
+    returns = rng.normal(0, 0.02, (120, 3))
+    returns[:, 1] += 0.8 * returns[:, 0]
+    closes = pd.DataFrame(100.0 * np.exp(returns.cumsum(axis=0)), columns=SYMBOLS,
+                          index=pd.date_range('2024-01-01', periods=120, freq='D'))
+    closes.iloc[:20, 2] = np.nan  # listed later
+    closes.iloc[[50, 51], 1] = np.nan  # missed snapshots
+    return closes
+
+
+def log_returns(panel):
+    # A missing close is bridged: the next return spans the gap
+    return np.log(panel.ffill()).diff().where(panel.notna())
+
+
+def matrix(frame, ts):
+    return frame.loc[ts].reindex(index=SYMBOLS, columns=SYMBOLS).to_numpy()
+
+
+@pytest.mark.parametrize('window', [5, 30])
+def test_rolling_matches_pandas(panel, window):
+    engine = RollingCovariance.from_panel(panel, window=window)
+    returns = log_returns(panel)
+    last = panel.index[-1]
+
+    np.testing.assert_allclose(engine.covariance(), matrix(returns.rolling(window, min_periods=2).cov(), last),
+                               rtol=1e-9, atol=1e-15)
+    np.testing.assert_allclose(engine.correlation(), matrix(returns.rolling(window, min_periods=2).corr(), last),
+                               rtol=1e-9)
+
+
+def test_ewm_matches_pandas(panel):
+    engine = EWMCovariance.from_panel(panel, halflife=10)
+    returns = log_returns(panel)
+    last = panel.index[-1]
+
+    np.testing.assert_allclose(engine.covariance(), matrix(returns.ewm(halflife=10).cov(bias=True), last),
+                               rtol=1e-9, atol=1e-15)
+    np.testing.assert_allclose(engine.correlation(), matrix(returns.ewm(halflife=10).corr(), last), rtol=1e-9)
+
+
+@pytest.mark.parametrize('cls', [RollingCovariance, EWMCovariance])
+def test_same_timestamp_replaces_the_bar(panel, cls):
+    engine = cls.from_panel(panel.iloc[:-1])
+    last = panel.index[-1]
+    # Earlier snapshots of the still-open bar are replaced by the final one
+    engine.update(panel.iloc[-1] * 1.05, last)
+    engine.update(panel.iloc[-1] * 0.97, last)
+    engine.update(panel.iloc[-1].to_dict(), last)
+
+    expected = cls.from_panel(panel)
+    np.testing.assert_allclose(engine.covariance(), expected.covariance(), rtol=1e-12)
+    np.testing.assert_allclose(engine.correlation(), expected.correlation(), rtol=1e-12)
+
+
+def test_top_pairs_and_clusters(panel):
+    engine = RollingCovariance.from_panel(panel, window=60)
+
+    assert engine.top_pairs(1)[0][:2] == ('btc_usd', 'eth_usd')
+    assert engine.clusters(0.5) == [['btc_usd', 'eth_usd']]
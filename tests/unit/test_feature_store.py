@@ -0,0 +1,111 @@
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.feature_store import FeatureReader, FeatureSpec, FeatureStore, frame_source
+
+pa = pytest.importorskip('pyarrow')
+
+START, END, NOW = datetime(2024, 1, 1), datetime(2024, 3, 1), datetime(2024, 3, 10)
+
+
+@pytest.fixture
+def source():
+    index = pd.date_range('2023-11-01', '2024-03-09', freq='D')
+    close = 100.0 * np.exp(np.cumsum(np.random.default_rng(5).normal(0, 0.02, len(index))))
+    frame = pd.DataFrame({'Close': close, 'SMA_50': pd.Series(close).rolling(50).mean().to_numpy(), 'RSI': 50.0},
+                         index=index)
+    return frame_source({('btc_usd', 86400): frame})
+
+
+def read(path):
+    with pa.memory_map(path) as mapped:
+        return pa.ipc.open_file(mapped).read_all()
+
+
+def test_export_writes_one_partition_per_month(tmp_path, source):
+    store = FeatureStore(str(tmp_path))
+    stats = store.export(source, [('btc_usd', 86400)], START, END, now=NOW)
+
+    assert stats == {'written': 2, 'skipped': 0, 'rows': 31 + 29}
+    table = read(store.path('btc_usd', 86400, '2024-02'))
+    assert table.schema.equals(store.schema)
+    assert table.schema.metadata[b'midas.complete'] == b'true'
+    assert table.num_rows == 29
+    assert set(table.column('symbol').to_pylist()) == {'btc_usd'}
+    assert table.column('ts')[0].as_py() == datetime(2024, 2, 1)
+
+    close = table.column('close').to_numpy()
+    # The lookback before the partition is read too: features are complete from its first bar
+    np.testing.assert_allclose(table.column('log_return_1').to_numpy()[1:], np.diff(np.log(close)))
+    assert not np.isnan(table.column('close_zscore_60').to_numpy()).any()
+    assert np.isnan(table.column('atr').to_numpy()).all()  # not in the source
+
+
+def test_complete_months_are_skipped(tmp_path, source):
+    store = FeatureStore(str(tmp_path))
+    store.export(source, [('btc_usd', 86400)], START, END, now=NOW)
+    january = store.path('btc_usd', 86400, '2024-01')
+    written_at = os.stat(january).st_mtime_ns
+
+    # The open month is written but not marked complete, so it is exported again next time
+    assert store.export(source, [('btc_usd', 86400)], START, NOW, now=NOW) == {'written': 1, 'skipped': 2,
+                                                                               'rows': 9}
+    assert read(store.path('btc_usd', 86400, '2024-03')).schema.metadata[b'midas.complete'] == b'false'
+    assert store.export(source, [('btc_usd', 86400)], START, NOW, now=NOW)['written'] == 1
+    assert os.stat(january).st_mtime_ns == written_at
+
+
+def test_other_parameters_are_not_mixed_into_a_store(tmp_path, source):
+    FeatureStore(str(tmp_path)).export(source, [('btc_usd', 86400)], START, END, now=NOW)
+
+    with pytest.raises(ValueError, match='other feature parameters'):
+        FeatureStore(str(tmp_path), spec=FeatureSpec(lags=(1,))).export(source, [('btc_usd', 86400)], START, END,
+                                                                           now=NOW)
+
+
+def test_parquet_partitions(tmp_path, source):
+    arrow = FeatureStore(str(tmp_path / 'arrow'))
+    arrow.export(source, [('btc_usd', 86400)], START, END, now=NOW)
+    store = FeatureStore(str(tmp_path / 'parquet'), format='parquet')
+    assert store.export(source, [('btc_usd', 86400)], START, END, now=NOW)['written'] == 2
+
+    path = store.path('btc_usd', 86400, '2024-01')
+    assert path.endswith('2024-01.parquet')
+    table, expected = pa.parquet.read_table(path), read(arrow.path('btc_usd', 86400, '2024-01'))
+    assert table.schema.equals(expected.schema, check_metadata=True)
+    np.testing.assert_array_equal(table.column('close_zscore_5').to_numpy(),
+                                  expected.column('close_zscore_5').to_numpy())
+    assert store.export(source, [('btc_usd', 86400)], START, END, now=NOW) == {'written': 0, 'skipped': 2, 'rows': 0}
+    # The reader only maps Arrow files
+    assert FeatureReader(store.root).paths() == []
+
+
+def test_reader_maps_the_files_without_copying(tmp_path, source):
+    FeatureStore(str(tmp_path)).export(source, [('btc_usd', 86400)], START, END, now=NOW)
+    reader = FeatureReader(str(tmp_path), timeframe=86400, symbols=['btc_usd'], start='2024-02')
+    columns = ['close', 'close_lag_1', 'log_return_5']
+
+    allocated = pa.total_allocated_bytes()
+    batches = list(reader.batches(columns))
+    assert pa.total_allocated_bytes() == allocated
+    assert [len(b) for b in batches] == [29]
+
+    batch = batches[0]
+    for name in columns:
+        view = batch.column(name).to_numpy(zero_copy_only=True)
+        assert not view.flags.owndata
+        assert view.ctypes.data == batch.column(name).buffers()[1].address
+    matrix = FeatureReader.to_numpy(batch, columns)
+    assert matrix.shape == (29, 3)
+    np.testing.assert_array_equal(matrix[:, 0], batch.column('close').to_numpy())
+
+
+def test_missing_pyarrow_is_reported(monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    with pytest.raises(ImportError, match='pip install pyarrow'):
+        FeatureStore(str(tmp_path))
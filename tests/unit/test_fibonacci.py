@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.indicators.base_financial_indicators import BaseFinancialIndicators, fibonacci_levels
+from api.indicators.streaming import rolling_extrema
+
+
+class Frame(BaseFinancialIndicators):
+    def __init__(self, close):
+        super().__init__('btc_usd', None, None)
+        close = np.asarray(close, dtype=float)
+        self.data = pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                                  'Volume': 1.0}, index=pd.date_range('2024-01-01', periods=len(close), freq='D'))
+
+
+@pytest.mark.parametrize('window', [1, 3, 7, 50])
+def test_rolling_extrema_matches_pandas(window):
+    rng = np.random.default_rng(7)
+    high = rng.normal(100, 5, 200)
+    low = high - rng.uniform(0, 3, 200)
+    high[[0, 5, 6, 7, 8, 9, 10, 40, 199]] = np.nan
+    low[[1, 5, 6, 7, 8, 9, 10, 41]] = np.nan
+
+    maxima, minima = rolling_extrema(high, low, window)
+
+    np.testing.assert_array_equal(maxima, pd.Series(high).rolling(window, min_periods=1).max().to_numpy())
+    np.testing.assert_array_equal(minima, pd.Series(low).rolling(window, min_periods=1).min().to_numpy())
+
+
+def zigzag():
+    # Down to 100, up to 130, down to 90, up to 140, down to 110
+    return np.concatenate([np.linspace(115, 103, 5), np.linspace(100, 130, 11), np.linspace(127, 90, 14),
+                           np.linspace(94, 140, 15), np.linspace(137, 110, 10)])
+
+
+def test_swing_pivots_alternate():
+    frame = Frame(zigzag())
+    frame._compute_fibonacci_retracement(window=20, swing_order=3)
+    swings = frame.fibonacci_swings
+
+    assert list(swings['direction']) == ['up', 'down', 'up']
+    assert list(swings['high']) == pytest.approx([131.0, 131.0, 141.0])
+    assert list(swings['low']) == pytest.approx([99.0, 89.0, 89.0])
+    assert (swings['end'].iloc[:-1].to_numpy() == swings['start'].iloc[1:].to_numpy()).all()
+
+
+def test_levels_come_from_the_last_swing():
+    frame = Frame(zigzag())
+    frame._compute_fibonacci_retracement(window=20, swing_order=3)
+
+    assert frame.get_fibonacci_levels() == pytest.approx(fibonacci_levels(141.0, 89.0, 'up'))
+    assert frame.get_fibonacci_levels()['Fib_Level_50%'] == pytest.approx(115.0)
+
+
+def test_levels_fall_back_to_the_rolling_window():
+    frame = Frame(100.0 + np.arange(10))
+    frame._compute_fibonacci_retracement(window=4, swing_order=3)
+
+    assert frame.fibonacci_swings.empty
+    assert frame.get_fibonacci_levels() == pytest.approx(fibonacci_levels(110.0, 105.0))
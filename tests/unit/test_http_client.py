@@ -0,0 +1,130 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from api import http_client
+from api.http_client import HttpClient, HttpError
+
+
+class StandIn:
+    """
+    Local HTTP stand-in: answers each request with the next scripted (status, headers, body),
+    repeating the last one, and records the request headers.
+    """
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.requests.append(dict(self.headers))
+                status, headers, body = stand_in.responses.pop(0) if len(stand_in.responses) > 1 \
+                    else stand_in.responses[0]
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self.do_GET()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(http_client.time, 'sleep', delays.append)
+    return delays
+
+
+def make_client(stand_in, **kwargs):
+    kwargs.setdefault('rate_limit', (1000, 1.0))
+    kwargs.setdefault('backoff_base', 0.01)
+    return HttpClient('test', base_url=stand_in.url, **kwargs)
+
+
+def test_429_is_retried_after_retry_after(sleeps):
+    stand_in = StandIn([(429, {'Retry-After': '2'}, b''), (200, {}, b'{"success": true}')])
+    try:
+        assert make_client(stand_in).get_json('ohlc') == {'success': True}
+    finally:
+        stand_in.close()
+    assert len(stand_in.requests) == 2
+    assert 2.0 in sleeps
+
+
+def test_5xx_retries_are_exhausted(sleeps):
+    stand_in = StandIn([(503, {}, b'')])
+    try:
+        with pytest.raises(HttpError) as error:
+            make_client(stand_in, max_retries=2).get('ohlc')
+    finally:
+        stand_in.close()
+    assert error.value.status_code == 503
+    assert len(stand_in.requests) == 3
+    assert len(sleeps) == 2
+
+
+def test_posts_are_only_retried_on_request(sleeps):
+    stand_in = StandIn([(503, {}, b'')])
+    try:
+        client = make_client(stand_in, max_retries=2)
+        with pytest.raises(HttpError):
+            client.request('POST', 'hook', json={})
+        assert len(stand_in.requests) == 1
+        with pytest.raises(HttpError):
+            client.request('POST', 'hook', json={}, retry=True)
+    finally:
+        stand_in.close()
+    assert len(stand_in.requests) == 4
+
+
+def test_etag_revalidation_serves_the_cached_body():
+    stand_in = StandIn([(200, {'ETag': '"v1"'}, b'{"n": 1}'), (304, {'ETag': '"v1"'}, b'')])
+    try:
+        client = make_client(stand_in)
+        assert client.get_json('ohlc', params={'book': 'btc_usd'}) == {'n': 1}
+        assert client.get_json('ohlc', params={'book': 'btc_usd'}) == {'n': 1}
+    finally:
+        stand_in.close()
+    assert 'If-None-Match' not in stand_in.requests[0]
+    assert stand_in.requests[1]['If-None-Match'] == '"v1"'
+
+
+def test_cache_keeps_only_the_most_recent_responses():
+    stand_in = StandIn([(200, {'ETag': '"v1"'}, b'{}')])
+    try:
+        client = make_client(stand_in, cache_size=2)
+        for start in range(5):
+            client.get('ohlc', params={'start': start})
+    finally:
+        stand_in.close()
+    assert [dict(key[1])['start'] for key in client._cache] == [3, 4]
+
+
+def test_requests_get_the_default_timeout():
+    stand_in = StandIn([(200, {}, b'{}')])
+    try:
+        client = make_client(stand_in)
+        seen = []
+        send = client.session.request
+        client.session.request = lambda *args, **kwargs: seen.append(kwargs['timeout']) or send(*args, **kwargs)
+        client.get('ohlc')
+    finally:
+        stand_in.close()
+    assert seen == [(3.05, 15.0)]
@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 'import main' takes ~10 ms once the heavy dependencies are deferred; pandas alone costs ~400 ms
+BUDGET_US = 200_000
+HEAVY = ('yfinance', 'pandas', 'sentry_sdk')
+
+
+def import_times(statement):
+    """
+    Runs `statement` under -X importtime in a fresh interpreter.
+
+    Returns:
+        dict: Cumulative import time in microseconds by module.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+def test_main_does_not_import_heavy_dependencies():
+    times = import_times('import main')
+    loaded = {module.split('.')[0] for module in times}
+    assert not loaded & set(HEAVY)
+
+
+def test_main_imports_within_budget():
+    times = import_times('import main')
+    assert times['main'] < BUDGET_US
@@ -0,0 +1,69 @@
+import pytest
+
+from api.instrumentation import Histogram, MetricsRegistry, timed
+
+
+def test_histogram_buckets_observations():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0, 3.0):
+        histogram.observe(value)
+
+    # A value equal to a bound falls in that bound's bucket (le), the rest in +Inf
+    assert histogram.counts == [2, 1, 2]
+    assert histogram.cumulative_counts() == [2, 3, 5]
+    assert histogram.count == 5
+    assert histogram.total == pytest.approx(5.65)
+
+
+def test_timed_records_calls_latency_and_errors():
+    metrics = MetricsRegistry()
+
+    @timed('bitso.fetch', metrics)
+    def fetch(fail=False):
+        if fail:
+            raise ConnectionError("unreachable")
+        return 'data'
+
+    assert fetch() == 'data'
+    with pytest.raises(ConnectionError):
+        fetch(fail=True)
+    with timed('snapshot.write', metrics):
+        pass
+
+    snapshot = metrics.snapshot()
+    assert snapshot['counters'] == {'bitso.fetch.calls': 2, 'bitso.fetch.errors': 1, 'snapshot.write.calls': 1}
+    assert snapshot['histograms']['bitso.fetch']['count'] == 2
+
+
+def test_timed_blocks_can_nest():
+    metrics = MetricsRegistry()
+    stage = timed('indicators.compute', metrics)
+    with stage:
+        with stage:
+            pass
+    assert metrics.snapshot()['counters'] == {'indicators.compute.calls': 2}
+
+
+def test_render_prometheus():
+    metrics = MetricsRegistry(prefix='midas')
+    metrics.observe('snapshot.write', 0.02)
+    metrics.observe('snapshot.write', 7.0)
+    metrics.increment('snapshot.write.calls', 2)
+    metrics.increment('snapshot.write.errors')
+    metrics.increment('news.source_errors', 3)
+
+    lines = metrics.render_prometheus().splitlines()
+    assert 'midas_stage_calls_total{stage="snapshot.write"} 2' in lines
+    assert 'midas_stage_errors_total{stage="snapshot.write"} 1' in lines
+    assert '# TYPE midas_news_source_errors_total counter' in lines
+    assert 'midas_news_source_errors_total 3' in lines
+    assert '# TYPE midas_stage_latency_seconds histogram' in lines
+    assert 'midas_stage_latency_seconds_bucket{stage="snapshot.write",le="0.01"} 0' in lines
+    assert 'midas_stage_latency_seconds_bucket{stage="snapshot.write",le="0.025"} 1' in lines
+    assert 'midas_stage_latency_seconds_bucket{stage="snapshot.write",le="10.0"} 2' in lines
+    assert 'midas_stage_latency_seconds_bucket{stage="snapshot.write",le="+Inf"} 2' in lines
+    assert 'midas_stage_latency_seconds_sum{stage="snapshot.write"} 7.02' in lines
+    assert 'midas_stage_latency_seconds_count{stage="snapshot.write"} 2' in lines
+
+    metrics.reset()
+    assert 'stage=' not in metrics.render_prometheus()
@@ -0,0 +1,66 @@
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from api.news import NewsPipeline, parse_document, score_sentiment, tag_symbols
+
+FIXTURES = Path(os.path.dirname(os.path.abspath(__file__))) / 'fixtures' / 'news'
+
+
+def feed(name):
+    return (FIXTURES / name).as_uri()
+
+
+def test_feed_formats_are_parsed():
+    rss = parse_document((FIXTURES / 'rss.xml').read_bytes(), 'rss')
+    atom = parse_document((FIXTURES / 'atom.xml').read_bytes(), 'atom')
+    page = parse_document((FIXTURES / 'page.html').read_bytes(), 'https://chainpost.example/markets')
+
+    assert [a['title'] for a in rss] == ['Bitcoin surges to record high', 'Ethereum exchange hacked, ETH falls']
+    assert rss[0]['summary'] == 'BTC rally as ETF inflows rise'
+    assert rss[1]['published_at'] == datetime(2024, 1, 2, 9, 0)
+    assert atom[1]['url'] == 'https://ledgerdaily.example/2024/01/02/devs'
+    assert [(a['url'], a['published_at']) for a in page] == [
+        ('https://chainpost.example/markets/dogecoin-lawsuit', datetime(2024, 1, 3, 8, 0))]
+
+
+def test_tag_symbols():
+    assert tag_symbols(['bitcoin and eth rally', 'solana, cardano', 'nothing here']) == ['btc,eth', 'ada,sol', '']
+
+
+def test_score_sentiment():
+    scores = score_sentiment(['bitcoin surges to record high', 'exchange hacked, eth falls', 'a conference'])
+    assert scores.tolist() == [1.0, -1.0, 0.0]
+
+
+def test_pipeline_deduplicates_tags_and_scores_across_feeds():
+    pipeline = NewsPipeline([feed('rss.xml'), feed('atom.xml'), feed('page.html'), feed('missing.xml')],
+                            max_concurrency=2)
+    articles = {a['title']: a for a in pipeline.run()}
+
+    # The story syndicated by both feeds is kept once, from the first feed
+    assert sorted(articles) == ['Bitcoin surges to record high', 'Dogecoin plunges after lawsuit',
+                                'Ethereum exchange hacked, ETH falls', 'Solana and Cardano developers meet']
+    assert articles['Bitcoin surges to record high']['source'] == feed('rss.xml')
+    assert {title: a['symbols'] for title, a in articles.items()} == {
+        'Bitcoin surges to record high': 'btc',
+        'Dogecoin plunges after lawsuit': 'doge',
+        'Ethereum exchange hacked, ETH falls': 'eth',
+        'Solana and Cardano developers meet': 'ada,sol',
+    }
+    assert articles['Bitcoin surges to record high']['sentiment'] > 0
+    assert articles['Dogecoin plunges after lawsuit']['sentiment'] < 0
+    assert articles['Solana and Cardano developers meet']['sentiment'] == 0
+    assert all(len(a['content_hash']) == 40 and a['fetched_at'] for a in articles.values())
+
+    # Articles are returned again until they are marked as stored
+    assert len(pipeline.run()) == 4
+    pipeline.mark_seen(articles.values())
+    assert pipeline.run() == []
+
+
+@pytest.mark.parametrize('name', ['rss.xml', 'atom.xml', 'page.html'])
+def test_pipeline_reads_every_fixture(name):
+    assert NewsPipeline([feed(name)]).run()
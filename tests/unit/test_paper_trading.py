@@ -0,0 +1,92 @@
+import pytest
+
+from trading.paper_trading import MAKER_FEE, TAKER_FEE, OrderRejected, PaperTradingEngine
+
+
+@pytest.fixture
+def engine():
+    engine = PaperTradingEngine()
+    engine.deposit('alice', 'usd', 1000.0)
+    engine.deposit('alice', 'btc', 2.0)
+    engine.on_book('btc_usd', [(99.0, 1.0)], [(100.0, 1.0)], ts=0.0)
+    return engine
+
+
+def test_market_order_beyond_depth_is_cancelled_with_its_fill(engine):
+    order = engine.submit_order('alice', 'btc_usd', 'buy', 5.0)
+
+    assert order.status == 'cancelled'
+    assert order.filled == pytest.approx(1.0)
+    assert order.remaining == pytest.approx(4.0)
+    assert engine.balance('alice', 'usd') == pytest.approx((1000.0 - 100.0 * (1 + TAKER_FEE), 0.0))
+    assert engine.balance('alice', 'btc') == pytest.approx((3.0, 0.0))
+    assert order.oid not in engine.orders
+
+
+def test_market_order_within_depth_completes(engine):
+    order = engine.submit_order('alice', 'btc_usd', 'sell', 0.5)
+
+    assert order.status == 'completed'
+    assert engine.balance('alice', 'usd') == pytest.approx((1000.0 + 49.5 * (1 - TAKER_FEE), 0.0))
+
+
+def test_limit_order_locks_funds_until_cancelled(engine):
+    order = engine.submit_order('alice', 'btc_usd', 'buy', 1.0, price=95.0)
+
+    locked = 95.0 * (1 + TAKER_FEE)
+    assert order.status == 'open'
+    assert engine.balance('alice', 'usd') == pytest.approx((1000.0 - locked, locked))
+
+    assert engine.cancel_order(order.oid) is order
+    assert order.status == 'cancelled'
+    assert engine.balance('alice', 'usd') == pytest.approx((1000.0, 0.0))
+    assert engine.cancel_order(order.oid) is None
+
+
+def test_unfunded_limit_order_is_rejected(engine):
+    with pytest.raises(OrderRejected):
+        engine.submit_order('alice', 'btc_usd', 'sell', 3.0, price=120.0)
+    assert engine.balance('alice', 'btc') == (2.0, 0.0)
+
+
+def test_resting_order_is_filled_as_maker_by_a_crossing_book(engine):
+    order = engine.submit_order('alice', 'btc_usd', 'buy', 1.0, price=95.0)
+    engine.on_book('btc_usd', [(93.0, 1.0)], [(94.0, 2.0)], ts=60.0)
+
+    assert order.status == 'completed'
+    assert engine.balance('alice', 'usd') == pytest.approx((1000.0 - 95.0 * (1 + MAKER_FEE), 0.0))
+    assert engine.balance('alice', 'btc') == pytest.approx((3.0, 0.0))
+    fill, = engine.flush()
+    assert (fill.ts, fill.price, fill.amount, fill.liquidity) == (60.0, 95.0, 1.0, 'maker')
+
+
+def test_resting_order_is_filled_by_candles_up_to_the_participation(engine):
+    order = engine.submit_order('alice', 'btc_usd', 'sell', 2.0, price=105.0)
+    assert engine.balance('alice', 'btc') == pytest.approx((0.0, 2.0))
+
+    # 10% of the candle's volume is available to our orders
+    engine.on_candle('btc_usd', 60.0, 100.0, 106.0, 99.0, 104.0, 10.0)
+    assert order.status == 'partially filled'
+    assert order.remaining == pytest.approx(1.0)
+    assert engine.balance('alice', 'btc') == pytest.approx((0.0, 1.0))
+
+    # Touching the price isn't enough, it has to trade through it
+    engine.on_candle('btc_usd', 120.0, 104.0, 105.0, 103.0, 104.0, 10.0)
+    assert order.remaining == pytest.approx(1.0)
+
+    engine.on_candle('btc_usd', 180.0, 104.0, 107.0, 103.0, 106.0, 10.0)
+    assert order.status == 'completed'
+    assert engine.balance('alice', 'btc') == pytest.approx((0.0, 0.0))
+    assert engine.balance('alice', 'usd') == pytest.approx((1000.0 + 210.0 * (1 - MAKER_FEE), 0.0))
+
+
+def test_fills_reach_the_sink_in_batches(engine):
+    batches = []
+    engine.fill_sink = batches.append
+    engine.batch_size = 2
+    engine.on_book('btc_usd', [(99.0, 1.0)], [(100.0, 1.0), (101.0, 1.0), (102.0, 1.0)], ts=0.0)
+
+    engine.submit_order('alice', 'btc_usd', 'buy', 3.0)
+    assert [len(batch) for batch in batches] == [2]
+    engine.flush()
+    assert [len(batch) for batch in batches] == [2, 1]
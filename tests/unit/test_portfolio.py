@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from analysis.portfolio import (Portfolio, RiskLimitExceeded, RiskLimits, RiskManager, historical_var,
+                                parametric_var, volatility_target_size)
+from trading.paper_trading import OrderRejected
+
+# Losses sorted: -0.06 ... 0.01, 0.03, 0.05
+RETURNS = [0.02, -0.05, 0.0, 0.04, -0.01, 0.06, -0.03, 0.01, 0.05, 0.03]
+Z_99 = 2.3263478740  # standard normal quantile at 99%
+ES_99 = 2.6652142204  # pdf(Z_99) / 1%
+
+
+def test_historical_var_and_cvar():
+    # 90%: quantile at position 8.1 of the sorted losses -> 0.03 + 0.1 * (0.05 - 0.03); tail [0.05]
+    # 80%: position 7.2 -> 0.01 + 0.2 * (0.03 - 0.01); tail [0.03, 0.05]
+    var, cvar = historical_var(RETURNS, confidence=[0.9, 0.8])
+    np.testing.assert_allclose(var, [0.032, 0.014])
+    np.testing.assert_allclose(cvar, [0.05, 0.04])
+
+    var, cvar = historical_var(RETURNS, confidence=0.9, horizon=4)
+    assert (var, cvar) == pytest.approx((0.064, 0.1))
+
+
+def test_historical_var_of_exposures_skips_incomplete_rows():
+    per_symbol = np.column_stack([RETURNS + [np.nan], [0.0] * 10 + [0.5]])
+    assert historical_var(per_symbol, [1000.0, 200.0], confidence=0.9) == pytest.approx((32.0, 50.0))
+    with pytest.raises(ValueError):
+        historical_var(per_symbol, confidence=0.9)
+
+
+def test_parametric_var_and_cvar():
+    # Variance 100² * 0.01 + 2 * 100 * 200 * 0.005 + 200² * 0.04 = 1900
+    exposures, covariance = [100.0, 200.0], [[0.01, 0.005], [0.005, 0.04]]
+    sigma = 1900 ** 0.5
+
+    assert parametric_var(exposures, covariance) == pytest.approx((Z_99 * sigma, ES_99 * sigma))
+    assert parametric_var(exposures, covariance, horizon=4, mean=[0.01, 0.02]) == pytest.approx(
+        (Z_99 * 2 * sigma - 20.0, ES_99 * 2 * sigma - 20.0))
+    var, cvar = parametric_var(exposures, [[0.01, np.nan], [np.nan, 0.04]], confidence=[0.99, 0.5])
+    assert var == pytest.approx([Z_99 * 1700 ** 0.5, 0.0], abs=1e-6)
+
+
+def test_volatility_target_size():
+    # 1% of 100000 at risk over 2 ATRs of 1000
+    assert volatility_target_size(100000.0, 50000.0, atr=1000.0) == pytest.approx(0.5)
+    # Without ATR the bands give a standard deviation of (52000 - 48000) / 4
+    assert volatility_target_size(100000.0, 50000.0, atr=float('nan'), bollinger_upper=52000.0,
+                                  bollinger_lower=48000.0) == pytest.approx(0.5)
+    assert volatility_target_size(100000.0, 50000.0, atr=1000.0, max_weight=0.2) == pytest.approx(0.4)
+    np.testing.assert_allclose(volatility_target_size(100000.0, [50000.0, 2000.0, 1.0], atr=[1000.0, 40.0, np.nan]),
+                               [0.5, 12.5, 0.0])
+
+
+@pytest.fixture
+def portfolio():
+    portfolio = Portfolio(cash=10000.0)
+    portfolio.mark({'btc_usd': 100.0, 'eth_usd': 10.0})
+    return portfolio
+
+
+@pytest.mark.parametrize('limits, allowed, amount, limit, value', [
+    (RiskLimits(max_order_value=500.0), 5.0, 6.0, 'max_order_value', 600.0),
+    (RiskLimits(max_position_value=1000.0), 10.0, 11.0, 'max_position_value', 1100.0),
+    (RiskLimits(max_concentration=0.2), 20.0, 25.0, 'max_concentration', 0.25),
+    (RiskLimits(max_leverage=1.0), 100.0, 101.0, 'max_leverage', 1.01),
+])
+def test_each_limit_rejects_orders_beyond_it(portfolio, limits, allowed, amount, limit, value):
+    manager = RiskManager(portfolio, limits)
+    manager.check_order('alice', 'btc_usd', 'buy', allowed)
+
+    with pytest.raises(RiskLimitExceeded) as e:
+        manager.check_order('alice', 'btc_usd', 'buy', amount)
+    assert (e.value.limit, e.value.value) == (limit, pytest.approx(value))
+
+
+def test_limits_count_the_held_position(portfolio):
+    manager = RiskManager(portfolio, RiskLimits(max_position_value=1000.0, max_concentration=0.2))
+    portfolio.apply_fill('btc_usd', 'buy', 8.0, 100.0)
+
+    with pytest.raises(RiskLimitExceeded, match='max_position_value'):
+        manager.check_order('alice', 'btc_usd', 'buy', 3.0)
+    manager.check_order('alice', 'btc_usd', 'sell', 18.0)
+
+
+def test_var_limit(portfolio):
+    # 2% volatility per bar: VaR of a 2000 position is Z_99 * 40 = 0.93% of equity, of 2500 1.16%
+    manager = RiskManager(portfolio, RiskLimits(max_var=0.01))
+    manager.set_covariance([[0.0004]], ['btc_usd'])
+    manager.check_order('alice', 'btc_usd', 'buy', 20.0)
+
+    with pytest.raises(RiskLimitExceeded) as e:
+        manager.check_order('alice', 'btc_usd', 'buy', 25.0)
+    assert e.value.limit == 'max_var'
+    assert e.value.value == pytest.approx(Z_99 * 0.02 * 2500 / 10000)
+
+
+def test_orders_without_equity_or_price_are_rejected(portfolio):
+    manager = RiskManager(portfolio, RiskLimits(max_leverage=None))
+    with pytest.raises(OrderRejected, match='No price'):
+        manager.check_order('alice', 'sol_usd', 'buy', 1.0)
+
+    portfolio.cash = -1000.0
+    portfolio.version += 1
+    with pytest.raises(RiskLimitExceeded) as e:
+        manager.check_order('alice', 'btc_usd', 'buy', 1.0)
+    assert e.value.limit == 'equity'
+
+
+def test_other_accounts_are_not_checked(portfolio):
+    manager = RiskManager(portfolio, RiskLimits(max_order_value=500.0), account='alice')
+    manager.check_order('bob', 'btc_usd', 'buy', 100.0)
+    with pytest.raises(RiskLimitExceeded):
+        manager.check_order('alice', 'btc_usd', 'buy', 100.0)
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.Indicators import Indicators
+from api.indicators.base_financial_indicators import BaseFinancialIndicators
+from api.indicators.providers import PROVIDERS, register_provider
+from api.indicators.reconciled import ReconciledFinancialIndicators
+
+released = threading.Event()
+
+
+class StubProvider(BaseFinancialIndicators):
+    """
+    Answers with 60 daily bars. Like Bitso and YahooFinancial, it only sets `data`.
+    """
+    offset = 0.0
+
+    def fetch_data(self):
+        close = 100.0 + np.arange(60) + self.offset
+        self.data = pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                                  'Adj Close': close, 'Volume': 10.0},
+                                 index=pd.date_range(self.start_date, periods=60, freq='D'))
+
+
+class SlowProvider(StubProvider):
+    offset = 0.5
+
+    def fetch_data(self):
+        released.wait(5)
+        super().fetch_data()
+
+
+class FailingProvider(StubProvider):
+    def fetch_data(self):
+        raise ConnectionError("exchange unreachable")
+
+
+STUBS = {'stub': 'StubProvider', 'slow': 'SlowProvider', 'failing': 'FailingProvider'}
+
+
+@pytest.fixture(autouse=True)
+def stubs():
+    for name, cls in STUBS.items():
+        register_provider(name, f'{__name__}:{cls}')
+    released.clear()
+    yield
+    released.set()
+    for name in STUBS:
+        del PROVIDERS[name]
+
+
+def reconciled(*names, timeout=5.0):
+    sources = [(name, ('btc_usd', '2024-01-01', '2024-03-01')) for name in names]
+    return ReconciledFinancialIndicators('btc_usd', '2024-01-01', '2024-03-01', sources=sources, timeout=timeout)
+
+
+def test_slow_and_failing_providers_fall_back_to_the_others():
+    provider = reconciled('slow', 'failing', 'stub', timeout=0.3)
+    started = time.monotonic()
+    provider.fetch_data()
+
+    assert time.monotonic() - started < 2
+    assert len(provider.data) == 60
+    assert set(provider.data['Source']) == {'stub'}
+    assert provider.data['Close'].iloc[0] == 100.0
+    assert [c for c in provider.report if c.startswith('Close_')] == ['Close_stub']
+
+
+def test_providers_that_answer_are_merged_by_priority():
+    released.set()
+    provider = reconciled('slow', 'stub')
+    provider.fetch_data()
+
+    assert set(provider.data['Source']) == {'slow'}
+    assert provider.data['Close'].iloc[0] == 100.5
+    assert not provider.report['Outlier_stub'].any()
+
+
+def test_reconciled_data_feeds_the_indicators():
+    values = Indicators(reconciled('failing', 'stub')).get_indicators()
+    assert values['SMA_50'] == pytest.approx(134.5)  # closes 110 to 159
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.indicators.replay import MarketDataRecorder, MarketDataReplay, ReplayFinancialIndicators
+from trading.paper_trading import PaperTradingEngine, candle_events, recorded_events, replay
+
+JAN_1 = 1704067200  # 2024-01-01 00:00 UTC
+
+
+def candles(index):
+    close = 100.0 + np.arange(len(index))
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close, 'Volume': 10.0},
+                        index=index)
+
+
+@pytest.mark.parametrize('index', [
+    pd.date_range('2024-01-01', periods=3, freq='D'),
+    pd.date_range('2024-01-01', periods=3, freq='D', tz='UTC').as_unit('ms'),
+    pd.DatetimeIndex(np.arange(3) * 86400 + JAN_1, dtype='datetime64[s]'),
+])
+def test_candles_round_trip_whatever_the_index_unit(tmp_path, index):
+    MarketDataRecorder(str(tmp_path / 'a')).record_candles('btc_usd', candles(index))
+    provider = ReplayFinancialIndicators('btc_usd', '2024-01-01', '2024-01-04', root=str(tmp_path / 'a'))
+    provider.fetch_data()
+
+    assert provider.data.index.dtype == 'datetime64[ns]'
+    assert provider.data.index[0] == pd.Timestamp('2024-01-01')
+    assert [event[0] for event in candle_events('btc_usd', provider.data)] == [JAN_1, JAN_1 + 86400, JAN_1 + 172800]
+
+    # Recording the replayed candles again keeps their dates
+    MarketDataRecorder(str(tmp_path / 'b')).record_candles('btc_usd', provider.data)
+    assert MarketDataReplay(str(tmp_path / 'b')).candles('btc_usd', '2024-01-01', '2024-01-04')['ts'][0] == JAN_1 * 1000
+
+
+@pytest.fixture
+def recording(tmp_path):
+    recorder = MarketDataRecorder(str(tmp_path))
+    ms = JAN_1 * 1000
+    recorder.record_book_diffs('btc_usd', [ms, ms, ms, ms], [1, 1, -1, -1], [99.0, 98.0, 101.0, 102.0],
+                               [1.0, 2.0, 1.0, 2.0])
+    recorder.record_candles('btc_usd', candles(pd.DatetimeIndex([pd.Timestamp(ms + 30_000, unit='ms')])))
+    # The best ask is taken out and the bid side moves up
+    recorder.record_book_diffs('btc_usd', [ms + 60_000] * 3, [-1, 1, 1], [101.0, 100.0, 98.0], [0.0, 0.5, 0.0])
+    return MarketDataReplay(str(tmp_path))
+
+
+def test_recorded_events_rebuild_book_snapshots(recording):
+    events = list(recorded_events(recording, 'btc_usd', '2024-01-01', '2024-01-02'))
+
+    assert [(ts, kind) for ts, kind, _, _ in events] == [(JAN_1, 'book'), (JAN_1 + 30, 'candle'), (JAN_1 + 60, 'book')]
+    assert events[0][3] == ([(99.0, 1.0), (98.0, 2.0)], [(101.0, 1.0), (102.0, 2.0)])
+    assert events[1][3] == (100.0, 101.0, 99.0, 100.0, 10.0)
+    assert events[2][3] == ([(100.0, 0.5), (99.0, 1.0)], [(102.0, 2.0)])
+
+
+def test_recorded_events_drive_the_engine(recording):
+    engine = PaperTradingEngine()
+    engine.deposit('alice', 'btc', 1.0)
+    placed = []
+
+    def strategy(engine, event):
+        if not placed:
+            placed.append(engine.submit_order('alice', 'btc_usd', 'sell', 0.5, price=99.5))
+
+    sleeps = []
+    count = replay(engine, recorded_events(recording, 'btc_usd', '2024-01-01', '2024-01-02', depth=1),
+                   speed=60.0, on_event=strategy, sleep=sleeps.append, clock=lambda: 0.0)
+
+    assert count == 3
+    assert sleeps == [0.5, 1.0]
+    assert placed[0].status == 'completed'
@@ -0,0 +1,80 @@
+import importlib.util
+import os
+import threading
+
+import pytest
+
+PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                    'midasbot', 'scheduler.py')
+
+
+@pytest.fixture(scope='module')
+def scheduler_module():
+    spec = importlib.util.spec_from_file_location('midasbot_scheduler', PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def scheduler(scheduler_module):
+    scheduler = scheduler_module.SnapshotScheduler(jitter=0)
+    yield scheduler
+    scheduler.stop()
+
+
+class Job:
+    """
+    Records the symbols it runs; blocks while `gate` is clear.
+    """
+    def __init__(self):
+        self.seen = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.ran = threading.Semaphore(0)
+
+    def __call__(self, symbol):
+        self.gate.wait(5)
+        self.seen.append(symbol)
+        self.ran.release()
+
+
+def test_restart_after_stopping_mid_cycle(scheduler):
+    job = Job()
+    # The first symbol is dispatched right away, the others an hour later
+    scheduler.add_group('g', ['btc_usd', 'eth_usd', 'xrp_usd'], job, interval=7200, spread=3600 * 3)
+
+    assert scheduler.trigger('g') == {'g': True}
+    assert job.ran.acquire(timeout=5)
+    scheduler.stop()
+    assert scheduler.groups['g'].remaining == 0
+
+    assert scheduler.trigger('g') == {'g': True}
+    assert job.ran.acquire(timeout=5)
+    assert job.seen == ['btc_usd', 'btc_usd']
+
+
+def test_cycle_in_flight_is_skipped(scheduler):
+    job = Job()
+    job.gate.clear()
+    scheduler.add_group('g', ['btc_usd'], job, spread=0)
+
+    assert scheduler.trigger('g') == {'g': True}
+    assert scheduler.trigger('g') == {'g': False}
+    job.gate.set()
+    assert job.ran.acquire(timeout=5)
+    assert not job.ran.acquire(timeout=0.2)
+
+
+def test_cycle_in_flight_is_coalesced(scheduler):
+    job = Job()
+    job.gate.clear()
+    ended = threading.Semaphore(0)
+    scheduler.add_group('g', ['btc_usd'], job, spread=0, overlap='coalesce', on_cycle_end=lambda name: ended.release())
+
+    assert scheduler.trigger('g') == {'g': True}
+    assert scheduler.trigger('g') == {'g': False}
+    assert scheduler.trigger('g') == {'g': False}
+    job.gate.set()
+    assert ended.acquire(timeout=5) and ended.acquire(timeout=5)
+    assert job.seen == ['btc_usd', 'btc_usd']
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.indicators.base_financial_indicators import BaseFinancialIndicators
+from api.indicators.streaming import StreamingVWAP
+
+
+class Frame(BaseFinancialIndicators):
+    def __init__(self, index, tf=None):
+        super().__init__('btc_usd', None, None)
+        if tf:
+            self.tf = tf
+        n = len(index)
+        close = 100.0 + np.arange(n)
+        self.data = pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                                  'Volume': 1.0 + np.arange(n) % 3}, index=index)
+
+
+def expected(frame, keys):
+    price_volume = frame.data['Close'] * frame.data['Volume']
+    return price_volume.groupby(keys).cumsum() / frame.data['Volume'].groupby(keys).cumsum()
+
+
+def test_daily_bars_are_anchored_to_the_month():
+    frame = Frame(pd.date_range('2024-01-20', '2024-02-10', freq='D'))
+    frame._compute_vwap()
+
+    vwap = frame.data['VWAP']
+    assert vwap.iloc[1] != frame.data['Close'].iloc[1]
+    pd.testing.assert_series_equal(vwap, expected(frame, frame.data.index.month), check_names=False)
+    assert vwap.loc['2024-02-01'] == frame.data['Close'].loc['2024-02-01']
+
+
+def test_intraday_bars_are_anchored_to_the_day():
+    frame = Frame(pd.date_range('2024-01-01 20:00', periods=10, freq='h', tz='UTC'))
+    frame._compute_vwap()
+
+    pd.testing.assert_series_equal(frame.data['VWAP'], expected(frame, frame.data.index.day), check_names=False)
+
+
+def test_provider_timeframe_decides_the_anchor():
+    frame = Frame(pd.date_range('2024-01-01', periods=3, freq='D'), tf=3600)
+    frame._compute_vwap()
+
+    assert (frame.data['VWAP'] == frame.data['Close']).all()
+
+
+def test_streaming_vwap_matches_the_monthly_anchor():
+    frame = Frame(pd.date_range('2024-01-20', '2024-02-10', freq='D'))
+    frame._compute_vwap()
+    stream = StreamingVWAP(anchor='M')
+
+    values = [stream.update(ts.timestamp(), row.High, row.Low, row.Volume)
+              for ts, row in zip(frame.data.index.tz_localize('UTC'), frame.data.itertuples())]
+    assert values == pytest.approx(frame.data['VWAP'].tolist())
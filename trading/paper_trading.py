@@ -0,0 +1,498 @@
+"""
+Paper trading with an in-memory matching engine.
+
+The engine consumes the same market data the bot sees (candles and order book snapshots,
+live or replayed) and simulates orders against it:
+
+- Market orders and marketable limit orders walk the opposite side of the latest book
+  snapshot level by level and pay the taker fee. Liquidity consumed by our own orders is
+  not reused until the next snapshot, so large orders get partially filled.
+- Resting limit orders are filled as maker when a later book snapshot crosses them, or when
+  a candle trades through their price, limited to a share of the candle's volume.
+
+Balances are kept per account and currency as [free, locked] pairs and funds are locked
+while limit orders rest. Fills are handed to `fill_sink` in batches (midasbot's FillWriter
+bulk-inserts each batch into the paper_fill table). An optional `risk_check`
+(e.g. analysis.portfolio.RiskManager) vets every order before any funds are locked.
+
+`replay()` drives the engine from recorded events at a configurable speed (e.g. 100x), built
+from provider candles with `candle_events()` or from the binary logs of api.indicators.replay
+with `recorded_events()`.
+"""
+import heapq
+import itertools
+import time
+from bisect import insort
+from collections import namedtuple
+
+# Bitso's default fee tier
+MAKER_FEE = 0.005
+TAKER_FEE = 0.0065
+
+EPSILON = 1e-12
+
+Fill = namedtuple('Fill', 'ts account order_id symbol side price amount fee fee_currency liquidity')
+
+
+class OrderRejected(ValueError):
+    """
+    Raised when an order is invalid or the account can't fund it.
+    """
+
+
+def split_symbol(symbol):
+    """
+    Splits a Bitso book ('btc_usd') or Yahoo symbol ('BTC-USD') into (base, quote).
+    """
+    for separator in ('_', '-', '/'):
+        if separator in symbol:
+            base, quote = symbol.split(separator, 1)
+            return base.lower(), quote.lower()
+    raise OrderRejected(f"Can't infer base and quote currencies from '{symbol}'")
+
+
+class Order:
+    """
+    A simulated order. Statuses follow Bitso: 'open', 'partially filled', 'completed', 'cancelled'.
+    A cancelled order keeps what it filled before, e.g. a market order that ran out of depth or
+    funds is 'cancelled' with `filled` > 0 and `remaining` > 0.
+    """
+    __slots__ = ('oid', 'account', 'symbol', 'side', 'type', 'price', 'amount', 'remaining', 'locked',
+                 'status', 'ts')
+
+    def __init__(self, oid, account, symbol, side, type, price, amount, ts):
+        self.oid = oid
+        self.account = account
+        self.symbol = symbol
+        self.side = side
+        self.type = type
+        self.price = price
+        self.amount = amount
+        self.remaining = amount
+        self.locked = 0.0
+        self.status = 'open'
+        self.ts = ts
+
+    @property
+    def filled(self):
+        return self.amount - self.remaining
+
+    def __repr__(self):
+        return (f'<Order {self.oid} {self.side} {self.amount} {self.symbol} @ {self.price} '
+                f'{self.status} filled={self.filled}>')
+
+
+class PaperTradingEngine:
+    """
+    In-memory exchange simulator.
+
+    Attributes:
+        maker_fee (float): Fee rate for resting orders that get filled.
+        taker_fee (float): Fee rate for orders that take liquidity.
+        candle_participation (float): Max share of a candle's volume our resting orders can fill.
+        batch_size (int): Number of fills buffered before calling `fill_sink`.
+        risk_check (callable): Called as risk_check(account, symbol, side, amount, price) before an
+            order is accepted; raises OrderRejected to reject it. `price` is the limit price, or
+            the best opposite price of the book for market orders (None without a book). Pending
+            fills are flushed first, so a fill_sink feeding the risk state is up to date.
+        orders (dict): Orders that are still open, by id.
+    """
+    def __init__(self, maker_fee=MAKER_FEE, taker_fee=TAKER_FEE, candle_participation=0.1, fill_sink=None,
+                 batch_size=500, risk_check=None):
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.candle_participation = candle_participation
+        self.fill_sink = fill_sink
+        self.batch_size = batch_size
+        self.risk_check = risk_check
+        self.orders = {}
+        self._balances = {}
+        self._books = {}
+        # Resting orders per symbol and side, kept sorted by priority: (sort key, order id, order)
+        self._resting = {}
+        self._pending_fills = []
+        self._ids = itertools.count(1)
+        self.now = 0.0
+
+    # Accounts
+
+    def deposit(self, account, currency, amount):
+        """
+        Credits an account.
+
+        Parameters:
+            account (str): Account name.
+            currency (str): Currency code, e.g. 'usd'.
+            amount (float): Amount to credit.
+        """
+        self._wallet(account, currency)[0] += amount
+
+    def balance(self, account, currency):
+        """
+        Returns the (free, locked) balance of an account in a currency.
+        """
+        free, locked = self._balances.get(account, {}).get(currency.lower(), (0.0, 0.0))
+        return free, locked
+
+    def balances(self, account):
+        """
+        Returns all balances of an account as {currency: (free, locked)}.
+        """
+        return {currency: tuple(wallet) for currency, wallet in self._balances.get(account, {}).items()}
+
+    def _wallet(self, account, currency):
+        currency = currency.lower()
+        wallets = self._balances.setdefault(account, {})
+        wallet = wallets.get(currency)
+        if wallet is None:
+            wallet = wallets[currency] = [0.0, 0.0]
+        return wallet
+
+    # Orders
+
+    def submit_order(self, account, symbol, side, amount, price=None, ts=None):
+        """
+        Submits an order. Without `price` it is a market order, filled immediately against the
+        book as far as depth and funds allow, with any remainder cancelled. With `price` it is
+        a limit order: the marketable part is filled as taker and the rest rests on the book.
+
+        Parameters:
+            account (str): Account name.
+            symbol (str): Book, e.g. 'btc_usd'.
+            side (str): 'buy' or 'sell'.
+            amount (float): Amount in base currency.
+            price (float): Limit price in quote currency, or None for a market order.
+            ts (float): Submission time in seconds. Defaults to the engine's current time.
+
+        Returns:
+            Order: The order, with its status after the immediate matching.
+
+        Raises:
+            OrderRejected: If the order is invalid, can't be funded or fails the risk check.
+        """
+        if side not in ('buy', 'sell'):
+            raise OrderRejected(f"side must be 'buy' or 'sell', got '{side}'")
+        if amount <= 0:
+            raise OrderRejected("amount must be positive")
+        if price is not None and price <= 0:
+            raise OrderRejected("price must be positive")
+        base, quote = split_symbol(symbol)
+        book = self._books.get(symbol)
+        if self.risk_check is not None:
+            if self._pending_fills:
+                self.flush()
+            reference = price
+            if reference is None and book is not None:
+                levels = book[1] if side == 'buy' else book[0]
+                reference = levels[0][0] if levels else None
+            self.risk_check(account, symbol, side, amount, reference)
+        order = Order(next(self._ids), account, symbol, side, 'market' if price is None else 'limit', price, amount,
+                      self.now if ts is None else ts)
+
+        if price is not None:
+            if side == 'buy':
+                currency, required = quote, amount * price * (1 + self.taker_fee)
+            else:
+                currency, required = base, amount
+            wallet = self._wallet(account, currency)
+            if wallet[0] + EPSILON < required:
+                raise OrderRejected(f"Insufficient {currency} balance: {wallet[0]} available, {required} required")
+            wallet[0] -= required
+            wallet[1] += required
+            order.locked = required
+        else:
+            currency = quote if side == 'buy' else base
+            if self._wallet(account, currency)[0] <= EPSILON:
+                raise OrderRejected(f"Insufficient {currency} balance")
+
+        if book is not None:
+            levels = book[1] if side == 'buy' else book[0]
+            self._take(order, levels, limit=price, ts=order.ts)
+
+        if order.remaining <= EPSILON:
+            self._complete(order)
+        elif price is None:
+            self._finish(order, 'cancelled')
+        else:
+            self.orders[order.oid] = order
+            key = -price if side == 'buy' else price
+            insort(self._resting.setdefault(symbol, {'buy': [], 'sell': []})[side], (key, order.oid, order))
+        return order
+
+    def cancel_order(self, order_id):
+        """
+        Cancels an open order and releases its locked funds.
+
+        Returns:
+            Order: The cancelled order, or None if it isn't open anymore.
+        """
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+        self._unrest(order)
+        self._finish(order, 'cancelled')
+        return order
+
+    def _unrest(self, order):
+        resting = self._resting[order.symbol][order.side]
+        for i, entry in enumerate(resting):
+            if entry[1] == order.oid:
+                del resting[i]
+                break
+
+    def _finish(self, order, status):
+        self.orders.pop(order.oid, None)
+        if order.locked > 0:
+            base, quote = split_symbol(order.symbol)
+            wallet = self._wallet(order.account, quote if order.side == 'buy' else base)
+            wallet[0] += order.locked
+            wallet[1] -= order.locked
+            order.locked = 0.0
+        order.status = status
+
+    def _complete(self, order):
+        order.remaining = 0.0
+        self._finish(order, 'completed')
+
+    # Matching
+
+    def _take(self, order, levels, limit, ts, fill_price=None, liquidity='taker'):
+        """
+        Consumes book levels ([price, amount] lists, best first) for `order`.
+        """
+        base, quote = split_symbol(order.symbol)
+        fee_rate = self.taker_fee if liquidity == 'taker' else self.maker_fee
+        consumed = 0
+        for level in levels:
+            if order.remaining <= EPSILON:
+                break
+            level_price, available = level
+            if limit is not None and (level_price > limit if order.side == 'buy' else level_price < limit):
+                break
+            price = level_price if fill_price is None else fill_price
+            qty = min(order.remaining, available)
+            if order.type == 'market':
+                wallet = self._wallet(order.account, quote if order.side == 'buy' else base)
+                affordable = wallet[0] / (price * (1 + fee_rate)) if order.side == 'buy' else wallet[0]
+                qty = min(qty, affordable)
+            if qty <= EPSILON:
+                break
+            self._apply_fill(order, price, qty, fee_rate, liquidity, ts)
+            level[1] -= qty
+            if level[1] <= EPSILON:
+                consumed += 1
+            else:
+                break
+        if consumed:
+            del levels[:consumed]
+
+    def _apply_fill(self, order, price, qty, fee_rate, liquidity, ts):
+        base, quote = split_symbol(order.symbol)
+        base_wallet = self._wallet(order.account, base)
+        quote_wallet = self._wallet(order.account, quote)
+        notional = price * qty
+        fee = notional * fee_rate
+        if order.side == 'buy':
+            if order.type == 'limit':
+                release = min(order.locked, qty * order.price * (1 + self.taker_fee))
+                order.locked -= release
+                quote_wallet[1] -= release
+                quote_wallet[0] += release
+            quote_wallet[0] -= notional + fee
+            base_wallet[0] += qty
+        else:
+            if order.type == 'limit':
+                release = min(order.locked, qty)
+                order.locked -= release
+                base_wallet[1] -= release
+            else:
+                base_wallet[0] -= qty
+            quote_wallet[0] += notional - fee
+        order.remaining -= qty
+        if order.remaining > EPSILON:
+            order.status = 'partially filled'
+        self._pending_fills.append(Fill(ts, order.account, order.oid, order.symbol, order.side, price, qty, fee,
+                                        quote, liquidity))
+        if len(self._pending_fills) >= self.batch_size:
+            self.flush()
+
+    def on_book(self, symbol, bids, asks, ts=None):
+        """
+        Processes an order book snapshot and fills resting orders that it crosses as maker.
+
+        Parameters:
+            symbol (str): Book.
+            bids (iterable): (price, amount) pairs, best (highest) first.
+            asks (iterable): (price, amount) pairs, best (lowest) first.
+            ts (float): Snapshot time in seconds.
+        """
+        if ts is not None:
+            self.now = ts
+        bid_levels = [[float(p), float(a)] for p, a in bids]
+        ask_levels = [[float(p), float(a)] for p, a in asks]
+        self._books[symbol] = (bid_levels, ask_levels)
+        resting = self._resting.get(symbol)
+        if not resting:
+            return
+        for side, levels in (('buy', ask_levels), ('sell', bid_levels)):
+            orders = resting[side]
+            done = 0
+            for _, _, order in orders:
+                if not levels or (levels[0][0] > order.price if side == 'buy' else levels[0][0] < order.price):
+                    break
+                self._take(order, levels, limit=order.price, ts=self.now, fill_price=order.price, liquidity='maker')
+                if order.remaining > EPSILON:
+                    break
+                self._complete(order)
+                done += 1
+            if done:
+                del orders[:done]
+
+    def on_candle(self, symbol, ts, open, high, low, close, volume):
+        """
+        Processes a candle. Resting orders whose price was traded through (strictly) are filled
+        as maker at their limit price, sharing `candle_participation * volume` between them.
+
+        Parameters:
+            symbol (str): Book.
+            ts (float): Candle start time in seconds.
+            open, high, low, close (float): Candle prices.
+            volume (float): Candle volume in base currency.
+        """
+        self.now = ts
+        resting = self._resting.get(symbol)
+        if not resting:
+            return
+        budget = volume * self.candle_participation
+        for side in ('buy', 'sell'):
+            orders = resting[side]
+            done = 0
+            for _, _, order in orders:
+                if budget <= EPSILON or not (low < order.price if side == 'buy' else high > order.price):
+                    break
+                qty = min(order.remaining, budget)
+                budget -= qty
+                self._apply_fill(order, order.price, qty, self.maker_fee, 'maker', ts)
+                if order.remaining > EPSILON:
+                    break
+                self._complete(order)
+                done += 1
+            if done:
+                del orders[:done]
+
+    # Persistence
+
+    def flush(self):
+        """
+        Hands the buffered fills to `fill_sink` as one batch.
+
+        Returns:
+            list: The flushed fills.
+        """
+        fills, self._pending_fills = self._pending_fills, []
+        if fills and self.fill_sink is not None:
+            self.fill_sink(fills)
+        return fills
+
+
+def candle_events(symbol, frame):
+    """
+    Converts an OHLCV DataFrame (as produced by the indicator providers) into replay events.
+
+    Parameters:
+        symbol (str): Book the candles belong to.
+        frame (DataFrame): Data indexed by timestamp with Open, High, Low, Close and Volume columns.
+
+    Returns:
+        generator: (ts, 'candle', symbol, (open, high, low, close, volume)) tuples.
+    """
+    timestamps = frame.index.as_unit('ms').asi8 / 1e3
+    columns = frame[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy(dtype=float)
+    for ts, row in zip(timestamps, columns):
+        yield float(ts), 'candle', symbol, tuple(row)
+
+
+def recorded_events(replay, symbol, start_date, end_date, kinds=('candle', 'book'), depth=20):
+    """
+    Converts the streams recorded by api.indicators.replay into replay events.
+
+    Book diffs are applied to a local copy of the book and a snapshot of its top `depth` levels
+    is emitted once all diffs sharing a timestamp have been applied, as on_book expects.
+
+    Parameters:
+        replay (MarketDataReplay): Reader of the recorded logs.
+        symbol (str): Book, e.g. 'btc_usd'.
+        start_date (str): First UTC day, 'YYYY-MM-DD'.
+        end_date (str): Day after the last one, 'YYYY-MM-DD'.
+        kinds (tuple): Recorded kinds to replay, 'candle' and/or 'book'.
+        depth (int): Levels per side in the book snapshots.
+
+    Returns:
+        generator: (ts, kind, symbol, payload) tuples in time order, ts in seconds.
+    """
+    bids, asks = {}, {}
+    pending = None  # timestamp of the diffs applied since the last snapshot
+
+    def snapshot(ts):
+        return (ts / 1e3, 'book', symbol, (heapq.nlargest(depth, bids.items()), heapq.nsmallest(depth, asks.items())))
+
+    for kind, batch in replay.events(symbol, start_date, end_date, kinds=kinds):
+        if kind == 'book':
+            for ts, price, amount, side in zip(batch['ts'].tolist(), batch['price'].tolist(),
+                                               batch['amount'].tolist(), batch['side'].tolist()):
+                if pending is not None and ts != pending:
+                    yield snapshot(pending)
+                pending = ts
+                levels = bids if side > 0 else asks
+                if amount > 0:
+                    levels[price] = amount
+                else:
+                    levels.pop(price, None)
+        elif kind == 'candle':
+            if pending is not None:
+                yield snapshot(pending)
+                pending = None
+            for row in batch.tolist():
+                yield row[0] / 1e3, 'candle', symbol, row[1:6]
+        else:
+            raise ValueError(f"Can't replay '{kind}' records through the paper trading engine")
+    if pending is not None:
+        yield snapshot(pending)
+
+
+def replay(engine, events, speed=100.0, on_event=None, sleep=time.sleep, clock=time.monotonic):
+    """
+    Feeds recorded events through the engine, paced at `speed` times real time.
+
+    Parameters:
+        engine (PaperTradingEngine): The engine.
+        events (iterable): (ts, kind, symbol, payload) tuples in time order, where kind is
+            'candle' with (open, high, low, close, volume) or 'book' with (bids, asks).
+        speed (float): Replay speed relative to real time. None replays as fast as possible.
+        on_event (callable): Called as on_event(engine, event) after each event, e.g. a strategy.
+
+    Returns:
+        int: Number of events replayed.
+    """
+    start_wall = clock()
+    start_ts = None
+    count = 0
+    for event in events:
+        ts, kind, symbol, payload = event
+        if speed:
+            if start_ts is None:
+                start_ts = ts
+            delay = (ts - start_ts) / speed - (clock() - start_wall)
+            if delay > 0:
+                sleep(delay)
+        if kind == 'candle':
+            engine.on_candle(symbol, ts, *payload)
+        elif kind == 'book':
+            engine.on_book(symbol, payload[0], payload[1], ts)
+        else:
+            raise ValueError(f"Unknown event kind '{kind}'")
+        if on_event is not None:
+            on_event(engine, event)
+        count += 1
+    engine.flush()
+    return count